@@ -1,21 +1,43 @@
 #!/usr/bin/env python3
 """a debugger for Peakwork HotelEDF data deliveries"""
 import os
-import importlib
-import plugins
+import multiprocessing
 import sys
 import logging
 import datetime
-import glob
+import functools
+import collections
+import zlib
 import shutil
 import xml.etree.ElementTree as ET
-from inspect import getmembers, isfunction
 from zipfile import ZipFile, BadZipFile
-from edferrors import HotelEdfError, AllotmentEdfError, BasicDataError, SellingDataError, ChargeBlockError, OccupancyError, RoomError
+from edferrors import Finding, Message, EdfError, DeliveryError
 from edfns import ns
+import edfvalues
+import edfdelta
+import edfpattern
+import edfsample
+import edfreport
+import edfsupervise
+from edfindex import DeliveryIndex, orphan_findings
+from edfregistry import Registry
+from edfengine import Engine, header_for
+from edfcache import ResultCache, filehash, fingerprint
+from edfsink import open_sink
+from edfsummary import Summary
+from edfprofile import Profiler
+from edfwatch import Watcher
+from edfserve import Service
+from edfsource import FolderSource, ZipSource, PrefetchSource, HOTELONLYDIR, ALLOTMENTDIR
 
 __version__ = "1.2.1"
 
+# exit codes: no ERROR or CRITICAL findings, such findings, the delivery
+# could not be checked at all (argparse uses 2 for wrong arguments)
+EXIT_OK = 0
+EXIT_ERRORS = 1
+EXIT_UNCHECKED = 3
+
 class Progressbar(object):
     def __init__(self, maxval, width=50, show_percent=True, barchar='»'):
         self.maxval = maxval
@@ -81,116 +103,651 @@ def unpackzipfile(zipfilename, workdir=None):
         logging.error("The zip file seems to have some issues. Check the work directory if all EDF files have been successfully unpacked and no folders are missing")
     else:
         if os.path.isdir(os.path.join(workdir, 'hotels/hotelonly')) is False:
-            logging.critical("Wrong folder structure. No hotels/hotelonly found. Exiting")
-            sys.exit()
+            raise DeliveryError("Wrong folder structure. No hotels/hotelonly found")
         if os.path.isdir(os.path.join(workdir, 'hotels/hotelonly/allotment')) is False:
-            logging.critical("Wrong folder structure. No hotels/hotelonly/allotment found. Exiting")
-            sys.exit()
+            raise DeliveryError("Wrong folder structure. No hotels/hotelonly/allotment found")
+
+def openzipfile(zipfilename):
+    """Returns a ZipSource for reading the EDF files straight from the
+    zip file. Does the same folder structure checks as unpackzipfile()
+    but only reads the central directory of the zip file. Raises
+    DeliveryError if the delivery cannot be checked."""
+    source = ZipSource(zipfilename)
+    try:
+        source.hotelnames()
+    except (BadZipFile, OSError) as e:
+        raise DeliveryError("The zip file {0} could not be opened: {1}".format(zipfilename, e))
+    if source.has_folder(HOTELONLYDIR) is False:
+        raise DeliveryError("Wrong folder structure. No hotels/hotelonly found")
+    if source.has_folder(ALLOTMENTDIR) is False:
+        raise DeliveryError("Wrong folder structure. No hotels/hotelonly/allotment found")
+    return source
 
-def log_exception(e, header, counters, functionname, debug=False):
+def log_exception(e, header, counters, functionname, debug=False, records=None, room=None, minlevel=logging.NOTSET, snippetlimit=None):
+    """Log the messages of EdfError e below header. If a records list
+    is passed a Finding is appended to it instead of being logged right
+    away. All messages are counted, but messages below minlevel are
+    dropped before their text and snippet are produced. Snippets are
+    shortened to snippetlimit characters."""
+    if records is None:
+        records = list()
+        emit = True
+    else:
+        emit = False
     highestlevel = logging.DEBUG
+    messages = list()
     for errormsg in e.messages:
         try:
             counters["{0}, {1}".format(type(e).__name__, logging.getLevelName(errormsg.level))] += 1
         except KeyError:
             counters["{0}, {1}".format(type(e).__name__, logging.getLevelName(errormsg.level))] = 1
+        if errormsg.level < minlevel:
+            continue
         if errormsg.level > highestlevel:
             highestlevel = errormsg.level
-    logging.log(highestlevel, header)
-    if debug is True:
-        logging.log(errormsg.level, "In function {0}:".format(functionname))
-    for errormsg in e.messages:
-        logging.log(errormsg.level, errormsg.message)
-        if errormsg.snippet is not None:
-            logging.log(errormsg.level, errormsg.snippet)
+        messages.append(Message(errormsg.level, errormsg.message, errormsg.get_snippet(snippetlimit), errormsg.template))
+    if len(messages) == 0:
+        return
+    records.append(Finding(highestlevel, header, type(e).__name__, functionname, room, messages))
+    if emit is True:
+        log_records(records, debug=debug)
 
-def iterate(workdir=None, debug=False):
-    workdir = get_workdir(workdir)
-    hotelonlydir = get_hotelonlydir(workdir)
-    allotmentdir = get_allotmentdir(workdir)
-    edfnames = glob.glob(os.path.join(hotelonlydir, "*.xml"))
-    progressbar = Progressbar(len(edfnames))
-    logging.info('{0} files found in {1}'.format(len(edfnames), hotelonlydir))
-    allotmentnames = glob.glob(os.path.join(allotmentdir, "*.xml"))
-    logging.info('{0} files found in {1}'.format(len(allotmentnames), allotmentdir))
-    if len(edfnames) != len(allotmentnames):
-        logging.warning('There are different numbers of HotelEDF and AllotmentEDF')
-    functions = list()
-    for l in plugins.__all__:
-        m = importlib.import_module("plugins.{0}".format(l))
-        functions += [o for o in getmembers(m) if isfunction(o[1])]
-    counters = dict()
-    for fqn in edfnames:
-        progressbar.inc()
-        base, filename = os.path.split(fqn)
+def log_records(records, debug=False):
+    for level, text in edfreport.lines(records, debug=debug):
+        logging.log(level, text)
+
+def merge_counters(counters, filecounters):
+    for key, value in filecounters.items():
+        try:
+            counters[key] += value
+        except KeyError:
+            counters[key] = value
+
+def register_namespaces():
+    for prefix, uri in ns.items():
+        ET.register_namespace(prefix, uri)
+
+# raised while decompressing a damaged member of a zip file
+CORRUPTMEMBER = (BadZipFile, zlib.error, EOFError)
+
+BASICDATATAG = "{{{0}}}BasicData".format(ns["edf"])
+ROOMTAG = "{{{0}}}Room".format(ns["edf"])
+ALLOTMENTTAG = "{{{0}}}Allotment".format(ns["atmt"])
+
+
+class Checker(object):
+    """Runs the selected checks (see edfregistry) over one HotelEDF and
+    its AllotmentEDF. selection holds the arguments of Registry.
+    check() does not log anything but returns the findings, the
+    counters and the codes from BasicData (see check_basicdata) of that
+    file, so the work can be done in another process
+    and merged by the caller.
+
+    Room, allotmentnode and element checks are run by the engine (see
+    edfengine) in a single walk over each document, then the hotel,
+    allotment and file checks are run in registry order.
+
+    With stream=True the files are parsed incrementally. Each Room is
+    emptied and each Allotment element loses its children and its
+    Pattern after its checks, the other checks get the remaining
+    skeleton of the document.
+
+    If a ResultCache is passed, files whose findings are in the cache
+    are not parsed at all.
+
+    Messages below level are counted but not kept, so their text and
+    snippet are never produced. Snippets are shortened to snippetlimit
+    characters (see edferrors.serialize).
+
+    With profile=True the checks and files are timed (see edfprofile),
+    take_profile() returns what has been measured since its last call.
+
+    With availability=True a summary of the allotment patterns (see
+    edfpattern) is added as INFO finding for every AllotmentEDF.
+
+    A check call which takes longer than checktimeout seconds is
+    interrupted and reported as CRITICAL CheckTimeout (see
+    edfsupervise). This needs the main thread, elsewhere checks are
+    not interrupted."""
+    def __init__(self, source, stream=False, cache=None, selection=None, level=logging.NOTSET, snippetlimit=None, profile=False, availability=False, checktimeout=None):
+        self.source = source
+        self.stream = stream
+        self.cache = cache
+        self.level = level
+        self.snippetlimit = snippetlimit
+        self.availability = availability and level <= logging.INFO
+        if selection is None:
+            selection = dict()
+        self.registry = Registry(**selection)
+        self.engine = Engine(self.registry)
+        self.documentchecks = [c for c in self.registry.checks if c.kind in ("hotel", "allotment", "file")]
+        self.fingerprint = None
+        if cache is not None:
+            self.fingerprint = fingerprint(self.registry.checks, __version__, {"stream": stream, "checks": self.registry.names(), "level": level, "snippetlimit": snippetlimit, "availability": self.availability}, modules=(__name__,))
+        self.profiler = None
+        if profile is True:
+            self.profiler = Profiler()
+            for check in self.registry.checks:
+                check.function = self.profiler.wrap(check)
+        self.checktimeout = checktimeout
+        if checktimeout is not None and not edfsupervise.can_interrupt():
+            self.checktimeout = None
+        self.timedout = list()
+        if self.checktimeout is not None or edfsupervise.current is not None:
+            for check in self.registry.checks:
+                check.function = edfsupervise.guard(check.function, check.name, self.checktimeout, self.timedout)
+
+    def take_profile(self):
+        if self.profiler is None:
+            return None
+        return self.profiler.take()
+
+    def check(self, filename):
+        if self.profiler is None:
+            return self.checkcached(filename)
+        try:
+            size = self.source.size(filename)
+        except CORRUPTMEMBER + (OSError, KeyError):
+            size = 0
+        self.profiler.start_file(filename, size)
+        try:
+            return self.checkcached(filename)
+        finally:
+            self.profiler.end_file()
+
+    def checkcached(self, filename):
+        if self.cache is None:
+            return self.checkfile(filename)
+        source = self.source
+        fqn = source.hotelpath(filename)
+        allotmentfilename = source.allotmentpath(filename)
+        key = self.cachekey(filename)
+        if key is not None:
+            result = self.cache.get(key, fqn, allotmentfilename)
+            if result is not None:
+                return result
+        edfvalues.start_recording()
+        records, counters, codes = self.checkfile(filename)
+        # findings of an interrupted check depend on the machine
+        if key is not None and "CheckTimeout, CRITICAL" not in counters:
+            self.cache.put(key, records, counters, codes, fqn, allotmentfilename, edfvalues.valid_until())
+        return records, counters, codes
+
+    def cachekey(self, filename):
+        """Hashes the HotelEDF and the AllotmentEDF. Returns None if the
+        files cannot be read, checkfile() will report that."""
+        try:
+            with self.source.open_hotel(filename) as f:
+                hotelhash = filehash(f)
+            allotmenthash = ""
+            if self.source.has_allotment(filename):
+                with self.source.open_allotment(filename) as f:
+                    allotmenthash = filehash(f)
+        except CORRUPTMEMBER + (OSError,):
+            return None
+        return self.cache.key(filename, hotelhash, allotmenthash, self.fingerprint)
+
+    def checkfile(self, filename):
+        records = list()
+        counters = dict()
+        codes = dict()
+        del self.timedout[:]
+        source = self.source
+        fqn = source.hotelpath(filename)
+        allotmentfilename = source.allotmentpath(filename)
+
+        def report(e, check, room):
+            log_exception(e, header_for(e, fqn, allotmentfilename, room), counters, check.name, records=records, room=room, minlevel=self.level, snippetlimit=self.snippetlimit)
+
+        if self.profiler is not None:
+            report = self.profiler.timed("reporting findings and snippets", report)
+
+        basicdata = list()
+
+        def hotelcallback(elem, tags):
+            if elem.tag == BASICDATATAG and len(tags) == 2 and not basicdata:
+                # a second BasicData is reported by check_structure
+                basicdata.append(elem)
+                codes["code"] = elem.get("Code")
+                codes["tocode"] = elem.get("TourOperatorCode")
+                # for the checks across the files (see edfindex)
+                codes["giatacode"] = elem.findtext("edf:References/edf:GiataCode", None, ns)
+                codes["hotelkey"] = elem.findtext("edf:References/edf:HotelKey", None, ns)
+                self.check_basicdata(elem, filename, fqn, records)
+            elif self.stream is True and elem.tag == ROOMTAG:
+                del elem[:]
+
+        def allotmentcallback(elem, tags):
+            if elem.tag == ALLOTMENTTAG:
+                # the other attributes are small and needed by the
+                # checks comparing allotments with each other
+                elem.attrib.pop("Pattern", None)
+                del elem[:]
+                elem.text = elem.tail = None
+
+        def rollback(mark, savedcounters):
+            # a document which cannot be parsed to the end has no
+            # findings, streaming must not report what it found before
+            del records[mark:]
+            counters.clear()
+            counters.update(savedcounters)
+            edfpattern.start_recording()
+
+        edfpattern.start_recording()
         try:
-            hotelroot = ET.parse(fqn)
-            allotmentfilename = os.path.join(allotmentdir, filename)
+            with source.open_hotel(filename) as f:
+                if self.stream is True:
+                    hotelroot = self.engine.stream(f, "edf", report, hotelcallback)
+                else:
+                    hotelroot = ET.parse(f)
+                    self.engine.walk(hotelroot, "edf", report, hotelcallback)
+            if len(basicdata) == 0:
+                self.check_basicdata(None, filename, fqn, records)
             allotmentroot = None
-            if os.path.exists(allotmentfilename):
+            if source.has_allotment(filename):
+                mark = len(records)
+                savedcounters = dict(counters)
                 try:
-                    allotmentroot = ET.parse(allotmentfilename)
+                    with source.open_allotment(filename) as f:
+                        if self.stream is True:
+                            allotmentroot = self.engine.stream(f, "atmt", report, allotmentcallback)
+                        else:
+                            allotmentroot = ET.parse(f)
+                            self.engine.walk(allotmentroot, "atmt", report)
                 except ET.ParseError:
-                    logging.error("AllotmentEDF {0} could not be parsed. May be file is empty or xml is not valid".format(allotmentfilename))
+                    rollback(mark, savedcounters)
+                    records.append(Finding(logging.ERROR, "AllotmentEDF {0} could not be parsed. May be file is empty or xml is not valid".format(allotmentfilename)))
+                except CORRUPTMEMBER as e:
+                    rollback(mark, savedcounters)
+                    records.append(Finding(logging.ERROR, "AllotmentEDF {0} is corrupted in the zip file: {1}".format(allotmentfilename, e)))
             else:
-                logging.error('Missing AllotmentEDF for {0}'.format(filename))
+                records.append(Finding(logging.ERROR, 'Missing AllotmentEDF for {0}'.format(filename)))
+            if self.availability is True:
+                self.summarize_availability(allotmentfilename, records)
         except ET.ParseError:
-            logging.error("HotelEDF {0} could not be parsed. Either the file is empty or xml is not valid".format(fqn))
+            rollback(0, dict())
+            codes.clear()
+            records.append(Finding(logging.ERROR, "HotelEDF {0} could not be parsed. Either the file is empty or xml is not valid".format(fqn)))
+        except CORRUPTMEMBER as e:
+            rollback(0, dict())
+            codes.clear()
+            records.append(Finding(logging.ERROR, "HotelEDF {0} is corrupted in the zip file: {1}".format(fqn, e)))
         else: 
-            basicdatanode = hotelroot.find("edf:BasicData", ns)
-            if basicdatanode is None:
-                logging.error("Missing BasicData section in HotelEDF {0}".format(fqn))
-            else:
-                code = basicdatanode.get("Code")
-                tocode = basicdatanode.get("TourOperatorCode")
-                filekey = basicdatanode.get("FileKey")
-                separator = ""
-                if filekey is not None:
-                    separator = "_"
-                else:
-                    filekey = ""
-                tmpl = "EDF----{0}-{1}{2}{3}.xml"
-                correctfilename = tmpl.format(tocode, code, separator, filekey)
-                if correctfilename != filename:
-                    logging.warning("Filename {0} does not match naming convention. Should be {1}".format(filename, correctfilename))
-            for function in functions:
+            for check in self.documentchecks:
                 try:
-                    if function[0].startswith("hotel"):
-                        function[1](hotelroot)
-                    elif function[0].startswith("allotment"):
-                        function[1](allotmentroot)
-                    elif function[0].startswith("room"):
-                        for roomnode in hotelroot.findall("edf:SellingData/edf:Rooms/edf:Room", ns):
-                            roomcode = roomnode.get("Code")
-                            try:
-                                function[1](roomnode)
-                            except RoomError as e:
-                                log_exception(e, "in room {0} of HotelEDF {1}:".format(roomcode, fqn), counters, function[0], debug=debug)
-                            except ChargeBlockError as e:
-                                log_exception(e, "in ChargeBlock in Room {0} of HotelEDF {1}:".format(roomcode, fqn), counters, function[0], debug=debug)
-                            except OccupancyError as e:
-                                log_exception(e, "in Occupancy in Room {0} of HotelEDF {1}:".format(roomcode, fqn), counters, function[0], debug=debug)
-                            except (HotelEdfError, AllotmentEdfError, SellingDataError):
-                                pass
+                    kind = check.kind
+                    if kind == "hotel":
+                        check.function(hotelroot)
+                    elif kind == "allotment":
+                        check.function(allotmentroot)
                     else:
-                        function[1](hotelroot, allotmentroot)
-                except HotelEdfError as e:
-                    log_exception(e, "in HotelEDF {0}:".format(fqn), counters, function[0], debug=debug)
-                except AllotmentEdfError as e:
-                    log_exception(e, "in AllotmentEDF {0}:".format(allotmentfilename), counters, function[0], debug=debug)
-                except BasicDataError as e:
-                    log_exception(e, "in BasicData section of HotelEDF {0}:".format(fqn), counters, function[0], debug=debug)
-                except SellingDataError as e:
-                    log_exception(e, "in SellingData section of HotelEDF {0}:".format(fqn), counters, function[0], debug=debug)
-                except RoomError as e:
-                    log_exception(e, "in the rooms of HotelEDF {0}:".format(fqn), counters, function[0], debug=debug)
-                except ChargeBlockError as e:
-                    log_exception(e, "in ChargeBlock in Room {0} of HotelEDF {1}:".format(e.room, fqn), counters, function[0], debug=debug)
-                except OccupancyError as e:
-                    log_exception(e, "in Occupancy in Room {0} of HotelEDF {1}:".format(e.room, fqn).format(e.room, fqn), counters, function[0], debug=debug)
+                        check.function(hotelroot, allotmentroot)
+                except EdfError as e:
+                    room = getattr(e, "room", None)
+                    report(e, check, room)
+        for name, where in self.timedout:
+            merge_counters(counters, {"CheckTimeout, CRITICAL": 1})
+            records.append(Finding(logging.CRITICAL, "in HotelEDF {0}:".format(fqn), "CheckTimeout", name, None,
+                                   [Message(logging.CRITICAL, "Check {0} timed out after {1} s on {2}, its findings there are missing".format(name, self.checktimeout, where), None)]))
+        return records, counters, codes
+
+    def summarize_availability(self, allotmentfilename, records):
+        availability = edfpattern.availability()
+        if availability is not None:
+            records.append(Finding(logging.INFO, "Availability in AllotmentEDF {0}: {1} allotments with {2} days, {3} days without availability ({4:.1f}%), {5} patterns with invalid characters".format(
+                allotmentfilename, availability.allotments, availability.days, availability.zerodays,
+                100.0 * availability.zerodays / availability.days if availability.days else 0, availability.invalid)))
+
+    def check_basicdata(self, basicdatanode, filename, fqn, records):
+        if basicdatanode is None:
+            records.append(Finding(logging.ERROR, "Missing BasicData section in HotelEDF {0}".format(fqn)))
+        else:
+            code = basicdatanode.get("Code")
+            tocode = basicdatanode.get("TourOperatorCode")
+            filekey = basicdatanode.get("FileKey")
+            separator = ""
+            if filekey is not None:
+                separator = "_"
+            else:
+                filekey = ""
+            tmpl = "EDF----{0}-{1}{2}{3}.xml"
+            correctfilename = tmpl.format(tocode, code, separator, filekey)
+            if correctfilename != filename:
+                records.append(Finding(logging.WARNING, "Filename {0} does not match naming convention. Should be {1}".format(filename, correctfilename)))
+
+
+# result of iterate(): ERROR and CRITICAL messages, HotelEDF files
+# checked and HotelEDF files in the delivery
+Outcome = collections.namedtuple("Outcome", "errors checked total")
+
+_checker = None
+
+def _init_worker(source, options):
+    """Pool initializer, loads the plugins once per worker process."""
+    global _checker
+    register_namespaces()
+    _checker = Checker(source, **options)
+
+def _check_worker(filename):
+    return _checker.check(filename), _checker.take_profile()
+
+_servicecheckers = collections.OrderedDict()
+_serviceoptions = None
+
+def _init_service(options):
+    """Pool initializer of the HTTP service (see edfserve)."""
+    global _serviceoptions
+    register_namespaces()
+    Registry()
+    _serviceoptions = options
+
+def _check_service_worker(zipfilename, filename, day):
+    """Checks filename of the delivery zipfilename against the date day.
+    The Checkers of the last few deliveries are kept, as the files of
+    concurrent deliveries are interleaved in the pool. They are looked up
+    by the identity of the zip file, so a zip file replaced at the same
+    path is opened again."""
+    stat = os.stat(zipfilename)
+    key = (zipfilename, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    checker = _servicecheckers.get(key)
+    if checker is None:
+        checker = Checker(ZipSource(zipfilename), **_serviceoptions)
+        _servicecheckers[key] = checker
+        while len(_servicecheckers) > 8:
+            _servicecheckers.popitem(last=False)[1].source.close()
+    else:
+        _servicecheckers.move_to_end(key)
+    edfvalues.reset_today(day)
+    return checker.check(filename)
+
+def checkfiles(source, edfnames, jobs=1, options=None, progressbar=None, profiler=None, prefetch=0, supervise=None):
+    """Checks the files in edfnames and yields the filename, the findings,
+    the counters and the BasicData codes of each file in the order of
+    edfnames. If a profiler is passed, the checks are profiled and
+    the measurements merged into it. In a serial run up to prefetch
+    files are read ahead (see edfsource.PrefetchSource).
+
+    If supervise holds the filetimeout and memorylimit arguments of
+    edfsupervise.Supervisor, the files are checked by supervised worker
+    processes, even if jobs is 1. A file which exceeds a limit gets a
+    CRITICAL finding instead of its findings."""
+    if options is None:
+        options = dict()
+    if profiler is not None:
+        options = dict(options, profile=True)
+    if supervise is not None:
+        supervisor = edfsupervise.Supervisor(jobs, _init_worker, (source, options), _check_worker, **supervise)
+        for filename, result, failure in supervisor.run(edfnames):
+            if progressbar is not None:
+                progressbar.inc()
+            if failure is not None:
+                header = edfsupervise.describe(failure, source.hotelpath(filename), supervise.get("memorylimit"))
+                yield filename, [Finding(logging.CRITICAL, header)], dict(), dict()
+                continue
+            (records, filecounters, codes), profile = result
+            if profile is not None:
+                profiler.merge(profile)
+            yield filename, records, filecounters, codes
+    elif jobs > 1:
+        # imap returns the results in the order of edfnames, so the
+        # report is the same as the one of a serial run
+        chunksize = max(1, min(16, len(edfnames) // (jobs * 4)))
+        with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(source, options)) as pool:
+            for filename, ((records, filecounters, codes), profile) in zip(edfnames, pool.imap(_check_worker, edfnames, chunksize)):
+                if profile is not None:
+                    profiler.merge(profile)
+                if progressbar is not None:
+                    progressbar.inc()
+                yield filename, records, filecounters, codes
+    else:
+        reader = None
+        if prefetch > 0:
+            reader = source = PrefetchSource(source, edfnames, prefetch)
+        checker = Checker(source, **options)
+        try:
+            for filename in edfnames:
+                if progressbar is not None:
+                    progressbar.inc()
+                records, filecounters, codes = checker.check(filename)
+                if profiler is not None:
+                    profiler.merge(checker.take_profile())
+                yield filename, records, filecounters, codes
+        finally:
+            if reader is not None:
+                reader.stop()
+
+def get_source(workdir=None, source=None):
+    if source is None:
+        workdir = get_workdir(workdir)
+        source = FolderSource(get_hotelonlydir(workdir), get_allotmentdir(workdir))
+    return source
+
+def iterate(workdir=None, debug=False, jobs=1, source=None, stream=False, cache=None, selection=None, level=logging.NOTSET, snippetlimit=None, sink=None, profiler=None, availability=False, quiet=False, sample=None, seed=0, maxerrors=None, prefetch=0, checktimeout=None, supervise=None, aggregate=False, detail=False):
+    """Check all EDF files in workdir, or in source if a source
+    (see edfsource) is passed. The findings are also written to sink
+    (see edfsink) if one is passed, the checks are profiled if a
+    profiler (see edfprofile) is passed. With quiet=True no progress
+    bar is shown. At the end AllotmentEDF without HotelEDF and codes
+    used by several HotelEDF are reported (see edfindex).
+
+    sample is the (count, fraction) of files to check (see edfsample),
+    with maxerrors the run stops after that many ERROR and CRITICAL
+    messages. In a serial run up to prefetch files are read ahead of
+    the file being checked. checktimeout and supervise limit the time
+    and memory a check or a file may take (see Checker and
+    checkfiles()). With aggregate=True the findings of the checks are
+    summarized (see edfsummary) at the end of the report instead of
+    being written for every file, with detail=True as well. Returns an
+    Outcome."""
+    source = get_source(workdir, source)
+    edfnames = source.hotelnames()
+    total = len(edfnames)
+    logging.info('{0} files found in {1}'.format(len(edfnames), source.hotelonlydir))
+    allotmentnames = source.allotmentnames()
+    logging.info('{0} files found in {1}'.format(len(allotmentnames), source.allotmentdir))
+    if len(edfnames) != len(allotmentnames):
+        logging.warning('There are different numbers of HotelEDF and AllotmentEDF')
+    if sample is not None:
+        edfnames = edfsample.sample(source, edfnames, *sample, seed=seed)
+    progressbar = None
+    if quiet is False:
+        progressbar = Progressbar(len(edfnames))
+    counters = dict()
+    options = {"stream": stream, "cache": cache, "selection": selection, "level": level, "snippetlimit": snippetlimit, "availability": availability, "checktimeout": checktimeout}
+    log_selection(selection)
+    report = edfreport.ReportWriter(debug)
+    summary = None
+    if aggregate is True:
+        summary = Summary(snippetlimit=snippetlimit or 1000, seed=seed)
+    write = get_writer(sink, debug, profiler, report, summary, detail)
+    index = DeliveryIndex()
+    errors = 0
+    checked = 0
+    try:
+        for filename, records, filecounters, codes in checkfiles(source, edfnames, jobs, options, progressbar, profiler, prefetch, supervise):
+            write(filename, codes, records)
+            merge_counters(counters, filecounters)
+            index.add(filename, codes)
+            errors += count_errors(records)
+            checked += 1
+            if maxerrors is not None and errors >= maxerrors:
+                # leaving the loop stops the workers
+                break
+        records = orphan_findings(source) + index.findings()
+        write(None, dict(), records)
+        errors += count_errors(records)
+    finally:
+        report.close()
+    if summary is not None:
+        log_records(summary.findings())
+    close_cache(cache, jobs)
+    if checked < total:
+        if checked < len(edfnames):
+            reason = "stopped after {0} errors".format(errors)
+        else:
+            reason = "sample"
+        logging.warning("Partial check ({0}): {1} of {2} HotelEDF files were checked, the totals below only cover these files".format(reason, checked, total))
+    for key, value in counters.items():
+        logging.info("{0}: {1}".format(key, value))
+    return Outcome(errors, checked, total)
+
+def count_errors(records):
+    """Returns the number of ERROR and CRITICAL messages in records,
+    a finding without messages counts as one message."""
+    errors = 0
+    for finding in records:
+        if len(finding.messages) == 0:
+            errors += finding.level >= logging.ERROR
+        else:
+            errors += sum(1 for message in finding.messages if message.level >= logging.ERROR)
+    return errors
+
+def get_writer(sink=None, debug=False, profiler=None, report=None, summary=None, detail=True):
+    """Returns a function writing the findings of a file to the report,
+    through report (see edfreport) if one is passed, and to sink. If a
+    summary (see edfsummary) is passed, the findings are added to it and
+    with detail=False only those edbug reports itself go to the report."""
+    def write(filename, codes, records):
+        if summary is not None and filename is not None:
+            summary.add(filename, codes, records)
+            if detail is False:
+                records = [finding for finding in records if finding.exception is None]
+        if report is not None:
+            report.write(records)
+        else:
+            log_records(records, debug=debug)
+        if sink is not None:
+            sink.write(filename, codes, records)
+    if profiler is not None:
+        write = profiler.timed("writing the report", write)
+    return write
+
+def log_selection(selection):
+    if selection:
+        registry = Registry(**selection)
+        if len(registry.checks) < len(registry.available):
+            logging.info("{0} of {1} checks selected: {2}".format(len(registry.checks), len(registry.available), ", ".join(registry.names())))
+
+def close_cache(cache, jobs):
+    if cache is not None:
+        # hits and misses are counted in the workers, so they are only
+        # known in a serial run
+        if jobs == 1:
+            logging.info("{0} files taken from the result cache, {1} files checked".format(cache.hits, cache.misses))
+        cache.evict()
+        cache.close()
+
+def iteratedelta(baseline, workdir=None, debug=False, jobs=1, source=None, stream=False, cache=None, selection=None, level=logging.NOTSET, snippetlimit=None, sink=None, profiler=None, availability=False, quiet=False, checktimeout=None, supervise=None):
+    """Check only the HotelEDF/AllotmentEDF pairs which were added or
+    changed since the baseline delivery. For changed pairs the findings
+    are compared with those of the baseline and reported as new,
+    unchanged or fixed. The codes of unchanged files are not known, so
+    only AllotmentEDF without HotelEDF are reported across files.
+    Returns an Outcome, fixed findings are not counted as errors."""
+    source = get_source(workdir, source)
+    delta = edfdelta.compare(source, baseline)
+    logging.info("Compared {0} with baseline {1}: {2} added, {3} changed, {4} removed, {5} unchanged HotelEDF".format(source.hotelonlydir, baseline.hotelonlydir, len(delta.added), len(delta.changed), len(delta.removed), len(delta.unchanged)))
+    for filename in delta.removed:
+        logging.info("HotelEDF {0} was removed since the baseline".format(filename))
+    edfnames = delta.added + delta.changed
+    progressbar = None
+    if quiet is False:
+        progressbar = Progressbar(len(edfnames) + len(delta.changed))
+    counters = dict()
+    deltacounters = {"new": 0, "unchanged": 0, "fixed": 0}
+    options = {"stream": stream, "cache": cache, "selection": selection, "level": level, "snippetlimit": snippetlimit, "availability": availability, "checktimeout": checktimeout}
+    log_selection(selection)
+    oldfindings = dict()
+    errors = 0
+    for filename, records, filecounters, codes in checkfiles(baseline, delta.changed, jobs, options, progressbar, profiler, supervise=supervise):
+        oldfindings[filename] = records
+    report = edfreport.ReportWriter(debug)
+    write = get_writer(sink, debug, profiler, report)
+    try:
+        for filename, records, filecounters, codes in checkfiles(source, edfnames, jobs, options, progressbar, profiler, supervise=supervise):
+            newpaths = (source.hotelpath(filename), source.allotmentpath(filename))
+            oldpaths = (baseline.hotelpath(filename), baseline.allotmentpath(filename))
+            new, unchanged, fixed = edfdelta.diff(records, oldfindings.get(filename, list()), newpaths, oldpaths)
+            write(filename, codes, new + unchanged + fixed)
+            for key, findings in (("new", new), ("unchanged", unchanged), ("fixed", fixed)):
+                deltacounters[key] += edfdelta.count(findings)
+            merge_counters(counters, filecounters)
+            errors += count_errors(new + unchanged)
+        records = orphan_findings(source)
+        write(None, dict(), records)
+        errors += count_errors(records)
+    finally:
+        report.close()
+    close_cache(cache, jobs)
+    logging.info("Findings in added and changed HotelEDF: {new} new, {unchanged} unchanged, {fixed} fixed".format(**deltacounters))
     for key, value in counters.items():
         logging.info("{0}: {1}".format(key, value))
-                        
+    return Outcome(errors, len(edfnames), len(edfnames))
+
+def opensource(path):
+    """Returns a source for a delivery, which may be a zip file or a
+    folder with unpacked data."""
+    if os.path.isfile(path):
+        return openzipfile(path)
+    return FolderSource(get_hotelonlydir(path), get_allotmentdir(path))
+
+def init_watcher():
+    """Pool initializer of the watch mode (see edfwatch), imports and
+    prepares the plugins once per worker process."""
+    register_namespaces()
+    Registry()
+
+def validate(zipfilename, reportfile, options):
+    """Checks the delivery zipfilename straight from the zip file and
+    writes the report to reportfile. options holds the arguments of
+    iterate(), except that cache is the name of the cache file and
+    cachesize its size in bytes. Returns False if the delivery could
+    not be checked, the reason is in the report. Nothing is raised, so
+    a bad delivery does not stop the watch mode. Every delivery is
+    checked against the day it is started on, the workers of the watch
+    mode run for days."""
+    edfvalues.reset_today()
+    options = dict(options)
+    cachefile = options.pop("cache", None)
+    cachesize = options.pop("cachesize", 512 * 1024 * 1024)
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    handler = logging.FileHandler(reportfile, mode="w")
+    handler.setFormatter(logging.Formatter(edfreport.LOGFORMAT))
+    for h in handlers:
+        root.removeHandler(h)
+    root.addHandler(handler)
+    source = None
+    try:
+        logging.info("Checking delivery {0}".format(zipfilename))
+        source = openzipfile(zipfilename)
+        cache = None
+        if cachefile is not None:
+            cache = ResultCache(cachefile, maxsize=cachesize)
+        iterate(source=source, jobs=1, cache=cache, quiet=True, **options)
+    except DeliveryError as e:
+        logging.critical("{0}. The delivery was not checked".format(e))
+        return False
+    except Exception:
+        logging.exception("Checking {0} failed".format(zipfilename))
+        return False
+    finally:
+        if source is not None:
+            source.close()
+        root.removeHandler(handler)
+        handler.close()
+        for h in handlers:
+            root.addHandler(h)
+    return True
+
+def write_profile(profiler, filename="-"):
+    lines = profiler.summary()
+    if filename == "-":
+        print("\n".join(lines))
+    else:
+        with open(filename, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
 def cleanup(workdir):
     workdir = get_workdir(workdir)
     try:
@@ -199,27 +756,142 @@ def cleanup(workdir):
         pass
 
 if __name__ == '__main__':
-    for prefix, uri in ns.items():
-        ET.register_namespace(prefix, uri)
+    register_namespaces()
     import argparse
     ap = argparse.ArgumentParser(description=__doc__)
     ap.add_argument('-Z', '--zipfile', help='Name of the EDF zip file')
+    ap.add_argument('-ZN', '--zipnative', action='store_true', help='Check the EDF files straight from the zip file given with -Z instead of unpacking it into the work directory.')
     ap.add_argument('-F', '--folder', help='Folder with EDF files. if -Z option is used the file is unpacked into this folder. If the folder exists it will be removed with all its contents previously')
     ap.add_argument('-L', '--logfile', default=datetime.date.today().strftime('report_%Y-%m-%d.txt'), help='Name of the Log file debug messages are written to')
     ap.add_argument('-LL', '--loglevel', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default="INFO", help='Only messages with this level or higher are logged to the report.')
     ap.add_argument('-LM', '--logmode', choices=['a', 'w'], default='a', help='a for appending to existing file, w for overriding an existing file.')
     ap.add_argument('-CU', '--cleanup', action='store_true', help="delete work directory at the end.")
     ap.add_argument('-DG', '--debug', action='store_true', help="Log additional debug information. This currently only logs the the name of the function that raised the error.")
+    ap.add_argument('-S', '--stream', action='store_true', help="Parse the EDF files incrementally. Rooms and Allotments are checked as soon as they are parsed and dropped afterwards, so memory use does not grow with the size of the files.")
+    ap.add_argument('-B', '--baseline', help="Previous delivery, a zip file or a folder. Only HotelEDF/AllotmentEDF pairs which were added or changed since then are checked and findings are reported as new, unchanged or fixed.")
+    ap.add_argument('-C', '--cache', help="Name of a result cache file. Findings of HotelEDF/AllotmentEDF pairs which did not change since a previous run are taken from the cache without parsing the files.")
+    ap.add_argument('-CS', '--cachesize', type=int, default=512, help="Maximum size of the result cache in MB. The least recently used entries are removed at the end of a run.")
+    ap.add_argument('-O', '--only', help="Comma separated list of checks to run. Each entry is a module name (check_allotments), a function name (room_checkboard) or module.function, shell wildcards like room_* are allowed.")
+    ap.add_argument('-SK', '--skip', help="Comma separated list of checks not to run, same format as --only.")
+    ap.add_argument('-ML', '--minlevel', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help="Only run checks which can report messages with this level or higher. Checks which can only report messages below --loglevel are never run.")
+    ap.add_argument('-MC', '--maxcost', type=int, help="Only run checks with this cost or lower. Most checks have cost 1, the expensive ones declare a higher cost.")
+    ap.add_argument('-SL', '--snippetlimit', type=int, help="Shorten the xml snippets in the report to this number of characters. Long attribute values like Allotment patterns are shortened first.")
+    ap.add_argument('-FS', '--findings', help="Also write every finding as a record to this file. Names ending in .jsonl are written as JSON lines, all others as SQLite database with indexes on TourOperatorCode, hotel code, level and check function.")
+    ap.add_argument('-P', '--profile', nargs='?', const='-', help="Measure the time spent in each check and parsing each file and the peak memory per file. A ranked summary is written to the given file or printed at the end of the run.")
+    ap.add_argument('-AV', '--availability', action='store_true', help="Add a summary of the Allotment patterns of every AllotmentEDF to the report: number of allotments and days and days without availability.")
+    ap.add_argument('-AG', '--aggregate', action='store_true', help="Write a summary of the findings at the end of the report instead of every finding: each kind of message (exception, check function, message and level) with the number of messages, files and hotels and a few examples with snippets.")
+    ap.add_argument('--aggregate-detail', dest='aggregatedetail', action='store_true', help="With --aggregate, also write every finding to the report as without it.")
+    ap.add_argument('-J', '--jobs', type=int, default=1, help="Number of worker processes checking the EDF files in parallel. 0 uses one process per CPU. The report is the same as with a single process.")
+    ap.add_argument('-W', '--watch', metavar='DIR', help="Keep running and check every zip file put into DIR. A file is checked when its size and modification time did not change for a while, each delivery gets its own report. With --jobs several deliveries are checked at the same time.")
+    ap.add_argument('-WR', '--watchreports', metavar='DIR', help="Folder the reports of --watch are written to, by default the watched folder.")
+    ap.add_argument('-WI', '--watchinterval', type=float, default=5.0, help="Seconds between two scans of the folder given with --watch.")
+    ap.add_argument('-PF', '--prefetch', type=int, default=0, metavar='DEPTH', help="Read up to DEPTH HotelEDF/AllotmentEDF pairs ahead on a background thread while the current pair is checked. Helps on slow or network disks, only used with a single process. The pairs read ahead are kept in memory.")
+    ap.add_argument('--file-timeout', dest='filetimeout', type=float, metavar='SECONDS', help="Check the files in supervised worker processes and stop a file which takes longer than this. The file gets a CRITICAL finding naming the check which was running and the run goes on.")
+    ap.add_argument('--check-timeout', dest='checktimeout', type=float, metavar='SECONDS', help="Interrupt a check which takes longer than this for one element or file and report it as CRITICAL CheckTimeout.")
+    ap.add_argument('--memory-limit', dest='memorylimit', type=int, metavar='MB', help="Limit the memory (address space) of each worker process. A file which needs more gets a CRITICAL finding and the worker is replaced. Implies supervised workers like --file-timeout.")
+    ap.add_argument('--sample', help="Only check a sample of the HotelEDF files, a number of files (500) or a percentage (2%%). The sample is drawn from all tour operators, file sizes and files with and without AllotmentEDF and is the same for the same --seed.")
+    ap.add_argument('--seed', type=int, default=0, help="Seed of the random generator drawing the --sample.")
+    ap.add_argument('--max-errors', dest='maxerrors', type=int, help="Stop after this number of ERROR and CRITICAL messages.")
+    ap.add_argument('--fail-fast', dest='failfast', action='store_true', help="Stop at the first ERROR or CRITICAL message, same as --max-errors 1.")
+    ap.add_argument('--serve', metavar='[HOST]:PORT', help="Run an HTTP service checking uploaded deliveries or zip files on the server with a pool of --jobs worker processes, see manual.txt. The host defaults to 127.0.0.1.")
+    ap.add_argument('--maxdeliveries', type=int, help="Number of deliveries --serve checks at the same time, by default --jobs.")
+    ap.add_argument('--maxqueue', type=int, help="Number of deliveries waiting for --serve before further requests are rejected, by default twice --maxdeliveries.")
+    ap.add_argument('--maxupload', type=int, default=2048, help="Maximum size of an upload to --serve in MB.")
     args = ap.parse_args()
+    if args.watch is not None:
+        for option, value in (("-Z", args.zipfile), ("-B", args.baseline), ("-FS", args.findings), ("-P", args.profile), ("--serve", args.serve)):
+            if value is not None:
+                ap.error("{0} cannot be used with --watch".format(option))
+    sample = None
+    if args.sample is not None:
+        try:
+            sample = edfsample.parse_size(args.sample)
+        except ValueError as e:
+            ap.error("--sample: {0}".format(e))
+    if args.baseline is not None:
+        for option, value in (("--sample", args.sample), ("--max-errors", args.maxerrors), ("--fail-fast", args.failfast or None), ("-AG", args.aggregate or None)):
+            if value is not None:
+                ap.error("{0} cannot be used with -B".format(option))
+    if args.serve is not None:
+        for option, value in (("-Z", args.zipfile), ("-B", args.baseline), ("-FS", args.findings), ("-P", args.profile), ("-C", args.cache), ("-AG", args.aggregate or None)):
+            if value is not None:
+                ap.error("{0} cannot be used with --serve".format(option))
     numeric_level = getattr(logging, args.loglevel.upper(), None)
-    logformat = '%(asctime)s %(levelname)-8s %(message)s'
+    logformat = edfreport.LOGFORMAT
     if not isinstance(numeric_level, int):
         numeric_level = getattr(logging, 'INFO', None)
     logging.basicConfig(filename=args.logfile, filemode=args.logmode, level=numeric_level, format=logformat)
+    source = None
     if args.zipfile is not None:
-        cleanup(args.folder)
-        unpackzipfile(args.zipfile, workdir=args.folder)
-    iterate(workdir=args.folder, debug=args.debug)
+        try:
+            if args.zipnative is True:
+                source = openzipfile(args.zipfile)
+            else:
+                cleanup(args.folder)
+                unpackzipfile(args.zipfile, workdir=args.folder)
+        except DeliveryError as e:
+            logging.critical("{0}. Exiting".format(e))
+            sys.exit(EXIT_UNCHECKED)
+    jobs = args.jobs
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    minlevel = numeric_level
+    if args.minlevel is not None:
+        minlevel = max(minlevel, getattr(logging, args.minlevel))
+    selection = {"minlevel": minlevel, "maxcost": args.maxcost}
+    if args.only is not None:
+        selection["only"] = args.only.split(",")
+    if args.skip is not None:
+        selection["skip"] = args.skip.split(",")
+    if args.watch is not None:
+        options = {"debug": args.debug, "stream": args.stream, "selection": selection, "level": numeric_level, "snippetlimit": args.snippetlimit, "availability": args.availability, "aggregate": args.aggregate, "detail": args.aggregatedetail}
+        if args.cache is not None:
+            options["cache"] = args.cache
+            options["cachesize"] = args.cachesize * 1024 * 1024
+        watcher = Watcher(args.watch, functools.partial(validate, options=options), initializer=init_watcher, reportdir=args.watchreports, jobs=jobs, interval=args.watchinterval)
+        try:
+            watcher.run()
+        except OSError:
+            # logged by the watcher
+            sys.exit(EXIT_UNCHECKED)
+        sys.exit()
+    if args.serve is not None:
+        options = {"stream": args.stream, "selection": selection, "level": numeric_level, "snippetlimit": args.snippetlimit, "availability": args.availability}
+        service = Service(openzipfile, _check_service_worker, initializer=functools.partial(_init_service, options), jobs=jobs, maxdeliveries=args.maxdeliveries, maxqueue=args.maxqueue, maxupload=args.maxupload * 1024 * 1024)
+        service.serve(args.serve)
+        sys.exit()
+    supervise = None
+    if args.filetimeout is not None or args.memorylimit is not None:
+        supervise = {"filetimeout": args.filetimeout, "memorylimit": args.memorylimit * 1024 * 1024 if args.memorylimit is not None else None}
+    cache = None
+    if args.cache is not None:
+        cache = ResultCache(args.cache, maxsize=args.cachesize * 1024 * 1024)
+    sink = None
+    if args.findings is not None:
+        sink = open_sink(args.findings)
+    profiler = None
+    if args.profile is not None:
+        profiler = Profiler(trace=False)
+    if args.baseline is not None:
+        try:
+            baseline = opensource(args.baseline)
+        except DeliveryError as e:
+            logging.critical("{0}. Exiting".format(e))
+            sys.exit(EXIT_UNCHECKED)
+        outcome = iteratedelta(baseline, workdir=args.folder, debug=args.debug, jobs=jobs, source=source, stream=args.stream, cache=cache, selection=selection, level=numeric_level, snippetlimit=args.snippetlimit, sink=sink, profiler=profiler, availability=args.availability, checktimeout=args.checktimeout, supervise=supervise)
+        baseline.close()
+    else:
+        maxerrors = args.maxerrors
+        if args.failfast is True:
+            maxerrors = 1
+        outcome = iterate(workdir=args.folder, debug=args.debug, jobs=jobs, source=source, stream=args.stream, cache=cache, selection=selection, level=numeric_level, snippetlimit=args.snippetlimit, sink=sink, profiler=profiler, availability=args.availability, sample=sample, seed=args.seed, maxerrors=maxerrors, prefetch=args.prefetch, checktimeout=args.checktimeout, supervise=supervise, aggregate=args.aggregate, detail=args.aggregatedetail)
+    if sink is not None:
+        sink.close()
+    if profiler is not None:
+        write_profile(profiler, args.profile)
+    if source is not None:
+        source.close()
     if args.cleanup is True:
         cleanup(args.folder)
+    sys.exit(EXIT_ERRORS if outcome.errors > 0 else EXIT_OK)
     
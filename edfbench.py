@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Benchmark of edbug on a synthetic delivery (see edfgen).
+
+Generates a delivery as zip file, then times unpackzipfile(), a run of
+iterate() over the unpacked files and a profiled run giving the time
+of every check. Throughput is reported in files/s and MB/s of
+uncompressed EDF, memory as peak RSS of the benchmark process and its
+workers. The results are written as JSON, together with the edbug and
+Python versions, so runs of different versions can be compared:
+
+    edfbench.py --hotels 1000 -o bench-1.2.1.json
+    edfbench.py --hotels 1000 -o bench-new.json --compare bench-1.2.1.json
+
+An existing delivery (zip file) can be benchmarked with --delivery, the
+generator arguments are ignored then."""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import datetime
+import tempfile
+import contextlib
+from zipfile import ZipFile
+import edbug
+import edfgen
+import edfreport
+from edfprofile import Profiler
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss():
+    """Returns the peak resident set size in KB of this process and of
+    its terminated children (worker processes), None if the platform
+    cannot tell."""
+    if resource is None:
+        return None, None
+    scale = 1
+    if sys.platform == "darwin":
+        # bytes instead of KB
+        scale = 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+
+
+def deliverysize(zipfilename):
+    """Returns number of HotelEDF files and uncompressed size of all EDF files."""
+    files = 0
+    size = 0
+    with ZipFile(zipfilename) as zf:
+        for info in zf.infolist():
+            if info.filename.endswith(".xml"):
+                size += info.file_size
+                if os.path.dirname(info.filename) == edbug.HOTELONLYDIR:
+                    files += 1
+    return files, size
+
+
+def timed(function, *args, **kwargs):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        function(*args, **kwargs)
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def throughput(wall, cpu, files, size):
+    return {"wall": round(wall, 4), "cpu": round(cpu, 4),
+            "files_per_s": round(files / wall, 2) if wall else None,
+            "mb_per_s": round(size / 1048576 / wall, 3) if wall else None}
+
+
+def run(zipfilename, workdir, jobs=1, stream=False, repeat=1):
+    files, size = deliverysize(zipfilename)
+    results = {"delivery": {"files": files, "mb": round(size / 1048576, 3)}}
+    unpackdir = os.path.join(workdir, "unpacked")
+    best = None
+    for r in range(repeat):
+        shutil.rmtree(unpackdir, ignore_errors=True)
+        measured = timed(edbug.unpackzipfile, zipfilename, workdir=unpackdir)
+        if best is None or measured[0] < best[0]:
+            best = measured
+    results["unpackzipfile"] = throughput(best[0], best[1], files, size)
+    best = None
+    for r in range(repeat):
+        measured = timed(edbug.iterate, workdir=unpackdir, jobs=jobs, stream=stream)
+        if best is None or measured[0] < best[0]:
+            best = measured
+    results["iterate"] = throughput(best[0], best[1], files, size)
+    profiler = Profiler(trace=False)
+    timed(edbug.iterate, workdir=unpackdir, jobs=jobs, stream=stream, profiler=profiler)
+    checks = dict()
+    for name, (calls, wall, cpu) in sorted(profiler.checks.items(), key=lambda item: item[1][1], reverse=True):
+        checks[name] = {"calls": calls, "wall": round(wall, 4), "cpu": round(cpu, 4), "us_per_call": round(1000000 * wall / calls, 2) if calls else None}
+    results["checks"] = checks
+    results["parse"] = round(sum(f[4] for f in profiler.files), 4)
+    rss, childrss = peak_rss()
+    results["peak_rss_kb"] = rss
+    results["peak_rss_workers_kb"] = childrss
+    return results
+
+
+def compare(results, old):
+    """Returns lines with the relative change of the timings against
+    old results, positive values are slower."""
+    lines = ["{0:<40} {1:>10} {2:>10} {3:>8}".format("", "old s", "new s", "change")]
+    pairs = [("unpackzipfile", results["unpackzipfile"]["wall"], old["results"]["unpackzipfile"]["wall"]),
+             ("iterate", results["iterate"]["wall"], old["results"]["iterate"]["wall"])]
+    for name, stats in results["checks"].items():
+        oldstats = old["results"]["checks"].get(name)
+        if oldstats is not None:
+            pairs.append((name, stats["wall"], oldstats["wall"]))
+    for name, new, previous in pairs:
+        change = "{0:+.1f}%".format(100 * (new - previous) / previous) if previous else ""
+        lines.append("{0:<40} {1:>10.4f} {2:>10.4f} {3:>8}".format(name, previous, new, change))
+    return lines
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    edfgen.add_arguments(ap)
+    ap.add_argument('--delivery', help="Benchmark this zip file instead of a generated delivery.")
+    ap.add_argument('-J', '--jobs', type=int, default=1, help="Number of worker processes, see edbug.py -J.")
+    ap.add_argument('-S', '--stream', action='store_true', help="Parse incrementally, see edbug.py -S.")
+    ap.add_argument('-LL', '--loglevel', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default="INFO", help="Level of the report written during the runs.")
+    ap.add_argument('--repeat', type=int, default=1, help="Time unpacking and checking this many times and keep the fastest run.")
+    ap.add_argument('-o', '--output', help="Write the results to this JSON file instead of printing them.")
+    ap.add_argument('--compare', help="JSON file of a previous benchmark to compare with.")
+    args = ap.parse_args()
+    workdir = tempfile.mkdtemp(prefix="edfbench")
+    try:
+        edbug.register_namespaces()
+        logging.basicConfig(filename=os.path.join(workdir, "report.txt"), filemode="w", level=getattr(logging, args.loglevel), format=edfreport.LOGFORMAT)
+        parameters = {"jobs": args.jobs, "stream": args.stream, "loglevel": args.loglevel, "repeat": args.repeat}
+        if args.delivery is not None:
+            zipfilename = args.delivery
+            parameters["delivery"] = args.delivery
+        else:
+            zipfilename = os.path.join(workdir, "delivery.zip")
+            parameters["generator"] = edfgen.get_arguments(args)
+            edfgen.generate(zipfilename, **parameters["generator"])
+        results = run(zipfilename, workdir, jobs=args.jobs, stream=args.stream, repeat=args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    benchmark = {"edbug": edbug.__version__, "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "parameters": parameters, "results": results}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(benchmark, f, indent=2)
+    else:
+        print(json.dumps(benchmark, indent=2))
+    if args.compare is not None:
+        with open(args.compare) as f:
+            print("\n".join(compare(results, json.load(f))), file=sys.stderr)
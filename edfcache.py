@@ -0,0 +1,159 @@
+"""Persistent cache for the findings of HotelEDF/AllotmentEDF pairs.
+
+Entries are keyed by the hashes of both files, the file name and a
+fingerprint of the plugin set, so an unchanged pair is not parsed
+again in the next run. Each entry is committed as soon as it is
+written, an interrupted run continues with the files that are missing.
+The cache is a SQLite database in WAL mode, so worker processes can
+use it at the same time."""
+import os
+import sys
+import json
+import time
+import zlib
+import types
+import sqlite3
+import hashlib
+from edferrors import Finding, Message, place, unplace
+from edfvalues import today
+
+# bump when the format of the stored records changes
+CACHE_FORMAT = 5
+
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def filehash(f, blocksize=1 << 20):
+    h = hashlib.sha256()
+    while True:
+        block = f.read(blocksize)
+        if not block:
+            break
+        h.update(block)
+    return h.hexdigest()
+
+
+def _islocal(modulename):
+    module = sys.modules.get(modulename)
+    modulefile = getattr(module, "__file__", None)
+    return modulefile is not None and os.path.abspath(modulefile).startswith(_ROOT)
+
+
+def dependencies(modulenames):
+    """Returns the names of the modules modulenames and of all modules of
+    edbug (the folder of this module and its plugins) they use, directly
+    or through other modules, found by the module objects, functions and
+    classes in their namespaces."""
+    found = set()
+    pending = [name for name in modulenames if _islocal(name)]
+    while pending:
+        modulename = pending.pop()
+        if modulename in found:
+            continue
+        found.add(modulename)
+        for value in list(vars(sys.modules[modulename]).values()):
+            if isinstance(value, types.ModuleType):
+                name = value.__name__
+            else:
+                name = getattr(value, "__module__", None)
+            if isinstance(name, str) and name not in found and _islocal(name):
+                pending.append(name)
+    return found
+
+
+def fingerprint(checks, version, options, modules=()):
+    """Hash over the edbug version, the options which change the
+    findings and the source of all modules the checks (see edfregistry)
+    come from and of all modules of edbug these and the engine use (see
+    dependencies()), so a change to a helper like edfrules or edfvalues
+    changes the fingerprint without a new version. The source of modules
+    is hashed as well, but not what they use (edbug uses everything)."""
+    h = hashlib.sha256()
+    h.update("{0} {1} {2}".format(version, CACHE_FORMAT, sorted(options.items())).encode("utf-8"))
+    # edfns only holds a dict, which does not tell its module
+    modulenames = dependencies(set(check.function.__module__ for check in checks) | {"edfengine", "edfns"})
+    modulenames.update(name for name in modules if _islocal(name))
+    for modulename in sorted(modulenames):
+        h.update(modulename.encode("utf-8"))
+        with open(sys.modules[modulename].__file__, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class ResultCache(object):
+    def __init__(self, filename, maxsize=512 * 1024 * 1024):
+        self.filename = filename
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_db"] = None
+        return state
+
+    @property
+    def db(self):
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.filename, timeout=60, isolation_level=None)
+            self._pid = os.getpid()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires INTEGER, used REAL, size INTEGER, data BLOB)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        return self._db
+
+    def key(self, filename, hotelhash, allotmenthash, fingerprint):
+        return hashlib.sha256("{0}\n{1}\n{2}\n{3}".format(filename, hotelhash, allotmenthash, fingerprint).encode("utf-8")).hexdigest()
+
+    def get(self, key, hotelpath, allotmentpath):
+        """Returns the records, counters and codes stored for key or None
+        if there is no entry or the entry has expired."""
+        row = self.db.execute("SELECT expires, data FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[0] is not None and row[0] <= today().toordinal()):
+            self.misses += 1
+            return None
+        self.db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        records, counters, codes = json.loads(zlib.decompress(row[1]).decode("utf-8"))
+        # findings without messages have the default () as messages
+        records = [Finding(*r[:5], [Message(*m) for m in r[5]]) if r[5] else Finding(*r[:5]) for r in records]
+        return place(records, (hotelpath, allotmentpath)), counters, codes
+
+    def put(self, key, records, counters, codes, hotelpath, allotmentpath, validuntil=None):
+        """Store the findings of a file. validuntil is the first date
+        the findings may be different. The paths are stored as
+        placeholders, the same delivery may be checked from another
+        folder or zip file next time."""
+        records = unplace(records, (hotelpath, allotmentpath))
+        data = zlib.compress(json.dumps([records, counters, codes]).encode("utf-8"))
+        expires = None
+        if validuntil is not None:
+            expires = validuntil.toordinal()
+        self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", (key, expires, time.time(), len(data), data))
+
+    def evict(self):
+        """Removes expired entries and then the least recently used ones
+        until the cache is below maxsize."""
+        db = self.db
+        db.execute("DELETE FROM results WHERE expires IS NOT NULL AND expires <= ?", (today().toordinal(),))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total > self.maxsize:
+            removed = 0
+            keys = list()
+            for key, size in db.execute("SELECT key, size FROM results ORDER BY used"):
+                if total - removed <= self.maxsize * 0.9:
+                    break
+                keys.append((key,))
+                removed += size
+            db.execute("BEGIN")
+            db.executemany("DELETE FROM results WHERE key = ?", keys)
+            db.execute("COMMIT")
+        return total
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
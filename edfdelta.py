@@ -0,0 +1,106 @@
+"""Comparison of a delivery with a previous (baseline) delivery.
+
+Pairs of HotelEDF and AllotmentEDF are compared by the CRC-32 and size
+of both files, for zip files these are taken from the central directory
+without reading any member. The findings of changed pairs are compared
+message by message with those of the baseline."""
+import logging
+from collections import Counter, namedtuple
+from edferrors import unplace
+
+Delta = namedtuple("Delta", "added changed removed unchanged")
+
+
+def compare(source, baseline):
+    """Returns a Delta with lists of HotelEDF file names. added, changed
+    and unchanged are in the order of source, removed in the order of
+    baseline."""
+    signatures = source.signatures()
+    oldsignatures = baseline.signatures()
+    added = list()
+    changed = list()
+    unchanged = list()
+    for filename, signature in signatures.items():
+        oldsignature = oldsignatures.get(filename)
+        if oldsignature is None:
+            added.append(filename)
+        elif oldsignature != signature:
+            changed.append(filename)
+        else:
+            unchanged.append(filename)
+    removed = [filename for filename in oldsignatures if filename not in signatures]
+    return Delta(added, changed, removed, unchanged)
+
+
+def _keys(finding):
+    """Returns one key per message of finding, or a single key for a
+    finding without messages. The snippet is not part of the key, any
+    edit or reformatting of the element would report an unchanged
+    message as new and fixed."""
+    if len(finding.messages) == 0:
+        return [(finding.header, finding.level)]
+    return [(finding.header, finding.function, finding.room, m.level, m.message) for m in finding.messages]
+
+
+def _split(finding, keys, seen):
+    """Splits the messages of finding into those whose key is in the
+    Counter seen (which is decremented) and the others."""
+    if len(finding.messages) == 0:
+        if seen[keys[0]] > 0:
+            seen[keys[0]] -= 1
+            return None, finding
+        return finding, None
+    inseen = list()
+    notinseen = list()
+    for key, message in zip(keys, finding.messages):
+        if seen[key] > 0:
+            seen[key] -= 1
+            inseen.append(message)
+        else:
+            notinseen.append(message)
+    return _part(finding, notinseen), _part(finding, inseen)
+
+
+def _part(finding, messages):
+    if len(messages) == 0:
+        return None
+    return finding._replace(level=max(m.level for m in messages), messages=messages)
+
+
+def _tag(finding, tag):
+    return finding._replace(header="[{0}] {1}".format(tag, finding.header))
+
+
+def diff(findings, oldfindings, paths, oldpaths):
+    """Compares the findings of a file with the findings of the same
+    file in the baseline. paths and oldpaths are the (hotel, allotment)
+    paths used in the headers. Returns the new, unchanged and fixed
+    findings with a tag in their headers. Fixed findings are reported at
+    INFO level."""
+    normalized = unplace(findings, paths)
+    oldnormalized = unplace(oldfindings, oldpaths)
+    oldkeys = Counter()
+    for finding in oldnormalized:
+        oldkeys.update(_keys(finding))
+    newkeys = Counter()
+    for finding in normalized:
+        newkeys.update(_keys(finding))
+    new = list()
+    unchanged = list()
+    for finding, normalizedfinding in zip(findings, normalized):
+        added, kept = _split(finding, _keys(normalizedfinding), oldkeys)
+        if added is not None:
+            new.append(_tag(added, "new"))
+        if kept is not None:
+            unchanged.append(_tag(kept, "unchanged"))
+    fixed = list()
+    for finding, normalizedfinding in zip(oldfindings, oldnormalized):
+        gone, kept = _split(finding, _keys(normalizedfinding), newkeys)
+        if gone is not None:
+            messages = [m._replace(level=logging.INFO) for m in gone.messages]
+            fixed.append(_tag(gone._replace(level=logging.INFO, messages=messages), "fixed"))
+    return new, unchanged, fixed
+
+
+def count(findings):
+    return sum(max(1, len(finding.messages)) for finding in findings)
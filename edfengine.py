@@ -0,0 +1,198 @@
+"""Single pass engine for element checks.
+
+Checks register the element paths they are interested in (see
+edfregistry.visit). The engine walks each document once and calls every
+interested check when an element is complete, i.e. in document order of
+the end tags. This is the same whether the document has been parsed
+completely or is parsed incrementally, so both modes report the same
+findings in the same order.
+
+room and allotmentnode functions are run by the engine through an
+adapter registering them for Room and Allotment elements.
+
+A path is a sequence of steps separated by "/", each step is a prefixed
+name from edfns.ns or "*" for any element. It matches an element if the
+last steps of the element's path from the root are the same, e.g.
+"edf:Address/*" matches all children of Address elements."""
+import xml.etree.ElementTree as ET
+from edferrors import EdfError, AllotmentEdfError, BasicDataError, SellingDataError, ChargeBlockError, OccupancyError, RoomError
+from edfns import ns
+
+ROOMPATH = "edf:SellingData/edf:Rooms/edf:Room"
+ALLOTMENTPATH = "atmt:SellingData/atmt:Allotments/atmt:Allotment"
+ROOMTAG = "{{{0}}}Room".format(ns["edf"])
+
+# exceptions reported by the adapted room and allotmentnode functions,
+# all others have always been ignored for these functions
+_ROOMERRORS = (RoomError, ChargeBlockError, OccupancyError, BasicDataError)
+_ALLOTMENTNODEERRORS = (AllotmentEdfError,)
+
+
+def header_for(e, fqn, allotmentfilename, room=None):
+    """Returns the header for the messages of EdfError e."""
+    if isinstance(e, RoomError):
+        if room is None:
+            return "in the rooms of HotelEDF {0}:".format(fqn)
+        return "in room {0} of HotelEDF {1}:".format(room, fqn)
+    if isinstance(e, ChargeBlockError):
+        return "in ChargeBlock in Room {0} of HotelEDF {1}:".format(room, fqn)
+    if isinstance(e, OccupancyError):
+        return "in Occupancy in Room {0} of HotelEDF {1}:".format(room, fqn)
+    if isinstance(e, BasicDataError):
+        return "in BasicData section of HotelEDF {0}:".format(fqn)
+    if isinstance(e, SellingDataError):
+        return "in SellingData section of HotelEDF {0}:".format(fqn)
+    if isinstance(e, AllotmentEdfError):
+        return "in AllotmentEDF {0}:".format(allotmentfilename)
+    return "in HotelEDF {0}:".format(fqn)
+
+
+def compile_path(path):
+    """Returns the steps of path as a tuple of tags in Clark notation,
+    None stands for "*", and the namespace prefix of the path."""
+    steps = list()
+    prefix = None
+    for step in path.split("/"):
+        if step == "*":
+            steps.append(None)
+        else:
+            stepprefix, name = step.split(":")
+            if prefix is None:
+                prefix = stepprefix
+            steps.append("{{{0}}}{1}".format(ns[stepprefix], name))
+    return tuple(steps), prefix
+
+
+class Visitor(object):
+    """A check bound to a compiled path."""
+    __slots__ = ("check", "steps", "errors", "state")
+
+    def __init__(self, check, steps, errors):
+        self.check = check
+        self.steps = steps
+        self.errors = errors
+        self.state = check.state
+
+    def matches(self, tags):
+        steps = self.steps
+        if len(steps) > len(tags):
+            return False
+        for step, tag in zip(reversed(steps), reversed(tags)):
+            if step is not None and step != tag:
+                return False
+        return True
+
+
+class Dispatcher(object):
+    """Visitors of one document type, looked up by the tag of the last
+    step of their path."""
+    def __init__(self):
+        self.bytag = dict()
+        self.wildcard = list()
+
+    def add(self, visitor):
+        if visitor.steps[-1] is None:
+            self.wildcard.append(visitor)
+        else:
+            self.bytag.setdefault(visitor.steps[-1], list()).append(visitor)
+
+    def __bool__(self):
+        return bool(self.bytag) or bool(self.wildcard)
+
+    def visitors(self, tag):
+        visitors = self.bytag.get(tag)
+        if visitors is None:
+            return self.wildcard
+        if self.wildcard:
+            return visitors + self.wildcard
+        return visitors
+
+
+class Engine(object):
+    """Walks HotelEDF and AllotmentEDF documents once and calls the
+    element, room and allotmentnode checks of a registry.
+
+    report is called as report(e, check, room) for every EdfError raised
+    by a check, room is the code of the enclosing Room element."""
+    def __init__(self, registry):
+        self.dispatchers = {"edf": Dispatcher(), "atmt": Dispatcher()}
+        roomsteps, prefix = compile_path(ROOMPATH)
+        allotmentsteps, prefix = compile_path(ALLOTMENTPATH)
+        # registry order is kept for checks visiting the same element
+        for check in registry.checks:
+            if check.kind == "room":
+                self.dispatchers["edf"].add(Visitor(check, roomsteps, _ROOMERRORS))
+            elif check.kind == "allotmentnode":
+                self.dispatchers["atmt"].add(Visitor(check, allotmentsteps, _ALLOTMENTNODEERRORS))
+            elif check.kind == "element":
+                for path in check.paths:
+                    steps, prefix = compile_path(path)
+                    self.dispatchers[prefix].add(Visitor(check, steps, EdfError))
+
+    def visit(self, dispatcher, elem, tags, room, report, state):
+        for visitor in dispatcher.visitors(elem.tag):
+            if visitor.matches(tags):
+                try:
+                    if visitor.state:
+                        visitor.check.function(elem, state)
+                    else:
+                        visitor.check.function(elem)
+                except visitor.errors as e:
+                    report(e, visitor.check, room)
+                except EdfError:
+                    pass
+
+    def walk(self, tree, prefix, report, callback=None):
+        """Visits all elements of a parsed document in the order of their
+        end tags. callback(elem, tags) is called after the checks of each
+        element."""
+        dispatcher = self.dispatchers[prefix]
+        if not dispatcher and callback is None:
+            return
+        root = tree.getroot() if isinstance(tree, ET.ElementTree) else tree
+        tags = [root.tag]
+        rooms = list()
+        state = dict()
+        # iterative post-order traversal, stack entries are (element, iterator over children)
+        stack = [(root, iter(root))]
+        while stack:
+            elem, children = stack[-1]
+            child = next(children, None)
+            if child is not None:
+                tags.append(child.tag)
+                if child.tag == ROOMTAG:
+                    rooms.append(child.get("Code"))
+                stack.append((child, iter(child)))
+                continue
+            stack.pop()
+            room = rooms[-1] if rooms else None
+            self.visit(dispatcher, elem, tags, room, report, state)
+            if callback is not None:
+                callback(elem, tags)
+            if elem.tag == ROOMTAG:
+                rooms.pop()
+            tags.pop()
+
+    def stream(self, f, prefix, report, callback=None):
+        """Parses a document incrementally and visits the elements as soon
+        as they are complete. Returns the document, callback can shrink
+        elements which are not needed anymore."""
+        dispatcher = self.dispatchers[prefix]
+        tags = list()
+        rooms = list()
+        state = dict()
+        it = ET.iterparse(f, events=("start", "end"))
+        for event, elem in it:
+            if event == "start":
+                tags.append(elem.tag)
+                if elem.tag == ROOMTAG:
+                    rooms.append(elem.get("Code"))
+                continue
+            room = rooms[-1] if rooms else None
+            self.visit(dispatcher, elem, tags, room, report, state)
+            if callback is not None:
+                callback(elem, tags)
+            if elem.tag == ROOMTAG:
+                rooms.pop()
+            tags.pop()
+        return ET.ElementTree(it.root)
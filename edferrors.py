@@ -1,27 +1,113 @@
 import xml.etree.ElementTree as ET
 import logging
+from collections import namedtuple
+
+
+# A Finding is what ends up in the report: a header line at the level
+# of its most severe message, followed by the messages. exception,
+# function and room are None for findings edbug reports itself, which
+# consist of the header only. Findings are plain tuples so they can be
+# sent between processes and stored in the result cache. The template
+# of a Message is the message before its args were formatted in (see
+# ErrorMsg), the same for every occurrence (see edfsummary).
+Finding = namedtuple("Finding", "level header exception function room messages", defaults=(None, None, None, ()))
+Message = namedtuple("Message", "level message snippet template", defaults=(None,))
+
+# placeholders for the (hotel, allotment) paths of a file pair in the
+# headers, the result cache and the baseline comparison see the same
+# pair under other paths
+PLACEHOLDERS = ("\x00hotelpath\x00", "\x00allotmentpath\x00")
+
+
+def relocate(findings, paths):
+    """Returns the findings with the file paths in the headers replaced,
+    paths is a list of (old, new) pairs."""
+    relocated = list()
+    for finding in findings:
+        header = finding.header
+        for old, new in paths:
+            header = header.replace(old, new)
+        relocated.append(finding._replace(header=header))
+    return relocated
+
+
+def unplace(findings, paths):
+    """Returns the findings with the (hotel, allotment) paths replaced by
+    PLACEHOLDERS."""
+    return relocate(findings, list(zip(paths, PLACEHOLDERS)))
+
+
+def place(findings, paths):
+    """Returns the findings with PLACEHOLDERS replaced by the (hotel,
+    allotment) paths, the reverse of unplace()."""
+    return relocate(findings, list(zip(PLACEHOLDERS, paths)))
+
+def serialize(node, limit=None):
+    """Returns node as xml. If limit is set, attribute values longer
+    than limit are shortened and the result is cut after limit
+    characters."""
+    if limit is not None:
+        if any(len(value) > limit for value in node.attrib.values()):
+            attrib = dict()
+            for key, value in node.attrib.items():
+                if len(value) > limit:
+                    value = "{0}...({1} chars)".format(value[:limit], len(value))
+                attrib[key] = value
+            shortened = ET.Element(node.tag, attrib)
+            shortened.text = node.text
+            shortened.tail = node.tail
+            shortened.extend(node)
+            node = shortened
+    snippet = ET.tostring(node, encoding="unicode")
+    if limit is not None and len(snippet) > limit:
+        snippet = "{0}...({1} chars)".format(snippet[:limit], len(snippet))
+    return snippet
 
 
 class ErrorMsg(object):
-    def __init__(self, message, level=logging.INFO, node=None):
-        self.message = message
+    """A message with the node it refers to. The node is serialized and
+    args are formatted into message only when the message is written
+    to the report, messages below the report level cost nothing."""
+    def __init__(self, message, level=logging.INFO, node=None, args=None):
+        self.template = message
+        self.args = args
         self.level = level
-        self.snippet = None
-        if node is not None:
-            self.snippet = ET.tostring(node, encoding="unicode")
+        self.node = node
+
+    @property
+    def message(self):
+        if self.args is None:
+            return self.template
+        return self.template.format(*self.args)
+
+    @property
+    def snippet(self):
+        return self.get_snippet()
+
+    def get_snippet(self, limit=None):
+        if self.node is None:
+            return None
+        return serialize(self.node, limit)
+
+
+class DeliveryError(Exception):
+    """The delivery cannot be checked at all, e.g. because the zip file
+    cannot be opened or has the wrong folder structure."""
+    pass
 
 
 class EdfError(Exception):
-    def __init__(self, message, level=logging.INFO, node=None, messages=None):
+    def __init__(self, message, level=logging.INFO, node=None, messages=None, args=None):
         """Pass the node which contains the error 
         to the node parameter. Be sure that node can be serialized,
-        i.e. all its values are strings."""
+        i.e. all its values are strings. If args are passed, message is
+        a format string which is only formatted when it is reported."""
         super().__init__(message)
         if messages is  not None:
             self.messages = messages
         else:
             self.messages = list()
-            self.messages.append(ErrorMsg(message, level, node))
+            self.messages.append(ErrorMsg(message, level, node, args))
     
 class HotelEdfError(EdfError):
     pass
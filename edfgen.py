@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Generator for synthetic EDF deliveries.
+
+Writes HotelEDF and AllotmentEDF files in the hotels/hotelonly and
+hotels/hotelonly/allotment layout of a delivery, into a folder or a zip
+file. The files are valid unless errors are injected: with errorrate
+> 0 every place where one of the plugins looks for a mistake gets one
+with that probability, so every check has something to report.
+
+    edfgen.py /tmp/delivery.zip --hotels 2000 --rooms 10 --errorrate 0.05
+
+The delivery depends only on the arguments and the seed, the dates are
+relative to the day it is generated."""
+import os
+import random
+import datetime
+import zipfile
+from edfns import ns
+
+BOARDS = ("AO", "BB", "HB", "HB+", "FB", "FB+", "SC", "AI", "AI+")
+ROOMTYPES = ("DR", "SR", "ST", "SU", "FR", "AP", "BU", "VI")
+LANGUAGES = ("DE", "EN", "FR", "NL", "pt_BR")
+AIRPORTS = ("PMI", "AYT", "HER", "LPA", "TFS", "FAO", "HRG")
+
+HOTELTEMPLATE = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<HotelEDF xmlns="{ns}">'
+                 '<BasicData Code="{code}" TourOperatorCode="{tocode}" Source="{source}">'
+                 '<Name>{name}</Name>'
+                 '<Address><Street>{street}</Street><ZipCode>{zipcode}</ZipCode><City>{city}</City><Country>{country}</Country>'
+                 '<Phone>{phone}</Phone><Fax>{fax}</Fax><Email>{email}</Email><Website>{website}</Website></Address>'
+                 '{references}'
+                 '<GeoInfos><Geocode{geocode}/></GeoInfos>'
+                 '<Attributes><Attribute Name="Category" Value="{category}"/></Attributes>'
+                 '<ArrivalAirports>{airports}</ArrivalAirports>'
+                 '</BasicData>'
+                 '<SellingData{currency}>{rounding}<SeasonDefinitions Start="{seasonstart}" End="{seasonend}"/>'
+                 '<Rooms>{rooms}</Rooms></SellingData></HotelEDF>\n')
+
+ROOMTEMPLATE = ('<Room{code}><Descriptions>{descriptions}</Descriptions>'
+                '<Boards>{boards}</Boards><GlobalTypes>{globaltypes}</GlobalTypes>'
+                '<Occupancies>{occupancies}</Occupancies>'
+                '<ChargeBlocks>{chargeblocks}</ChargeBlocks></Room>')
+
+OCCUPANCYTEMPLATE = ('<Occupancy Min="{min}" Max="{max}" MinAdult="{minadult}" MaxAdult="{maxadult}" MinChild="0" MaxChild="{maxchild}" MinChargedPersons="{min}">'
+                     '<Children MinAge="{minage}" MaxAge="{maxage}"/>{infants}</Occupancy>')
+
+ALLOTMENTTEMPLATE = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<AllotmentEDF xmlns="{ns}">'
+                     '<BasicData Code="{code}" TourOperatorCode="{tocode}" Source="{source}"/>'
+                     '<SellingData><Allotments>{allotments}</Allotments></SellingData></AllotmentEDF>\n')
+
+
+class Generator(object):
+    """Builds the files of one delivery. fault(rate) decides whether an
+    error is injected at a place, rate is the probability."""
+    def __init__(self, hotels=100, rooms=5, occupancies=2, allotments=10, days=60, patternlength=1, errorrate=0.0, tocode="TO", seed=1):
+        self.hotels = hotels
+        self.rooms = rooms
+        self.occupancies = occupancies
+        self.allotments = allotments
+        self.days = days
+        self.patternlength = patternlength
+        self.errorrate = errorrate
+        self.tocode = tocode
+        self.random = random.Random(seed)
+        self.start = datetime.date.today() + datetime.timedelta(days=30)
+
+    def fault(self):
+        return self.errorrate > 0 and self.random.random() < self.errorrate
+
+    def choice(self, good, bad):
+        if self.fault():
+            return self.random.choice(bad)
+        return self.random.choice(good)
+
+    def date(self, days):
+        return (self.start + datetime.timedelta(days=days)).isoformat()
+
+    def filename(self, code):
+        return "EDF----{0}-{1}.xml".format(self.tocode, code)
+
+    def hotel(self, i):
+        """Returns file name, HotelEDF and AllotmentEDF (None if the
+        AllotmentEDF is missing) of hotel number i."""
+        code = "H{0:06d}".format(i)
+        filename = self.filename(code)
+        if self.fault():
+            # does not match the naming convention
+            filename = "hotel_{0}.xml".format(code)
+        if i > 0 and self.fault():
+            # same Code as the previous hotel
+            code = "H{0:06d}".format(i - 1)
+        roomcodes = ["R{0:02d}".format(r) for r in range(self.rooms)]
+        hotel = HOTELTEMPLATE.format(
+            ns=ns["edf"], code=code, tocode=self.tocode, source="GEN",
+            name=self.choice(["Hotel {0}".format(i)], ["", "Hotel\n{0}".format(i), "Hotel {0} ".format(i) * 20]),
+            street=self.choice(["Main Street {0}".format(i % 200)], ["", "Main\nStreet"]),
+            zipcode=self.choice(["{0:05d}".format(i % 99999)], ["", "07\n1"]),
+            city=self.choice(["Palma"], ["", "Pal\nma"]),
+            country=self.choice(["ES", "TR", "GR"], ["", "Spain"]),
+            phone=self.choice(["+34 971 {0:06d}".format(i)], ["", "call reception"]),
+            fax=self.choice(["+34 971 {0:06d}".format(i + 1)], ["", "no fax"]),
+            email=self.choice(["info@h{0}.example".format(i)], ["", "info@\nexample"]),
+            website=self.choice(["www.h{0}.example".format(i)], ["", "www.\nexample"]),
+            references=self.choice(['<References><GiataCode>{0}</GiataCode><HotelKey>{1}</HotelKey></References>'.format(100000 + i, code)], ['<References/>', '<References><GiataCode/><HotelKey>{0}</HotelKey></References>'.format(code), '<References><GiataCode>{0}</GiataCode><HotelKey/></References>'.format(100000 + i), '<References><GiataCode>{0}</GiataCode><HotelKey>{1}</HotelKey></References>'.format(100000 + max(i - 1, 0), code)]),
+            geocode=self.choice([' Longitude="2.65" Latitude="39.57"'], ['', ' Longitude="2.65"']),
+            category=self.choice(["3", "4", "4.5", "5"], ["four", ""]),
+            airports=self.choice(['<Airport IataCode="{0}"/>'.format(self.random.choice(AIRPORTS))], ['', '<Airport/>', '<Airport IataCode=""/>']),
+            currency=self.choice([' Currency="EUR"'], ['', ' Currency="Euro"']),
+            rounding=self.choice(['<Rounding Mode="Commercial" Scope="Person" DecimalPlace="2"/>'], ['', '<Rounding Mode="Sometimes"/>', '<Rounding Mode="Up" Scope="Hotel" DecimalPlace="2"/>', '<Rounding Mode="Up"/>']),
+            seasonstart=self.choice([self.date(0)], [self.date(-60), "01.01.2020"]),
+            seasonend=self.choice([self.date(self.seasondays() - 1)], [self.date(-31), "31.12."]),
+            rooms=self.choice(["".join(self.room(roomcode) for roomcode in roomcodes)], [""]))
+        if self.fault():
+            # not well-formed
+            hotel = hotel[:len(hotel) // 2]
+        if self.fault():
+            return filename, hotel, None
+        allotmentcode = code
+        if self.fault():
+            allotmentcode = code + "X"
+        allotment = ALLOTMENTTEMPLATE.format(
+            ns=ns["atmt"], code=allotmentcode, tocode=self.tocode, source="GEN",
+            allotments=self.choice(["".join(self.allotment(roomcodes, a) for a in range(self.allotments))], [""]))
+        return filename, hotel, allotment
+
+    def room(self, code):
+        descriptions = ['<Description Language="**">Room {0}</Description>'.format(code)]
+        for lang in self.random.sample(LANGUAGES, 2):
+            descriptions.append('<Description Language="{0}">Room {1}</Description>'.format(lang, code))
+        if self.fault():
+            descriptions[0] = self.random.choice(['<Description Language="XYZ">Room</Description>', '<Description>Room</Description>', ''])
+        occupancies = [self.occupancy() for o in range(self.occupancies)]
+        if self.fault():
+            occupancies = [self.occupancy() for o in range(5)]
+        chargeblocks = self.chargeblocks()
+        codeattribute = ' Code="{0}"'.format(code)
+        if self.fault():
+            codeattribute = ""
+        return ROOMTEMPLATE.format(
+            code=codeattribute, descriptions="".join(descriptions),
+            boards='<Board Code="{0}" GlobalType="{1}"/>'.format("B1", self.choice(BOARDS, ["ZZ", "BX"])),
+            globaltypes=self.choice(['<GlobalType Code="{0}"/>'.format(self.random.choice(ROOMTYPES))], ['', '<GlobalType Code="QQ"/>']),
+            occupancies="".join(occupancies),
+            chargeblocks="".join(chargeblocks))
+
+    def occupancy(self):
+        maxadult = self.random.randint(1, 4)
+        return OCCUPANCYTEMPLATE.format(
+            min=self.choice(["1"], ["", "0", "one"]), max=self.choice([str(maxadult + 1)], ["", "0", "x"]),
+            minadult="1", maxadult=self.choice([str(maxadult)], ["", "0"]),
+            maxchild=self.choice(["1", "2"], ["", "many"]),
+            minage="2", maxage=self.choice(["11", "15"], ["", "teen"]),
+            infants=self.choice(['<Infants ApplyToOccupancy="{0}"/>'.format(self.random.choice(["No", "Yes", "Max"]))], ['', '<Infants/>', '<Infants ApplyToOccupancy="Sometimes"/>']))
+
+    def chargeblocks(self):
+        """Three ChargeBlocks covering the season without gaps."""
+        days = self.seasondays()
+        bounds = [c * days // 3 for c in range(4)]
+        ranges = [[bounds[c], bounds[c + 1] - 1] for c in range(3) if bounds[c] < bounds[c + 1]]
+        if self.fault():
+            fault = self.random.randrange(4)
+            if fault == 0 and len(ranges) > 1:
+                # overlaps the ChargeBlock before
+                ranges[1][0] -= 1
+            elif fault == 1 and len(ranges) > 1 and ranges[0][0] < ranges[0][1]:
+                # leaves a gap before the next ChargeBlock
+                ranges[0][1] -= 1
+            elif fault == 2:
+                ranges[-1].reverse()
+            elif fault == 3:
+                ranges.append(ranges[0])
+        return ['<ChargeBlock Start="{0}" End="{1}"/>'.format(self.date(start), self.date(end)) for start, end in ranges]
+
+    def seasondays(self):
+        """Days of the season, days for each allotment of the rooms with
+        the most allotments."""
+        periods = -(-self.allotments // max(1, self.rooms))
+        return max(1, periods) * self.days
+
+    def allotment(self, roomcodes, a):
+        """Allotment a, the allotments of each room follow each other
+        without gaps and cover the season. Rooms with fewer allotments
+        (if rooms does not divide allotments) get longer ones."""
+        rooms = len(roomcodes)
+        room = roomcodes[a % rooms]
+        periods = self.allotments // rooms + (a % rooms < self.allotments % rooms)
+        period = a // rooms
+        days = self.seasondays()
+        start = period * days // periods
+        end = (period + 1) * days // periods - 1
+        length = (end - start + 1) * self.patternlength
+        startdate = self.date(start)
+        enddate = self.date(end)
+        fault = None
+        if self.fault():
+            fault = self.random.randrange(8)
+            if fault == 0:
+                length -= 1
+            elif fault == 1:
+                startdate, enddate = enddate, startdate
+            elif fault == 2:
+                startdate = self.date(-400)
+                enddate = self.date(-300)
+            elif fault == 3:
+                startdate = "tomorrow"
+            elif fault == 4:
+                # overlaps the previous allotment of the room
+                startdate = self.date(start - self.days // 2)
+            elif fault == 5:
+                # leaves a gap before the next allotment of the room
+                enddate = self.date(end - 1)
+                length -= self.patternlength
+        pattern = "".join(self.random.choice("0123456789") for p in range(min(length, 10))) * (length // 10 + 1)
+        if fault == 6:
+            pattern = "x" + pattern[1:]
+        elif fault == 7:
+            pattern = "0" * length
+        return '<Allotment Room="{0}" Board="B1" Start="{1}" End="{2}" PatternLength="{3}" Pattern="{4}"/>'.format(
+            room, startdate, enddate, self.patternlength, pattern[:length])
+
+    def files(self):
+        """Yields file name, HotelEDF and AllotmentEDF, the HotelEDF is
+        None for an AllotmentEDF without HotelEDF."""
+        for i in range(self.hotels):
+            yield self.hotel(i)
+            if self.fault():
+                yield self.filename("O{0:06d}".format(i)), None, ALLOTMENTTEMPLATE.format(ns=ns["atmt"], code="O{0:06d}".format(i), tocode=self.tocode, source="GEN", allotments="")
+
+
+def generate(target, **kwargs):
+    """Writes a delivery to target, a zip file if the name ends with
+    .zip, a folder otherwise. kwargs are the arguments of Generator.
+    Returns the number of bytes written."""
+    generator = Generator(**kwargs)
+    total = 0
+    hotelonlydir = "hotels/hotelonly"
+    allotmentdir = "hotels/hotelonly/allotment"
+    if target.endswith(".zip"):
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(allotmentdir + "/", "")
+            for filename, hotel, allotment in generator.files():
+                if hotel is not None:
+                    zf.writestr("{0}/{1}".format(hotelonlydir, filename), hotel)
+                    total += len(hotel)
+                if allotment is not None:
+                    zf.writestr("{0}/{1}".format(allotmentdir, filename), allotment)
+                    total += len(allotment)
+    else:
+        os.makedirs(os.path.join(target, allotmentdir), exist_ok=True)
+        for filename, hotel, allotment in generator.files():
+            if hotel is not None:
+                with open(os.path.join(target, hotelonlydir, filename), "w", encoding="utf-8") as f:
+                    total += f.write(hotel)
+            if allotment is not None:
+                with open(os.path.join(target, allotmentdir, filename), "w", encoding="utf-8") as f:
+                    total += f.write(allotment)
+    return total
+
+
+def add_arguments(ap):
+    ap.add_argument('--hotels', type=int, default=100, help="Number of HotelEDF files.")
+    ap.add_argument('--rooms', type=int, default=5, help="Rooms per hotel.")
+    ap.add_argument('--occupancies', type=int, default=2, help="Occupancy elements per room.")
+    ap.add_argument('--allotments', type=int, default=10, help="Allotment elements per AllotmentEDF.")
+    ap.add_argument('--days', type=int, default=60, help="Days covered by each Allotment of the rooms with the most Allotments, the season is as long as these together.")
+    ap.add_argument('--patternlength', type=int, default=1, help="PatternLength of the Allotments, the Pattern has days * patternlength characters.")
+    ap.add_argument('--errorrate', type=float, default=0.05, help="Probability of an error at every place a check looks at. 0 gives a clean delivery.")
+    ap.add_argument('--seed', type=int, default=1, help="Seed of the random generator.")
+
+
+def get_arguments(args):
+    return dict((name, getattr(args, name)) for name in ("hotels", "rooms", "occupancies", "allotments", "days", "patternlength", "errorrate", "seed"))
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('target', help="Folder or zip file (name ending in .zip) to write the delivery to.")
+    add_arguments(ap)
+    args = ap.parse_args()
+    total = generate(args.target, **get_arguments(args))
+    print("{0} hotels, {1:.1f} MB written to {2}".format(args.hotels, total / 1048576, args.target))
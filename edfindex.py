@@ -0,0 +1,71 @@
+"""Checks across the files of a delivery.
+
+The checks of the plugins see one HotelEDF and its AllotmentEDF at a
+time. The DeliveryIndex collects the codes of every HotelEDF (see
+Checker.checkfile) while the files are checked and reports afterwards
+
+- AllotmentEDF files without a HotelEDF of the same name,
+- HotelEDF files with the same BasicData Code,
+- HotelEDF files with the same GiataCode or HotelKey reference.
+
+Each index is a dict from the code to the first file name seen, only
+codes used by more than one file get a list of all their files. The
+file names are the strings of the source's name list, so an index
+costs one dict entry per hotel, about 100 bytes, 20 MB per index for
+200000 hotels. The codes come back from the workers with the findings
+of each file (and are kept in the result cache), so the index is built
+in the main process without a second pass over the files."""
+import logging
+from edferrors import Finding
+
+# file names listed per duplicate code
+MAXNAMES = 20
+
+# codes key, name in the messages, level of duplicates
+INDEXES = (
+    ("code", "Code", logging.ERROR),
+    ("hotelkey", "HotelKey", logging.ERROR),
+    ("giatacode", "GiataCode", logging.WARNING),
+)
+
+
+def orphans(hotelnames, allotmentnames):
+    """Returns the AllotmentEDF names without a HotelEDF, sorted."""
+    return sorted(set(allotmentnames).difference(hotelnames))
+
+
+class DeliveryIndex(object):
+    def __init__(self):
+        self.first = dict((key, dict()) for key, name, level in INDEXES)
+        self.duplicates = dict((key, dict()) for key, name, level in INDEXES)
+
+    def add(self, filename, codes):
+        """Adds the codes of a HotelEDF (see Checker.checkfile)."""
+        for key, first in self.first.items():
+            value = codes.get(key)
+            if not value:
+                continue
+            other = first.setdefault(value, filename)
+            if other != filename:
+                duplicates = self.duplicates[key]
+                if value in duplicates:
+                    duplicates[value].append(filename)
+                else:
+                    duplicates[value] = [other, filename]
+
+    def findings(self):
+        """Returns a Finding for every code used by more than one
+        HotelEDF."""
+        records = list()
+        for key, name, level in INDEXES:
+            for value, filenames in sorted(self.duplicates[key].items()):
+                names = ", ".join(filenames[:MAXNAMES])
+                if len(filenames) > MAXNAMES:
+                    names += " and {0} more".format(len(filenames) - MAXNAMES)
+                records.append(Finding(level, "{0} {1} is used by {2} HotelEDF: {3}".format(name, value, len(filenames), names)))
+        return records
+
+
+def orphan_findings(source):
+    return [Finding(logging.WARNING, "AllotmentEDF {0} has no HotelEDF and is not used".format(source.allotmentpath(filename)))
+            for filename in orphans(source.hotelnames(), source.allotmentnames())]
@@ -0,0 +1,75 @@
+"""Decoding of the Pattern attribute of Allotment elements.
+
+A Pattern has PatternLength characters per day of the allotment. Each
+character is the availability of a slot, 0-9 and then A-Z for 10 to
+35. A pattern is decoded into a bytes object with one byte per slot by
+a single translate() call, characters which are not allowed become
+INVALID. Days are evaluated with slicing and big integer operations,
+never character by character, so patterns of thousands of days cost
+about as much as their length in memcpy.
+
+Checks can record the decoded patterns of a file (see record()), the
+Checker turns them into an availability summary per AllotmentEDF."""
+import collections
+
+SYMBOLS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+INVALID = 0xff
+
+_DECODE = bytearray([INVALID]) * 256
+for value, symbol in enumerate(SYMBOLS):
+    _DECODE[ord(symbol)] = value
+_DECODE = bytes(_DECODE)
+# 1 for available slots, 0 for empty ones
+_AVAILABLE = bytes([0] + [1] * 255)
+
+Availability = collections.namedtuple("Availability", "allotments days zerodays invalid")
+
+_stats = None
+
+
+def decode(pattern):
+    """Returns the slot values of pattern as bytes and the index of the
+    first invalid character or -1."""
+    # characters outside latin-1 cannot be valid, "?" is not either
+    values = pattern.encode("latin-1", errors="replace").translate(_DECODE)
+    return values, values.find(INVALID)
+
+
+def availabledays(values, patternlength=1):
+    """Returns a bytes object with one byte per day, 1 if any slot of
+    the day has availability and 0 otherwise. Trailing slots of an
+    incomplete day are ignored."""
+    days = len(values) // patternlength
+    if patternlength == 1:
+        return values.translate(_AVAILABLE)
+    mask = 0
+    for offset in range(patternlength):
+        mask |= int.from_bytes(values[offset:days * patternlength:patternlength].translate(_AVAILABLE), "big")
+    return mask.to_bytes(days, "big")
+
+
+def zerodays(values, patternlength=1):
+    """Returns the number of days without availability."""
+    return availabledays(values, patternlength).count(0)
+
+
+def start_recording():
+    global _stats
+    _stats = [0, 0, 0, 0]
+
+
+def record(days, zerodays, invalid=False):
+    """Record the decoded pattern of an allotment for the summary."""
+    if _stats is not None:
+        _stats[0] += 1
+        _stats[1] += days
+        _stats[2] += zerodays
+        _stats[3] += int(invalid)
+
+
+def availability():
+    """Returns the Availability of the allotments recorded since
+    start_recording() or None if nothing was recorded."""
+    if _stats is None or _stats[0] == 0:
+        return None
+    return Availability(*_stats)
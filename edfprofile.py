@@ -0,0 +1,132 @@
+"""Timings of the checks and files of a run (--profile).
+
+When profiling is on, the Checker replaces the function of every check
+with a wrapper measuring wall and CPU time, and records for every file
+its size, the time spent parsing it and the peak of the memory
+allocated while it was checked (tracemalloc). Without --profile none of
+this is set up, the checks are called directly.
+
+Worker processes profile the files they check, the snapshots are sent
+back with the findings and merged into the profiler of the main
+process."""
+import time
+import functools
+import tracemalloc
+
+
+class Profiler(object):
+    def __init__(self, trace=True):
+        # name -> [calls, wall, cpu]
+        self.checks = dict()
+        # (filename, size, wall, cpu, parse, checks, peak)
+        self.files = list()
+        # name -> [calls, wall]
+        self.other = dict()
+        self.trace = trace
+        self._current = None
+        if trace is True and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def wrap(self, check):
+        """Returns check.function with timing around every call."""
+        function = check.function
+        stats = self.checks.setdefault(check.name, [0, 0.0, 0.0])
+
+        @functools.wraps(function)
+        def timed(*args):
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                return function(*args)
+            finally:
+                wall = time.perf_counter() - wall
+                stats[0] += 1
+                stats[1] += wall
+                stats[2] += time.process_time() - cpu
+                if self._current is not None:
+                    self._current[1] += wall
+        return timed
+
+    def timed(self, name, function):
+        """Returns function with its wall time added to name."""
+        stats = self.other.setdefault(name, [0, 0.0])
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            wall = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                wall = time.perf_counter() - wall
+                stats[0] += 1
+                stats[1] += wall
+                if self._current is not None:
+                    self._current[1] += wall
+        return timed
+
+    def start_file(self, filename, size):
+        if self.trace is True:
+            tracemalloc.reset_peak()
+        # filename, time spent in checks and reports, size, wall, cpu
+        self._current = [filename, 0.0, size, time.perf_counter(), time.process_time()]
+
+    def end_file(self):
+        filename, checktime, size, wall, cpu = self._current
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        peak = None
+        if self.trace is True:
+            peak = tracemalloc.get_traced_memory()[1]
+        self.files.append((filename, size, wall, cpu, max(0.0, wall - checktime), checktime, peak))
+        self._current = None
+
+    def take(self):
+        """Returns the data collected since the last call and resets it.
+        The check statistics are kept as objects, the wrappers hold
+        references to them."""
+        snapshot = (dict((name, list(stats)) for name, stats in self.checks.items()), self.files, dict((name, list(stats)) for name, stats in self.other.items()))
+        for stats in self.checks.values():
+            stats[:] = [0, 0.0, 0.0]
+        for stats in self.other.values():
+            stats[:] = [0, 0.0]
+        self.files = list()
+        return snapshot
+
+    def merge(self, snapshot):
+        checks, files, other = snapshot
+        for name, (calls, wall, cpu) in checks.items():
+            stats = self.checks.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += calls
+            stats[1] += wall
+            stats[2] += cpu
+        self.files.extend(files)
+        for name, (calls, wall) in other.items():
+            stats = self.other.setdefault(name, [0, 0.0])
+            stats[0] += calls
+            stats[1] += wall
+
+    def summary(self, top=20):
+        """Returns the ranked summary as list of lines."""
+        lines = list()
+        totalwall = sum(f[2] for f in self.files)
+        totalsize = sum(f[1] for f in self.files)
+        lines.append("Profile of {0} files, {1:.1f} MB, {2:.3f} s checking (summed over all processes)".format(len(self.files), totalsize / 1048576, totalwall))
+        lines.append("")
+        lines.append("Checks by wall time:")
+        lines.append("{0:>10} {1:>10} {2:>10} {3:>10} {4:>6}  {5}".format("calls", "wall s", "cpu s", "ms/call", "%", "check"))
+        for name, (calls, wall, cpu) in sorted(self.checks.items(), key=lambda item: item[1][1], reverse=True):
+            if calls == 0:
+                continue
+            share = 100 * wall / totalwall if totalwall else 0
+            lines.append("{0:>10} {1:>10.3f} {2:>10.3f} {3:>10.3f} {4:>6.1f}  {5}".format(calls, wall, cpu, 1000 * wall / calls, share, name))
+        parse = sum(f[4] for f in self.files)
+        lines.append("{0:>10} {1:>10.3f} {2:>10} {3:>10} {4:>6.1f}  {5}".format(len(self.files), parse, "", "", 100 * parse / totalwall if totalwall else 0, "(parsing and walking the documents)"))
+        for name, (calls, wall) in sorted(self.other.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append("{0:>10} {1:>10.3f} {2:>10} {3:>10} {4:>6}  {5}".format(calls, wall, "", "", "", "({0})".format(name)))
+        lines.append("")
+        lines.append("Slowest {0} files:".format(min(top, len(self.files))))
+        lines.append("{0:>10} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}  {6}".format("size KB", "wall s", "cpu s", "parse s", "checks s", "peak MB", "file"))
+        for filename, size, wall, cpu, parse, checks, peak in sorted(self.files, key=lambda f: f[2], reverse=True)[:top]:
+            peak = "" if peak is None else "{0:.1f}".format(peak / 1048576)
+            lines.append("{0:>10.1f} {1:>10.3f} {2:>10.3f} {3:>10.3f} {4:>10.3f} {5:>10}  {6}".format(size / 1024, wall, cpu, parse, checks, peak, filename))
+        return lines
@@ -0,0 +1,59 @@
+"""Overlaps and gaps of date ranges.
+
+Allotments and ChargeBlocks give prices and availability for ranges of
+days, the ranges of the same kind (e.g. for one Room and Board) must not
+overlap and should cover the season. Comparing every range with every
+other is quadratic, a room with thousands of ChargeBlocks takes seconds.
+sweep() sorts the ranges as (start, end) pairs of day ordinals
+(date.toordinal()) and compares each with the furthest end seen so far,
+so n ranges take n log n."""
+
+DUPLICATE = "duplicate"
+OVERLAP = "overlap"
+GAP = "gap"
+
+
+def sweep(ranges, first=None, last=None):
+    """Sorts ranges, a list of (start, end) day ordinals with start <=
+    end, and yields (kind, start, end, until) in the order of the days:
+
+        DUPLICATE  start and end of a range equal to the range before
+        OVERLAP    start and end of a range overlapping an earlier one,
+                   until is the last day of the overlap
+        GAP        the first and last day not covered by any range,
+                   only the part between first and last is yielded
+
+    Without first and last no gaps are yielded."""
+    if len(ranges) == 0:
+        return
+
+    def gap(start, end):
+        if first is None:
+            return None
+        start = max(start, first)
+        end = min(end, last)
+        if start <= end:
+            return (GAP, start, end, None)
+        return None
+
+    ranges.sort()
+    laststart, lastend = ranges[0]
+    found = gap(first, laststart - 1)
+    if found is not None:
+        yield found
+    maxend = lastend
+    for start, end in ranges[1:]:
+        if start == laststart and end == lastend:
+            yield (DUPLICATE, start, end, None)
+        elif start <= maxend:
+            yield (OVERLAP, start, end, min(end, maxend))
+        else:
+            found = gap(maxend + 1, start - 1)
+            if found is not None:
+                yield found
+        laststart, lastend = start, end
+        if end > maxend:
+            maxend = end
+    found = gap(maxend + 1, last)
+    if found is not None:
+        yield found
@@ -0,0 +1,166 @@
+"""Registry of the check functions found in the plugins.
+
+The plugins are imported once and every function is sorted by the
+prefix of its name into a dispatch table for its kind:
+
+    hotel          gets the HotelEDF
+    allotmentnode  gets each Allotment element of the AllotmentEDF
+    allotment      gets the AllotmentEDF
+    room           gets each Room element of the HotelEDF
+    file           (all other functions) gets HotelEDF and AllotmentEDF
+
+Functions decorated with visit() are element checks, they get every
+element matching one of their paths (see edfengine):
+
+    from edfregistry import visit
+
+    @visit("edf:Address/edf:Street")
+    def check_street(streetnode):
+        ...
+
+Every check carries a section, the highest level it can report
+(maxlevel) and a relative cost. These are derived from the module name
+and the function's source, or declared with the describe() decorator:
+
+    from edfregistry import describe
+
+    @describe(maxlevel=logging.WARNING, cost=3)
+    def room_checksomething(roomnode):
+        ...
+"""
+import ast
+import inspect
+import functools
+import logging
+import textwrap
+import importlib
+from fnmatch import fnmatchcase
+from inspect import getmembers, isfunction
+import plugins
+
+KINDS = ("hotel", "allotmentnode", "allotment", "room", "file", "element")
+
+_LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR, "CRITICAL": logging.CRITICAL}
+
+
+def _meta(function):
+    if "edbug_meta" not in function.__dict__:
+        function.edbug_meta = dict()
+    return function.edbug_meta
+
+
+def describe(section=None, maxlevel=None, cost=None):
+    """Decorator declaring the metadata of a check function."""
+    def decorator(function):
+        _meta(function).update({"section": section, "maxlevel": maxlevel, "cost": cost})
+        return function
+    return decorator
+
+
+def visit(*paths, state=False):
+    """Decorator registering a function as element check for paths. With
+    state=True the check also gets a dict which is new for every
+    document, to keep what it found in the elements visited before."""
+    def decorator(function):
+        _meta(function)["paths"] = paths
+        _meta(function)["state"] = state
+        return function
+    return decorator
+
+
+def get_kind(name):
+    for kind in KINDS[:4]:
+        if name.startswith(kind):
+            return kind
+    return "file"
+
+
+@functools.lru_cache(maxsize=None)
+def get_maxlevel(function):
+    """Returns the highest level used in the source of function. Levels
+    are expected as logging.LEVEL constants, a level which is computed
+    at runtime makes the check CRITICAL, so it is never skipped. The
+    result is kept, so only the first Registry of a process parses the
+    plugin sources."""
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(function)))
+    except (OSError, TypeError, SyntaxError):
+        return logging.CRITICAL
+    maxlevel = logging.INFO # default level of EdfError and ErrorMsg
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "logging" and node.attr in _LEVELS:
+            maxlevel = max(maxlevel, _LEVELS[node.attr])
+        elif isinstance(node, ast.keyword) and node.arg == "level":
+            value = node.value
+            if not (isinstance(value, ast.Attribute) and isinstance(value.value, ast.Name) and value.value.id == "logging"):
+                return logging.CRITICAL
+    return maxlevel
+
+
+class Check(object):
+    __slots__ = ("name", "module", "function", "kind", "paths", "state", "section", "maxlevel", "cost")
+
+    def __init__(self, name, module, function):
+        meta = getattr(function, "edbug_meta", dict())
+        self.name = name
+        self.module = module
+        self.function = function
+        self.paths = meta.get("paths")
+        self.state = meta.get("state", False)
+        if self.paths is not None:
+            self.kind = "element"
+        else:
+            self.kind = get_kind(name)
+        self.section = meta.get("section")
+        if self.section is None:
+            if module.startswith("check_"):
+                self.section = module[len("check_"):]
+            else:
+                self.section = module
+        self.maxlevel = meta.get("maxlevel")
+        if self.maxlevel is None:
+            self.maxlevel = get_maxlevel(function)
+        self.cost = meta.get("cost") or 1
+
+    def matches(self, patterns):
+        for pattern in patterns:
+            if fnmatchcase(self.name, pattern) or fnmatchcase(self.module, pattern) or fnmatchcase("{0}.{1}".format(self.module, self.name), pattern):
+                return True
+        return False
+
+    def __repr__(self):
+        return "<Check {0}.{1} {2} {3} cost {4}>".format(self.module, self.name, self.kind, logging.getLevelName(self.maxlevel), self.cost)
+
+
+def load_checks():
+    """Imports the plugins and returns a Check for every function defined
+    in them, in the order the plugins have always been run."""
+    checks = list()
+    for l in plugins.__all__:
+        m = importlib.import_module("plugins.{0}".format(l))
+        for name, function in getmembers(m, isfunction):
+            # functions imported into a plugin module are not checks
+            if function.__module__ == m.__name__:
+                checks.append(Check(name, l, function))
+    return checks
+
+
+class Registry(object):
+    """The selected checks, in run order (checks) and per kind (tables)."""
+    def __init__(self, only=None, skip=None, minlevel=logging.DEBUG, maxcost=None):
+        self.available = load_checks()
+        self.checks = list()
+        for check in self.available:
+            if only and not check.matches(only):
+                continue
+            if skip and check.matches(skip):
+                continue
+            if check.maxlevel < minlevel:
+                continue
+            if maxcost is not None and check.cost > maxcost:
+                continue
+            self.checks.append(check)
+        self.tables = dict((kind, [c for c in self.checks if c.kind == kind]) for kind in KINDS)
+
+    def names(self):
+        return ["{0}.{1}".format(c.module, c.name) for c in self.checks]
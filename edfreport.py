@@ -0,0 +1,123 @@
+"""Buffered writing of the findings to the report.
+
+Logging every header, message and snippet on its own costs a log record,
+a formatting and a flush of the report file per line, which is most of
+the run time for deliveries with millions of findings. The ReportWriter
+formats all findings of a file in one go, with one timestamp, and a
+background thread writes them to the report in large chunks. Lines look
+exactly as if they had been logged with LOGFORMAT, which edbug uses for
+its reports. Handlers with another format (or other handler types) get
+the findings through logging as before.
+
+Findings are written in the order they are passed to write(). Nothing
+else may be logged between the first write() and close(), or the lines
+would be mixed up."""
+import queue
+import logging
+import threading
+
+LOGFORMAT = '%(asctime)s %(levelname)-8s %(message)s'
+
+_STOP = object()
+
+
+def lines(records, debug=False):
+    """Yields (level, text) for every line of records, in the order
+    edbug has always logged them."""
+    for finding in records:
+        yield finding.level, finding.header
+        if debug is True and finding.function is not None:
+            yield finding.messages[-1].level, "In function {0}:".format(finding.function)
+        for message in finding.messages:
+            yield message.level, message.message
+            if message.snippet is not None:
+                yield message.level, message.snippet
+
+
+class ReportWriter(object):
+    def __init__(self, debug=False, logger=None, chunksize=1 << 20, depth=64):
+        if logger is None:
+            logger = logging.getLogger()
+        self.logger = logger
+        self.debug = debug
+        self.chunksize = chunksize
+        self.handlers = list()
+        self.others = list()
+        for handler in logger.handlers:
+            formatter = handler.formatter
+            if type(handler) in (logging.FileHandler, logging.StreamHandler) and formatter is not None and formatter._fmt == LOGFORMAT and handler.filters == []:
+                self.handlers.append(handler)
+            else:
+                self.others.append(handler)
+        self._queue = None
+        self._thread = None
+        if self.handlers:
+            self._queue = queue.Queue(depth)
+            self._thread = threading.Thread(target=self._write, name="edbug-report", daemon=True)
+            self._thread.start()
+
+    def write(self, records):
+        if len(records) == 0:
+            return
+        if self.others:
+            for level, text in lines(records, self.debug):
+                if self.logger.isEnabledFor(level):
+                    record = self.logger.makeRecord(self.logger.name, level, "(report)", 0, text, None, None)
+                    for handler in self.others:
+                        if level >= handler.level:
+                            handler.handle(record)
+        if self.handlers:
+            asctime = None
+            texts = dict()
+            for handler in self.handlers:
+                if asctime is None:
+                    asctime = handler.formatter.formatTime(self.logger.makeRecord(self.logger.name, logging.INFO, "(report)", 0, "", None, None))
+                minlevel = max(handler.level, self.logger.getEffectiveLevel())
+                text = texts.get(minlevel)
+                if text is None:
+                    text = "".join("{0} {1:<8} {2}\n".format(asctime, logging.getLevelName(level), message) for level, message in lines(records, self.debug) if level >= minlevel)
+                    texts[minlevel] = text
+                if text:
+                    self._queue.put((handler, text))
+
+    def _write(self):
+        item = None
+        while True:
+            if item is None:
+                item = self._queue.get()
+            if item is _STOP:
+                return
+            handler, text = item
+            item = None
+            # everything waiting for the same handler goes out in one write
+            chunks = [text]
+            size = len(text)
+            while size < self.chunksize:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+                    break
+                if item is _STOP or item[0] is not handler:
+                    break
+                chunks.append(item[1])
+                size += len(item[1])
+                item = None
+            handler.acquire()
+            try:
+                if handler.stream is None:
+                    # FileHandler with delay=True
+                    handler.stream = handler._open()
+                handler.stream.write("".join(chunks))
+                handler.flush()
+            except Exception:
+                handler.handleError(logging.makeLogRecord({"msg": "report"}))
+            finally:
+                handler.release()
+
+    def close(self):
+        """Waits until everything is written."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,231 @@
+"""Declarative checks of element text and attribute values.
+
+Many checks only test whether a value is there, is not empty, has no
+line break or is one of a few allowed values. Instead of writing a
+function for each of them, a plugin declares them as a table which is
+compiled once when the plugin is imported:
+
+    from edfrules import Rule, Element, check
+
+    room_checkboard = check("room_checkboard", RoomError, Element(
+        "edf:Boards/edf:Board",
+        missing=(logging.ERROR, "You must define at least one Boards/Board element"),
+        rules=[Rule("GlobalType", missing=(logging.ERROR, "{0} attribute in Board node is mandatory"),
+                    enum=(BOARDTYPES, logging.ERROR, "{0} attribute value must be one of {1}"))]))
+
+A Rule describes the value of an attribute, or the text of the element
+if attribute is None. Its tests run in this order, only the first
+failing one gives a message:
+
+    missing   the attribute or the text is not there
+    empty     the value is an empty string
+    newline   the value contains a line break
+    length    (n, level, template) the value does not have n characters
+    letters   the value contains ASCII letters
+    enum      (values, level, template) the value is not one of values
+    integer   the value is not an integer
+    date      the value is not an ISO date (see edfvalues.parse_date)
+    zero      the integer value is 0
+
+Messages are (level, template) pairs. Templates are formatted with the
+attribute or element name and the allowed values of enum ('AO', 'BB')
+when the message is written (see edferrors.ErrorMsg).
+
+An Element selects the elements path (relative to the node the check
+gets) and runs its rules and the Elements in children on each of them.
+If there is no such element, missing is reported (without a node, there
+is none to show), if there are more than maximum[0], maximum is
+reported with the parent element.
+
+check() returns a check function for the registry (see edfregistry),
+its name decides its kind as for any other function. If the elements
+of the check itself are missing, that message is raised on its own.
+All other messages of a call are raised together as one error, with
+first=True the first message is raised at once. Pass visit to make it
+an element check of these paths, the rules then run on the visited
+element (the Element has no path). The highest level of the messages
+is declared as the check's maxlevel."""
+import sys
+from collections import namedtuple
+from string import ascii_letters
+import edfvalues
+from edferrors import ErrorMsg
+from edfns import ns
+from edfregistry import describe, visit as visit_paths
+
+Rule = namedtuple("Rule", "attribute missing empty newline length letters enum integer date zero", defaults=(None,) * 9)
+Element = namedtuple("Element", "path rules missing maximum children", defaults=((), None, None, ()))
+
+_NOLETTERS = str.maketrans("", "", ascii_letters)
+
+
+def _isempty(value):
+    return len(value) == 0
+
+
+def _hasnewline(value):
+    return "\n" in value
+
+
+def _hasletters(value):
+    return len(value.translate(_NOLETTERS)) != len(value)
+
+
+def _notinteger(value):
+    try:
+        int(value)
+    except ValueError:
+        return True
+    return False
+
+
+def _notdate(value):
+    return edfvalues.parse_date(value) is None
+
+
+def _iszero(value):
+    return int(value) == 0
+
+
+def _name(tag):
+    """Returns the name without namespace of a tag or a path step."""
+    return tag.rpartition("}")[2].rpartition(":")[2].rpartition("/")[2]
+
+
+def compile_rule(rule):
+    """Returns validate(node, errormsgs), appending the message of the
+    first failing test of rule to errormsgs."""
+    if rule.zero is not None and rule.integer is None:
+        raise ValueError("zero needs the integer test")
+    attribute = rule.attribute
+    missing = rule.missing
+    listing = None
+    tests = list()
+    if rule.empty is not None:
+        tests.append((_isempty,) + rule.empty)
+    if rule.newline is not None:
+        tests.append((_hasnewline,) + rule.newline)
+    if rule.length is not None:
+        length, level, template = rule.length
+        tests.append((lambda value: len(value) != length, level, template))
+    if rule.letters is not None:
+        tests.append((_hasletters,) + rule.letters)
+    if rule.enum is not None:
+        values, level, template = rule.enum
+        allowed = frozenset(values)
+        listing = ", ".join("'{0}'".format(value) for value in values)
+        tests.append((lambda value: value not in allowed, level, template))
+    if rule.integer is not None:
+        tests.append((_notinteger,) + rule.integer)
+    if rule.date is not None:
+        tests.append((_notdate,) + rule.date)
+    if rule.zero is not None:
+        tests.append((_iszero,) + rule.zero)
+    tests = tuple(tests)
+
+    def validate(node, errormsgs):
+        if attribute is None:
+            value = node.text
+        else:
+            value = node.get(attribute)
+        if value is None:
+            if missing is not None:
+                errormsgs.append(ErrorMsg(missing[1], node=node, level=missing[0], args=(attribute or _name(node.tag), listing)))
+            return
+        for failed, level, template in tests:
+            if failed(value):
+                errormsgs.append(ErrorMsg(template, node=node, level=level, args=(attribute or _name(node.tag), listing)))
+                return
+    return validate
+
+
+def compile_node(element, first=False):
+    """Returns validate(node, errormsgs) running the rules and children
+    of element on node."""
+    rules = tuple(compile_rule(rule) for rule in element.rules)
+    children = tuple(compile_children(child, first) for child in element.children)
+
+    def validate(node, errormsgs):
+        for rule in rules:
+            rule(node, errormsgs)
+            if first and errormsgs:
+                return
+        for child in children:
+            child(node, errormsgs)
+            if first and errormsgs:
+                return
+    return validate
+
+
+def compile_children(element, first=False):
+    """Returns validate(parent, errormsgs) running element on the
+    elements path of parent."""
+    path = element.path
+    name = _name(path)
+    missing = element.missing
+    maximum = element.maximum
+    validate_node = compile_node(element, first)
+
+    def validate(parent, errormsgs):
+        nodes = parent.findall(path, ns)
+        if len(nodes) == 0:
+            if missing is not None:
+                errormsgs.append(ErrorMsg(missing[1], level=missing[0], args=(name,)))
+            return
+        if maximum is not None and len(nodes) > maximum[0]:
+            errormsgs.append(ErrorMsg(maximum[2], node=parent, level=maximum[1], args=(name, maximum[0])))
+        for node in nodes:
+            validate_node(node, errormsgs)
+            if first and errormsgs:
+                return
+    return validate
+
+
+def levels(element):
+    """Yields the levels of all messages of element."""
+    for message in (element.missing, element.maximum):
+        if message is not None:
+            yield message[-2]
+    for rule in element.rules:
+        for message in rule[1:]:
+            if message is not None:
+                yield message[-2]
+    for child in element.children:
+        yield from levels(child)
+
+
+def check(name, error, element, first=False, visit=None, cost=None):
+    """Returns the check function name for element, raising error."""
+    path = element.path
+    if (path is None) != (visit is not None):
+        raise ValueError("an element check has no path, other checks need one")
+    missing = element.missing
+    maximum = element.maximum
+    validate_node = compile_node(element, first)
+
+    def function(node, *others):
+        errormsgs = list()
+        if path is None:
+            validate_node(node, errormsgs)
+        else:
+            nodes = node.findall(path, ns)
+            if len(nodes) == 0:
+                if missing is not None:
+                    raise error(missing[1], level=missing[0], args=(_name(path),))
+                return
+            if maximum is not None and len(nodes) > maximum[0]:
+                errormsgs.append(ErrorMsg(maximum[2], level=maximum[1], args=(_name(path), maximum[0])))
+            for child in nodes:
+                validate_node(child, errormsgs)
+                if first and errormsgs:
+                    break
+        if errormsgs:
+            raise error("{0} errors in {1}".format(len(errormsgs), name), messages=errormsgs)
+
+    function.__name__ = function.__qualname__ = name
+    # like namedtuple, the function belongs to the module calling check()
+    function.__module__ = sys._getframe(1).f_globals.get("__name__", "__main__")
+    function = describe(maxlevel=max(levels(element)), cost=cost)(function)
+    if visit is not None:
+        function = visit_paths(*visit)(function)
+    return function
@@ -0,0 +1,62 @@
+"""Reproducible stratified samples of the HotelEDF files of a delivery.
+
+The files are grouped by TourOperatorCode (taken from the file name,
+see the naming convention in check_basicdata), by whether they have an
+AllotmentEDF and by their size (powers of two), so a sample has small
+and big hotels, hotels without allotments and all tour operators of
+the delivery in about the same shares as the whole delivery. Each group
+gets its share of the sample (largest remainder first), the files of a
+group are drawn with a random generator seeded with seed. The same
+delivery and seed always give the same sample."""
+import random
+import logging
+
+
+def parse_size(value):
+    """Parses the argument of --sample, a number of files (100) or a
+    percentage (5%). Returns (count, fraction), one of them None."""
+    value = value.strip()
+    if value.endswith("%"):
+        fraction = float(value[:-1]) / 100
+        if not 0 < fraction <= 1:
+            raise ValueError("percentage must be above 0 and at most 100")
+        return None, fraction
+    count = int(value)
+    if count < 1:
+        raise ValueError("number of files must be at least 1")
+    return count, None
+
+
+def stratum(source, filename):
+    tocode = None
+    if filename.startswith("EDF----"):
+        tocode = filename[len("EDF----"):].partition("-")[0]
+    try:
+        size = source.size(filename)
+    except (OSError, KeyError):
+        size = 0
+    return tocode or "", source.has_allotment(filename), size.bit_length()
+
+
+def sample(source, edfnames, count=None, fraction=None, seed=0):
+    """Returns the sampled file names in the order of edfnames."""
+    total = len(edfnames)
+    if count is None:
+        count = max(1, int(round(total * fraction)))
+    if count >= total:
+        return list(edfnames)
+    groups = dict()
+    for filename in sorted(edfnames):
+        groups.setdefault(stratum(source, filename), list()).append(filename)
+    keys = sorted(groups)
+    shares = [(len(groups[key]) * count / total, key) for key in keys]
+    sizes = dict((key, int(share)) for share, key in shares)
+    remaining = count - sum(sizes.values())
+    for share, key in sorted(shares, key=lambda item: (int(item[0]) - item[0], item[1]))[:remaining]:
+        sizes[key] += 1
+    generator = random.Random(seed)
+    chosen = set()
+    for key in keys:
+        chosen.update(generator.sample(groups[key], sizes[key]))
+    logging.info("Sample of {0} of {1} HotelEDF files from {2} groups (seed {3})".format(count, total, len(keys), seed))
+    return [filename for filename in edfnames if filename in chosen]
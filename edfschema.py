@@ -0,0 +1,231 @@
+"""Structural validation of EDF documents against content models.
+
+A Model describes the children of an element the way a DTD or XSD
+sequence does, as a list of prefixed names with an optional occurrence
+indicator:
+
+    Model("edf:HotelEDF/edf:BasicData",
+          ["edf:Name", "edf:Address?", "edf:References?", "edf:ArrivalAirports?"],
+          required=("Code", "TourOperatorCode"), error=BasicDataError)
+
+    name    exactly once
+    name?   at most once
+    name*   any number of times
+    name+   at least once
+
+A choice of names in parentheses, (edf:Phone|edf:Fax)*, matches any of
+them, e.g. for children which may come in any order.
+
+content=None leaves the children unchecked, an empty list allows none.
+required lists the attributes the element must have. Elements which
+may have no children (leaves, most of them) are not visited on their
+own, the element around them checks them in its loop and reports them
+with its error class. So a leaf is only checked if its parent has a
+model with content. xsd=True marks a model taken from the EDF XSD,
+only then repeated and misordered children are errors.
+
+A Schema compiles each content model once into a deterministic automaton
+(a transition table per state, dicts from the tag of the next child to
+the next state). Validating an element is one dict lookup per child, so
+a whole document is validated with the checks in the engine's single
+walk (see edfengine), parsed or streamed: an element is validated when
+it is complete and its direct children are still there.
+
+Only elements which do not fit their model take the slow path, which
+finds out what is wrong and carries on as if the element were right:
+
+    unknown element         WARNING, skipped
+    repeated element        ERROR (WARNING without xsd), skipped
+    element out of order    ERROR (WARNING without xsd), skipped
+    missing element         ERROR
+    missing attribute       ERROR
+
+The messages show the offending element without its children. All
+messages of one element are raised as one error of the model's class."""
+import logging
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from edferrors import ErrorMsg, HotelEdfError
+from edfengine import compile_path
+
+Model = namedtuple("Model", "path content required error xsd", defaults=(None, (), HotelEdfError, False))
+
+_OCCURS = {"": (1, 1), "?": (0, 1), "*": (0, None), "+": (1, None)}
+
+
+def _name(tag):
+    return tag.rpartition("}")[2]
+
+
+def _shallow(node):
+    """node without its children, for the snippet of a message."""
+    shallow = ET.Element(node.tag, node.attrib)
+    shallow.text = node.text if len(node) == 0 else None
+    return shallow
+
+
+def _attributes(node, required, errormsgs):
+    """Appends the messages for the required attributes node lacks to
+    errormsgs (a new list if it is None and one is missing)."""
+    attrib = node.attrib
+    for name in required:
+        if name not in attrib:
+            if errormsgs is None:
+                errormsgs = list()
+            errormsgs.append(ErrorMsg("Missing {0} attribute in {1} element", node=_shallow(node), level=logging.ERROR, args=(name, _name(node.tag))))
+    return errormsgs
+
+
+class Automaton(object):
+    """The compiled content model of one element. States are numbered,
+    state 0 is the start, a state is (particle, count): the index of
+    the particle matched last and how often it was matched so far
+    (unbounded particles count up to their minimum only)."""
+    def __init__(self, content):
+        self.particles = list()
+        for item in content:
+            occurs = item[-1] if item[-1] in "?*+" else ""
+            names = item[:len(item) - len(occurs)].strip("()").split("|")
+            minimum, maximum = _OCCURS[occurs]
+            tags = tuple(compile_path(name)[0][-1] for name in names)
+            self.particles.append((tags, minimum, maximum))
+        self.alphabet = dict()
+        for index, (tags, minimum, maximum) in enumerate(self.particles):
+            for tag in tags:
+                self.alphabet.setdefault(tag, index)
+        self.states = list()
+        self.index = dict()
+        self.transitions = list()
+        self.accepting = list()
+        # (particle, 1) is where the slow path continues after an error
+        for state in [(-1, 0)] + [(i, 1) for i in range(len(self.particles))]:
+            self._state(state)
+        done = 0
+        while done < len(self.states):
+            self._expand(done)
+            done += 1
+
+    def _state(self, state):
+        number = self.index.get(state)
+        if number is None:
+            number = self.index[state] = len(self.states)
+            self.states.append(state)
+        return number
+
+    def _expand(self, number):
+        i, n = self.states[number]
+        moves = dict()
+        if i >= 0:
+            tags, minimum, maximum = self.particles[i]
+            if maximum is None:
+                following = self._state((i, min(n + 1, max(minimum, 1))))
+            elif n < maximum:
+                following = self._state((i, n + 1))
+            else:
+                tags = ()
+            for tag in tags:
+                moves[tag] = following
+        satisfied = i < 0 or n >= self.particles[i][1]
+        if satisfied:
+            for j in range(i + 1, len(self.particles)):
+                tags, minimum, maximum = self.particles[j]
+                for tag in tags:
+                    moves.setdefault(tag, self._state((j, 1)))
+                if minimum > 0:
+                    break
+        self.transitions.append(moves)
+        self.accepting.append(satisfied and all(p[1] == 0 for p in self.particles[i + 1:]))
+
+    def missing(self, number, until=None):
+        """Returns the names of the required particles missing when the
+        element ends (or the next child is particle until) in state
+        number."""
+        i, n = self.states[number]
+        particles = list()
+        if i >= 0 and n < self.particles[i][1]:
+            particles.append(self.particles[i])
+        if until is None:
+            until = len(self.particles)
+        particles.extend(particle for particle in self.particles[i + 1:until] if particle[1] > 0)
+        return [self.name(particle) for particle in particles]
+
+    def name(self, particle):
+        return "|".join(_name(tag) for tag in particle[0])
+
+    def diagnose(self, number, child, parent, errormsgs, level=logging.ERROR):
+        """Appends the messages for child, which has no transition from
+        state number, and returns the state to continue with. Repeated
+        and misordered children are reported with level."""
+        i, n = self.states[number]
+        j = self.alphabet.get(child.tag)
+        if j is None:
+            errormsgs.append(ErrorMsg("Unknown element {0} in {1}", node=_shallow(child), level=logging.WARNING, args=(_name(child.tag), parent)))
+            return number
+        if j == i:
+            if self.particles[i][2] == 1:
+                errormsgs.append(ErrorMsg("Element {0} may appear only once in {1}", node=_shallow(child), level=level, args=(_name(child.tag), parent)))
+            else:
+                errormsgs.append(ErrorMsg("Element {0} may appear at most {2} times in {1}", node=_shallow(child), level=level, args=(_name(child.tag), parent, self.particles[i][2])))
+            return number
+        if j < i:
+            errormsgs.append(ErrorMsg("Element {0} is out of order in {1}, it must come before {2}", node=_shallow(child), level=level, args=(_name(child.tag), parent, self.name(self.particles[i]))))
+            return number
+        for name in self.missing(number, j):
+            errormsgs.append(ErrorMsg("Missing element {0} in {1}", level=logging.ERROR, args=(name, parent)))
+        return self.index[(j, 1)]
+
+
+class Schema(object):
+    """The compiled Models, looked up by the tag of their element."""
+    def __init__(self, models):
+        self.models = dict()
+        self.leaves = dict()
+        self.paths = list()
+        for model in models:
+            steps, prefix = compile_path(model.path)
+            tag = steps[-1]
+            if tag in self.models or tag in self.leaves:
+                raise ValueError("more than one model for {0}".format(model.path))
+            if model.content is not None and len(model.content) == 0:
+                self.leaves[tag] = model.required
+                continue
+            automaton = None
+            if model.content is not None:
+                automaton = Automaton(model.content)
+            level = logging.ERROR if model.xsd else logging.WARNING
+            self.models[tag] = (model, automaton, level)
+            self.paths.append(model.path)
+
+    def validate(self, node):
+        """Raises the error of the model of node if node does not fit."""
+        model, automaton, level = self.models[node.tag]
+        errormsgs = None
+        if model.required:
+            errormsgs = _attributes(node, model.required, errormsgs)
+        if automaton is not None:
+            transitions = automaton.transitions
+            leaves = self.leaves
+            state = 0
+            for child in node:
+                following = transitions[state].get(child.tag)
+                if following is None:
+                    if errormsgs is None:
+                        errormsgs = list()
+                    following = automaton.diagnose(state, child, _name(node.tag), errormsgs, level)
+                state = following
+                required = leaves.get(child.tag)
+                if required is not None:
+                    if required:
+                        errormsgs = _attributes(child, required, errormsgs)
+                    if len(child):
+                        if errormsgs is None:
+                            errormsgs = list()
+                        for grandchild in child:
+                            errormsgs.append(ErrorMsg("Unknown element {0} in {1}", node=_shallow(grandchild), level=logging.WARNING, args=(_name(grandchild.tag), _name(child.tag))))
+            if not automaton.accepting[state]:
+                if errormsgs is None:
+                    errormsgs = list()
+                for name in automaton.missing(state):
+                    errormsgs.append(ErrorMsg("Missing element {0} in {1}", level=logging.ERROR, args=(name, _name(node.tag))))
+        if errormsgs:
+            raise model.error("{0} structure errors in {1}".format(len(errormsgs), _name(node.tag)), messages=errormsgs)
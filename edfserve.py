@@ -0,0 +1,355 @@
+"""HTTP service checking deliveries on a pool of warm worker processes.
+
+    POST /validate             the body is the delivery zip file
+    POST /validate?path=FILE   checks a zip file on the server
+    GET  /jobs/ID              status of a delivery check
+    GET  /metrics              queue depth, throughput and latency
+
+/validate answers with chunked JSON lines: one line with the job id and
+the number of HotelEDF files, one line per finding (the fields of
+edfsink.FIELDS, run is the job id) as soon as the file is checked, the
+findings across the files (see edfindex) and a last line with the state
+and the counters of the delivery.
+
+The HotelEDF files of all deliveries are checked by one shared
+multiprocessing pool, in every worker the plugins are imported once.
+Memory and CPU are bounded by admission, not by buffering:
+
+- at most maxdeliveries deliveries are checked at the same time, up to
+  maxqueue more wait for a slot, further requests get 503 with a
+  Retry-After header before their upload is read,
+- uploads are limited to maxupload bytes (413 otherwise) and are
+  spooled to a temporary file, never kept in memory,
+- each delivery has at most window files in the pool, the next file is
+  only handed to the pool when the findings of the oldest one have
+  been sent, so a slow client holds back its own delivery only.
+
+The service itself does not know how to check a file. It is given
+opensource(path), which raises DeliveryError for a zip file that cannot
+be checked, the worker function task(path, filename, day) returning the
+result of Checker.check() and the pool initializer. day is the date the
+delivery was started on, all its files are checked against that day,
+whichever worker checks them and however long the delivery takes."""
+import os
+import json
+import time
+import datetime
+import logging
+import tempfile
+import threading
+import collections
+import multiprocessing
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from edferrors import DeliveryError
+from edfsink import FIELDS, rows
+from edfindex import DeliveryIndex, orphan_findings
+
+
+def parse_address(address):
+    """Returns (host, port) of "host:port" or ":port", the host defaults
+    to the loopback interface."""
+    host, separator, port = address.rpartition(":")
+    if not separator:
+        host, port = "", address
+    return host or "127.0.0.1", int(port)
+
+
+def percentile(values, p):
+    """Returns the p-th percentile (nearest rank) of values or None."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+class Job(object):
+    __slots__ = ("id", "delivery", "state", "files", "checked", "findings", "counters", "error", "queued", "started", "finished")
+
+    def __init__(self, id, delivery):
+        self.id = id
+        self.delivery = delivery
+        self.state = "queued"
+        self.files = None
+        self.checked = 0
+        self.findings = 0
+        self.counters = dict()
+        self.error = None
+        self.queued = time.time()
+        self.started = None
+        self.finished = None
+
+    def status(self):
+        end = self.finished if self.finished is not None else time.time()
+        return {"job": self.id, "delivery": self.delivery, "state": self.state,
+                "files": self.files, "checked": self.checked, "findings": self.findings,
+                "counters": self.counters, "error": self.error,
+                "waited": round((self.started or end) - self.queued, 3),
+                "elapsed": round(end - self.started, 3) if self.started is not None else None}
+
+
+class Service(object):
+    def __init__(self, opensource, task, initializer=None, jobs=1, maxdeliveries=None, maxqueue=None, maxupload=2 << 30, window=None, spooldir=None, keepjobs=1000):
+        self.opensource = opensource
+        self.task = task
+        self.jobs = jobs
+        self.maxdeliveries = maxdeliveries if maxdeliveries is not None else jobs
+        self.maxqueue = maxqueue if maxqueue is not None else 2 * self.maxdeliveries
+        self.maxupload = maxupload
+        self.window = window if window is not None else 2 * jobs
+        self.spooldir = spooldir
+        self.keepjobs = keepjobs
+        self.pool = multiprocessing.Pool(jobs, initializer=initializer)
+        self.slots = threading.Semaphore(self.maxdeliveries)
+        self.lock = threading.Lock()
+        self.jobsbyid = collections.OrderedDict()
+        self.nextid = 1
+        self.waiting = 0
+        self.running = 0
+        self.done = collections.Counter()
+        self.filetimes = collections.deque()
+        self.latencies = collections.deque(maxlen=500)
+        self.started = time.time()
+
+    def admit(self, delivery):
+        """Returns a queued Job or None if the queue is full."""
+        with self.lock:
+            if self.waiting + self.running >= self.maxdeliveries + self.maxqueue:
+                self.done["rejected"] += 1
+                return None
+            job = Job(self.nextid, delivery)
+            self.nextid += 1
+            self.jobsbyid[job.id] = job
+            while len(self.jobsbyid) > self.keepjobs:
+                self.jobsbyid.popitem(last=False)
+            self.waiting += 1
+            return job
+
+    def discard(self, job, error):
+        """Drops an admitted job which is never checked."""
+        job.state = "failed"
+        job.error = error
+        job.finished = time.time()
+        with self.lock:
+            self.waiting -= 1
+            self.done[job.state] += 1
+
+    def get_job(self, id):
+        with self.lock:
+            return self.jobsbyid.get(id)
+
+    def validate(self, job, path):
+        """Checks the delivery path for job and yields the JSON objects
+        of the response. Waits for a free slot first."""
+        self.slots.acquire()
+        with self.lock:
+            self.waiting -= 1
+            self.running += 1
+        job.state = "running"
+        job.started = time.time()
+        try:
+            yield from self._validate(job, path)
+        except GeneratorExit:
+            job.state = "aborted"
+            raise
+        except DeliveryError as e:
+            job.state = "failed"
+            job.error = str(e)
+            yield {"job": job.id, "state": job.state, "error": job.error}
+        except Exception as e:
+            logging.exception("Checking {0} failed".format(job.delivery))
+            job.state = "failed"
+            job.error = "{0}: {1}".format(type(e).__name__, e)
+            yield {"job": job.id, "state": job.state, "error": job.error}
+        finally:
+            job.finished = time.time()
+            with self.lock:
+                self.running -= 1
+                self.done[job.state] += 1
+                if job.state == "done":
+                    self.latencies.append(job.finished - job.queued)
+            self.slots.release()
+
+    def _validate(self, job, path):
+        source = self.opensource(path)
+        try:
+            edfnames = source.hotelnames()
+            allotmentnames = source.allotmentnames()
+            records = orphan_findings(source)
+        finally:
+            source.close()
+        job.files = len(edfnames)
+        day = datetime.date.today()
+        yield {"job": job.id, "delivery": job.delivery, "files": len(edfnames), "allotmentfiles": len(allotmentnames)}
+        # the findings are sent in the order of edfnames, at most
+        # window files of this delivery are in the pool at a time. The
+        # results of an aborted delivery are dropped by the pool.
+        pending = collections.deque()
+        index = DeliveryIndex()
+        for filename in edfnames:
+            pending.append((filename, self.pool.apply_async(self.task, (path, filename, day))))
+            if len(pending) >= self.window:
+                yield from self._collect(job, index, *pending.popleft())
+        while pending:
+            yield from self._collect(job, index, *pending.popleft())
+        for row in rows(job.id, None, dict(), records + index.findings(), snippetlimit=1000):
+            job.findings += 1
+            yield dict(zip(FIELDS, row))
+        job.state = "done"
+        yield {"job": job.id, "state": job.state, "counters": job.counters}
+
+    def _collect(self, job, index, filename, result):
+        records, counters, codes = result.get()
+        job.checked += 1
+        index.add(filename, codes)
+        for key, value in counters.items():
+            job.counters[key] = job.counters.get(key, 0) + value
+        with self.lock:
+            self.filetimes.append(time.time())
+        for row in rows(job.id, filename, codes, records, snippetlimit=1000):
+            job.findings += 1
+            yield dict(zip(FIELDS, row))
+
+    def metrics(self):
+        now = time.time()
+        with self.lock:
+            while self.filetimes and self.filetimes[0] < now - 60:
+                self.filetimes.popleft()
+            window = min(60.0, now - self.started)
+            return {"queue_depth": self.waiting, "running": self.running,
+                    "maxdeliveries": self.maxdeliveries, "maxqueue": self.maxqueue, "workers": self.jobs,
+                    "jobs": dict(self.done),
+                    "files_per_s": round(len(self.filetimes) / window, 2) if window > 0 else None,
+                    "latency_p95": round(percentile(self.latencies, 95) or 0, 3) if self.latencies else None,
+                    "uptime": round(now - self.started, 1)}
+
+    def spool(self, stream, length):
+        """Copies length bytes of the upload in stream to a temporary
+        zip file and returns its name."""
+        fd, filename = tempfile.mkstemp(suffix=".zip", prefix="edbug", dir=self.spooldir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    block = stream.read(min(remaining, 1 << 20))
+                    if not block:
+                        raise ValueError("upload ended after {0} of {1} bytes".format(length - remaining, length))
+                    f.write(block)
+                    remaining -= len(block)
+        except Exception:
+            os.remove(filename)
+            raise
+        return filename
+
+    def serve(self, address):
+        host, port = parse_address(address)
+        server = ThreadingHTTPServer((host, port), make_handler(self))
+        server.daemon_threads = True
+        logging.info("Serving on {0}:{1} with {2} workers".format(host, port, self.jobs))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.pool.terminate()
+            self.pool.join()
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            logging.info("{0} {1}".format(self.address_string(), format % args))
+
+        def send_json(self, code, content, headers=None):
+            body = (json.dumps(content) + "\n").encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or dict()).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/metrics":
+                self.send_json(200, service.metrics())
+            elif url.path.startswith("/jobs/"):
+                job = None
+                try:
+                    job = service.get_job(int(url.path[len("/jobs/"):]))
+                except ValueError:
+                    pass
+                if job is None:
+                    self.send_json(404, {"error": "unknown job"})
+                else:
+                    self.send_json(200, job.status())
+            else:
+                self.send_json(404, {"error": "unknown path"})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path != "/validate":
+                self.close_connection = True
+                self.send_json(404, {"error": "unknown path"})
+                return
+            path = parse_qs(url.query).get("path", [None])[0]
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if path is None and length <= 0:
+                self.close_connection = True
+                self.send_json(411, {"error": "upload the zip file with a Content-Length or pass ?path="})
+                return
+            if length > service.maxupload:
+                self.close_connection = True
+                self.send_json(413, {"error": "uploads are limited to {0} bytes".format(service.maxupload)})
+                return
+            job = service.admit(path if path is not None else "upload")
+            if job is None:
+                self.close_connection = True
+                self.send_json(503, {"error": "too many deliveries, try again later"}, {"Retry-After": "10"})
+                return
+            spooled = None
+            try:
+                if path is None:
+                    try:
+                        spooled = path = service.spool(self.rfile, length)
+                    except (OSError, ValueError) as e:
+                        self.close_connection = True
+                        service.discard(job, str(e))
+                        self.send_json(400, {"job": job.id, "error": job.error})
+                        return
+                lines = service.validate(job, path)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for content in lines:
+                        data = (json.dumps(content, ensure_ascii=False) + "\n").encode("utf-8")
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                finally:
+                    lines.close()
+                    if job.started is None:
+                        service.discard(job, "the client went away")
+            finally:
+                if spooled is not None:
+                    os.remove(spooled)
+
+    return Handler
+
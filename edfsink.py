@@ -0,0 +1,102 @@
+"""Structured output of the findings, one record per message.
+
+Next to the text report the findings can be written to a JSONL file or
+to a SQLite database. Each record holds the run, the HotelEDF file
+name, the hotel code and TourOperatorCode from BasicData, the exception
+class, level, check function, room code, header, message and snippet.
+Findings without messages (e.g. a missing AllotmentEDF) give one
+record with the header as message.
+
+SQLite rows are inserted in batches, each in one transaction, and the
+indexes are built when the sink is closed, so queries like
+
+    SELECT * FROM findings WHERE tocode = 'TO' AND level = 'ERROR'
+    SELECT function, COUNT(*) FROM findings GROUP BY function ORDER BY 2 DESC LIMIT 20
+
+do not scan the table. Runs are appended, the run column tells them
+apart."""
+import json
+import logging
+import sqlite3
+import datetime
+from edferrors import Message
+
+FIELDS = ("run", "file", "hotelcode", "tocode", "exception", "levelno", "level", "function", "room", "header", "message", "snippet")
+
+_INDEXES = (
+    ("findings_tocode_level", "tocode, level"),
+    ("findings_hotelcode", "hotelcode"),
+    ("findings_level", "level"),
+    ("findings_function", "function"),
+    ("findings_exception", "exception"),
+    ("findings_run", "run"),
+)
+
+
+def rows(run, filename, codes, records, snippetlimit=None):
+    """Yields a tuple of FIELDS for every message in records."""
+    hotelcode = codes.get("code")
+    tocode = codes.get("tocode")
+    for finding in records:
+        messages = finding.messages
+        if len(messages) == 0:
+            messages = [Message(finding.level, finding.header, None)]
+        for level, message, snippet, template in messages:
+            if snippet is not None and snippetlimit is not None and len(snippet) > snippetlimit:
+                snippet = snippet[:snippetlimit]
+            yield (run, filename, hotelcode, tocode, finding.exception, level, logging.getLevelName(level), finding.function, finding.room, finding.header, message, snippet)
+
+
+class JsonlSink(object):
+    def __init__(self, filename, snippetlimit=1000):
+        self.filename = filename
+        self.snippetlimit = snippetlimit
+        self.run = datetime.datetime.now().isoformat(timespec="seconds")
+        self._file = open(filename, "a", encoding="utf-8", buffering=1 << 20)
+
+    def write(self, filename, codes, records):
+        lines = [json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) for row in rows(self.run, filename, codes, records, self.snippetlimit)]
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class SqliteSink(object):
+    def __init__(self, filename, snippetlimit=1000, batchsize=5000):
+        self.filename = filename
+        self.snippetlimit = snippetlimit
+        self.batchsize = batchsize
+        self.run = datetime.datetime.now().isoformat(timespec="seconds")
+        self._rows = list()
+        self._db = sqlite3.connect(filename, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS findings (run TEXT, file TEXT, hotelcode TEXT, tocode TEXT, exception TEXT, levelno INTEGER, level TEXT, function TEXT, room TEXT, header TEXT, message TEXT, snippet TEXT)")
+
+    def write(self, filename, codes, records):
+        self._rows.extend(rows(self.run, filename, codes, records, self.snippetlimit))
+        if len(self._rows) >= self.batchsize:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT INTO findings VALUES ({0})".format(", ".join("?" * len(FIELDS))), self._rows)
+            self._db.execute("COMMIT")
+            self._rows = list()
+
+    def close(self):
+        self.flush()
+        for name, columns in _INDEXES:
+            self._db.execute("CREATE INDEX IF NOT EXISTS {0} ON findings ({1})".format(name, columns))
+        self._db.close()
+
+
+def open_sink(filename, snippetlimit=1000):
+    """Returns a JsonlSink for .jsonl and .json files, a SqliteSink for
+    all other file names."""
+    if filename.endswith((".jsonl", ".json")):
+        return JsonlSink(filename, snippetlimit)
+    return SqliteSink(filename, snippetlimit)
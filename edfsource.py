@@ -0,0 +1,295 @@
+"""Sources of HotelEDF and AllotmentEDF files. A source lists the
+files of a delivery and opens them for parsing, either from a folder
+or straight from the members of the delivery zip file. A PrefetchSource
+reads the files of another source ahead on a background thread."""
+import io
+import os
+import glob
+import zlib
+import queue
+import threading
+import posixpath
+from zipfile import ZipFile
+
+HOTELONLYDIR = "hotels/hotelonly"
+ALLOTMENTDIR = "hotels/hotelonly/allotment"
+
+
+def filesignature(f, blocksize=1 << 20):
+    """Returns CRC-32 and size of the content of file object f. This is
+    what the central directory of a zip file stores for each member, so
+    files in a folder and members of a zip file can be compared."""
+    crc = 0
+    size = 0
+    while True:
+        block = f.read(blocksize)
+        if not block:
+            break
+        crc = zlib.crc32(block, crc)
+        size += len(block)
+    return crc, size
+
+
+class FolderSource(object):
+    def __init__(self, hotelonlydir, allotmentdir):
+        self.hotelonlydir = hotelonlydir
+        self.allotmentdir = allotmentdir
+        # listed once, not one stat call per HotelEDF
+        self._allotmentnames = None
+
+    def hotelnames(self):
+        return [os.path.basename(f) for f in glob.glob(os.path.join(self.hotelonlydir, "*.xml"))]
+
+    def allotmentnames(self):
+        return [os.path.basename(f) for f in glob.glob(os.path.join(self.allotmentdir, "*.xml"))]
+
+    def hotelpath(self, filename):
+        return os.path.join(self.hotelonlydir, filename)
+
+    def allotmentpath(self, filename):
+        return os.path.join(self.allotmentdir, filename)
+
+    def has_allotment(self, filename):
+        if self._allotmentnames is None:
+            self._allotmentnames = set(self.allotmentnames())
+        return filename in self._allotmentnames
+
+    def open_hotel(self, filename):
+        return open(self.hotelpath(filename), "rb")
+
+    def size(self, filename):
+        """Returns the size of the HotelEDF and the AllotmentEDF."""
+        size = os.path.getsize(self.hotelpath(filename))
+        if self.has_allotment(filename):
+            size += os.path.getsize(self.allotmentpath(filename))
+        return size
+
+    def open_allotment(self, filename):
+        return open(self.allotmentpath(filename), "rb")
+
+    def signatures(self):
+        """Returns a dict of the HotelEDF file names with the signatures
+        of the HotelEDF and the AllotmentEDF (None if it is missing)."""
+        signatures = dict()
+        for filename in self.hotelnames():
+            with open(self.hotelpath(filename), "rb") as f:
+                hotelsignature = filesignature(f)
+            allotmentsignature = None
+            if self.has_allotment(filename):
+                with open(self.allotmentpath(filename), "rb") as f:
+                    allotmentsignature = filesignature(f)
+            signatures[filename] = (hotelsignature, allotmentsignature)
+        return signatures
+
+    def close(self):
+        pass
+
+
+class ZipSource(object):
+    """Reads the EDF files from the members of a zip file without
+    extracting them. The member list is taken from the central directory
+    only, members are decompressed while they are parsed. The zip file
+    is opened lazily once per process, so instances can be passed to
+    worker processes (forked workers must not share the file offset
+    of the parent's file handle)."""
+    def __init__(self, zipfilename):
+        self.zipfilename = zipfilename
+        self.hotelonlydir = os.path.join(zipfilename, HOTELONLYDIR)
+        self.allotmentdir = os.path.join(zipfilename, ALLOTMENTDIR)
+        self._zipfile = None
+        self._pid = None
+        self._hotelmembers = None
+        self._allotmentmembers = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_zipfile"] = None
+        return state
+
+    @property
+    def zipfile(self):
+        if self._zipfile is None or self._pid != os.getpid():
+            self._zipfile = ZipFile(self.zipfilename)
+            self._pid = os.getpid()
+        return self._zipfile
+
+    def _scan(self):
+        self._hotelmembers = dict()
+        self._allotmentmembers = dict()
+        for member in self.zipfile.namelist():
+            if not member.endswith(".xml"):
+                continue
+            folder, filename = posixpath.split(member)
+            if folder == HOTELONLYDIR:
+                self._hotelmembers[filename] = member
+            elif folder == ALLOTMENTDIR:
+                self._allotmentmembers[filename] = member
+
+    def has_folder(self, folder):
+        prefix = folder + "/"
+        for member in self.zipfile.namelist():
+            if member.startswith(prefix):
+                return True
+        return False
+
+    def hotelnames(self):
+        if self._hotelmembers is None:
+            self._scan()
+        return list(self._hotelmembers)
+
+    def allotmentnames(self):
+        if self._allotmentmembers is None:
+            self._scan()
+        return list(self._allotmentmembers)
+
+    def hotelpath(self, filename):
+        return os.path.join(self.hotelonlydir, filename)
+
+    def allotmentpath(self, filename):
+        return os.path.join(self.allotmentdir, filename)
+
+    def has_allotment(self, filename):
+        if self._allotmentmembers is None:
+            self._scan()
+        return filename in self._allotmentmembers
+
+    def open_hotel(self, filename):
+        return self.zipfile.open(posixpath.join(HOTELONLYDIR, filename))
+
+    def size(self, filename):
+        """Returns the uncompressed size of the HotelEDF and the AllotmentEDF."""
+        size = self.zipfile.getinfo(posixpath.join(HOTELONLYDIR, filename)).file_size
+        if self.has_allotment(filename):
+            size += self.zipfile.getinfo(posixpath.join(ALLOTMENTDIR, filename)).file_size
+        return size
+
+    def open_allotment(self, filename):
+        return self.zipfile.open(posixpath.join(ALLOTMENTDIR, filename))
+
+    def signatures(self):
+        """Same as FolderSource.signatures() but taken from the central
+        directory, no member is read."""
+        signatures = dict()
+        for filename in self.hotelnames():
+            info = self.zipfile.getinfo(posixpath.join(HOTELONLYDIR, filename))
+            allotmentsignature = None
+            if self.has_allotment(filename):
+                allotmentinfo = self.zipfile.getinfo(posixpath.join(ALLOTMENTDIR, filename))
+                allotmentsignature = (allotmentinfo.CRC, allotmentinfo.file_size)
+            signatures[filename] = ((info.CRC, info.file_size), allotmentsignature)
+        return signatures
+
+    def close(self):
+        if self._zipfile is not None:
+            self._zipfile.close()
+            self._zipfile = None
+
+
+class PrefetchSource(object):
+    """Wraps a source and reads the HotelEDF and AllotmentEDF of the
+    files in edfnames on a background thread, up to depth pairs ahead
+    of the files being checked. Each file is read with a single read
+    call and parsed from memory. The checks must open the files in the
+    order of edfnames, a file which was not prefetched is read from
+    the source. Errors while reading are raised when the file is
+    opened. stop() ends the thread.
+
+    Reading releases the GIL, parsing does not, so parsing is left to
+    the thread which checks the files."""
+    def __init__(self, source, edfnames, depth=4):
+        self.source = source
+        self.hotelonlydir = source.hotelonlydir
+        self.allotmentdir = source.allotmentdir
+        self._positions = dict((filename, position) for position, filename in enumerate(edfnames))
+        self._position = -1
+        self._queue = queue.Queue(depth)
+        self._stopped = threading.Event()
+        self._current = None
+        self._thread = threading.Thread(target=self._read, args=(list(edfnames),), name="edbug-prefetch", daemon=True)
+        self._thread.start()
+
+    def _fetch(self, open_file, filename):
+        try:
+            with open_file(filename) as f:
+                return f.read(), None
+        except Exception as e:
+            return None, e
+
+    def _read(self, edfnames):
+        for filename in edfnames:
+            hotel = self._fetch(self.source.open_hotel, filename)
+            allotment = None
+            if self.source.has_allotment(filename):
+                allotment = self._fetch(self.source.open_allotment, filename)
+            while not self._stopped.is_set():
+                try:
+                    self._queue.put((filename, hotel, allotment), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if self._stopped.is_set():
+                return
+
+    def _get(self, filename):
+        """Returns the prefetched (hotel, allotment) of filename or None."""
+        position = self._positions.get(filename)
+        if position is None or position < self._position:
+            return None
+        while self._position < position:
+            try:
+                self._current = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if not self._thread.is_alive() and self._queue.empty():
+                    return None
+                continue
+            self._position = self._positions[self._current[0]]
+        return self._current[1:]
+
+    def _open(self, fetched):
+        data, error = fetched
+        if error is not None:
+            raise error
+        return io.BytesIO(data)
+
+    def open_hotel(self, filename):
+        fetched = self._get(filename)
+        if fetched is None:
+            return self.source.open_hotel(filename)
+        return self._open(fetched[0])
+
+    def open_allotment(self, filename):
+        fetched = self._get(filename)
+        if fetched is None or fetched[1] is None:
+            return self.source.open_allotment(filename)
+        return self._open(fetched[1])
+
+    def hotelnames(self):
+        return self.source.hotelnames()
+
+    def allotmentnames(self):
+        return self.source.allotmentnames()
+
+    def hotelpath(self, filename):
+        return self.source.hotelpath(filename)
+
+    def allotmentpath(self, filename):
+        return self.source.allotmentpath(filename)
+
+    def has_allotment(self, filename):
+        return self.source.has_allotment(filename)
+
+    def size(self, filename):
+        return self.source.size(filename)
+
+    def signatures(self):
+        return self.source.signatures()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self._current = None
+        self._position = len(self._positions)
+
+    def close(self):
+        self.stop()
+        self.source.close()
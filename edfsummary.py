@@ -0,0 +1,153 @@
+"""Delivery-wide summary of the findings of the checks.
+
+If the generator of a supplier has a systematic bug, the same message
+is reported for every hotel, each time with its snippet. A Summary
+groups the messages by exception class, check function, message
+template (the message before its args are formatted in, see
+edferrors.ErrorMsg) and level. For each group it counts the messages
+and the files and hotels they were found in and keeps a few examples
+with their snippets.
+
+Its memory does not grow with the delivery:
+
+    groups     at most maxgroups. When the table is full, messages of
+               a new kind are counted in one group "other messages" per
+               exception class, function and level.
+    examples   a reservoir sample (algorithm R) of examples messages per
+               group, drawn with a generator seeded with seed. Snippets
+               are shortened to snippetlimit characters.
+    hotels     the BasicData codes are counted with a sketch of the
+               size smallest hashes (see Distinct), exact as long as a
+               group has fewer hotels.
+    files      exact, the files are added one after the other.
+
+Findings edbug reports itself (a file which cannot be parsed, a missing
+AllotmentEDF) have no exception class and are not summarized."""
+import heapq
+import random
+import hashlib
+import logging
+from collections import namedtuple
+from edferrors import Finding, Message
+
+Example = namedtuple("Example", "header message snippet")
+
+
+class Distinct(object):
+    """Counts distinct values in fixed memory by keeping the size
+    smallest 64 bit hashes of the values (k minimum values)."""
+    def __init__(self, size=256):
+        self.size = size
+        self._heap = list()
+        self._hashes = set()
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        if h in self._hashes:
+            return
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, -h)
+            self._hashes.add(h)
+        elif h < -self._heap[0]:
+            self._hashes.discard(-heapq.heapreplace(self._heap, -h))
+            self._hashes.add(h)
+
+    @property
+    def exact(self):
+        return len(self._heap) < self.size
+
+    def count(self):
+        if self.exact:
+            return len(self._heap)
+        return int(round((self.size - 1) * (1 << 64) / -self._heap[0]))
+
+
+class Group(object):
+    __slots__ = ("count", "files", "lastfile", "hotels", "examples")
+
+    def __init__(self, hotelsketch):
+        self.count = 0
+        self.files = 0
+        self.lastfile = None
+        self.hotels = Distinct(hotelsketch)
+        self.examples = list()
+
+
+class Summary(object):
+    def __init__(self, examples=3, snippetlimit=1000, maxgroups=1000, hotelsketch=256, seed=0):
+        self.examples = examples
+        self.snippetlimit = snippetlimit
+        self.maxgroups = maxgroups
+        self.hotelsketch = hotelsketch
+        self.groups = dict()
+        self.files = 0
+        self._random = random.Random(seed)
+
+    def add(self, filename, codes, records):
+        """Adds the findings records of the HotelEDF filename, codes are
+        its BasicData codes (see edbug.Checker)."""
+        self.files += 1
+        hotel = None
+        groups = self.groups
+        for finding in records:
+            if finding.exception is None:
+                continue
+            for message in finding.messages:
+                template = message.template
+                if template is None:
+                    template = message.message
+                key = (finding.exception, finding.function, template, message.level)
+                group = groups.get(key)
+                if group is None:
+                    if len(groups) >= self.maxgroups:
+                        key = (finding.exception, finding.function, None, message.level)
+                        group = groups.get(key)
+                    if group is None:
+                        group = groups[key] = Group(self.hotelsketch)
+                group.count += 1
+                if group.lastfile != self.files:
+                    group.lastfile = self.files
+                    group.files += 1
+                    if hotel is None:
+                        code = codes.get("code")
+                        if code is None:
+                            # no BasicData Code, the file stands for the hotel
+                            hotel = "\x00{0}".format(filename)
+                        else:
+                            hotel = "{0}\x00{1}".format(codes.get("tocode"), code)
+                    group.hotels.add(hotel)
+                self._sample(group, finding, message)
+
+    def _sample(self, group, finding, message):
+        if len(group.examples) < self.examples:
+            index = len(group.examples)
+            group.examples.append(None)
+        else:
+            index = self._random.randrange(group.count)
+            if index >= self.examples:
+                return
+        snippet = message.snippet
+        if snippet is not None and self.snippetlimit is not None and len(snippet) > self.snippetlimit:
+            snippet = "{0}...({1} chars)".format(snippet[:self.snippetlimit], len(snippet))
+        group.examples[index] = Example(finding.header, message.message, snippet)
+
+    def findings(self):
+        """Returns the summary as Findings, the most severe and most
+        frequent kinds of messages first."""
+        records = list()
+        if len(self.groups) == 0:
+            return records
+        records.append(Finding(logging.INFO, "Summary of the findings in {0} HotelEDF files, {1} kinds of messages:".format(self.files, len(self.groups))))
+        for key, group in sorted(self.groups.items(), key=lambda item: (-item[0][3], -item[1].count, item[0][0], item[0][1] or "", item[0][2] or "")):
+            exception, function, template, level = key
+            if template is None:
+                template = "other messages"
+            else:
+                template = '"{0}"'.format(template)
+            # a file has one hotel, the estimate cannot be above the files
+            hotels = min(group.hotels.count(), group.files)
+            header = "{0} x {1} from {2} ({3}) in {4} files and {5}{6} hotels".format(
+                group.count, template, function, exception, group.files, "" if group.hotels.exact else "about ", hotels)
+            messages = [Message(level, "e.g. {0} {1}".format(example.header, example.message), example.snippet) for example in group.examples]
+            records.append(Finding(level, header, exception, function, None, messages))
+        return records
@@ -0,0 +1,245 @@
+"""Time and memory budgets for checking pathological files.
+
+A check which takes longer than checktimeout seconds for one element or
+document is interrupted with SIGALRM, its findings for that call are
+lost and the check is reported as timed out (see guard()). This works
+in the main thread of any process, but a check stuck in a long C call
+(e.g. serializing a huge element) is only interrupted when that call
+returns.
+
+The hard limits need a process which can be killed. The Supervisor
+checks the files on worker processes it starts itself, one file per
+worker at a time. A worker whose file takes longer than filetimeout
+seconds is killed and replaced, a worker which runs out of memory
+(memorylimit, the address space limit set with resource.setrlimit)
+gives up its file and is replaced as well. The other files are not
+affected, the results come back in the order of the file names."""
+import time
+import signal
+import functools
+import threading
+import traceback
+import collections
+import multiprocessing
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# name of the check running in this worker, read by the Supervisor
+current = None
+
+_armed = False
+
+
+class CheckTimeout(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    if _armed:
+        raise CheckTimeout()
+
+
+def can_interrupt():
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+def where(node):
+    """Names the element a check was called with for messages, e.g.
+    'Room element with Code "DZ1"'."""
+    tag = getattr(node, "tag", None)
+    if not isinstance(tag, str):
+        return "the file"
+    text = "{0} element".format(tag.rpartition("}")[2])
+    code = node.get("Code")
+    if code is not None:
+        text += ' with Code "{0}"'.format(code)
+    return text
+
+
+def guard(function, name, timeout=None, timedout=None):
+    """Returns function, which publishes name while it runs and which
+    is interrupted after timeout seconds. The name of an interrupted
+    check and where() it was called are appended to timedout as a pair
+    and the call returns None. When the
+    check returns the name is cleared, a file which is stopped while it
+    is parsed or its findings are reported names no check."""
+    if timeout is not None:
+        signal.signal(signal.SIGALRM, _alarm)
+    encoded = name.encode("utf-8")[:255]
+
+    @functools.wraps(function)
+    def guarded(*args):
+        global _armed
+        if current is not None:
+            current.value = encoded
+        try:
+            if timeout is None:
+                return function(*args)
+            _armed = True
+            try:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+                return function(*args)
+            except CheckTimeout:
+                timedout.append((name, where(args[0] if args else None)))
+                return None
+            finally:
+                _armed = False
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        finally:
+            if current is not None:
+                current.value = b""
+    return guarded
+
+
+def _work(conn, name, initializer, initargs, task, memorylimit):
+    global current
+    current = name
+    if memorylimit is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memorylimit, memorylimit))
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        try:
+            filename = conn.recv()
+        except EOFError:
+            return
+        if filename is None:
+            return
+        try:
+            conn.send(("ok", task(filename)))
+        except MemoryError:
+            # the state of the worker is unknown after this
+            conn.send(("memory", None))
+            return
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+        current.value = b""
+
+
+class Worker(object):
+    def __init__(self, initializer, initargs, task, memorylimit):
+        self.conn, child = multiprocessing.Pipe()
+        self.current = multiprocessing.RawArray("c", 256)
+        self.process = multiprocessing.Process(target=_work, args=(child, self.current, initializer, initargs, task, memorylimit), daemon=True)
+        self.process.start()
+        child.close()
+        self.job = None
+
+    def function(self):
+        return self.current.value.decode("utf-8", errors="replace") or None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+# a file which could not be checked: kind is "timeout", "memory",
+# "died" or "error", function is the check running at that moment or
+# None, detail the exit code or the traceback
+Failure = collections.namedtuple("Failure", "kind function detail")
+
+
+class Supervisor(object):
+    """Runs task(filename) on jobs worker processes started with
+    initializer(*initargs)."""
+    def __init__(self, jobs, initializer, initargs, task, filetimeout=None, memorylimit=None):
+        self.jobs = max(1, jobs)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.task = task
+        self.filetimeout = filetimeout
+        self.memorylimit = memorylimit
+
+    def start(self):
+        return Worker(self.initializer, self.initargs, self.task, self.memorylimit)
+
+    def run(self, edfnames):
+        """Yields filename, result of task and None or filename, None
+        and a Failure, in the order of edfnames."""
+        workers = [self.start() for i in range(min(self.jobs, len(edfnames)))]
+        results = dict()
+        # files are handed out at most window files ahead of the next
+        # result to yield, so a slow file does not pile up results
+        window = 4 * self.jobs
+        nextfile = 0
+        nextresult = 0
+        try:
+            while nextresult < len(edfnames):
+                for i, worker in enumerate(workers):
+                    if worker.job is None and nextfile < len(edfnames) and nextfile < nextresult + window:
+                        worker.conn.send(edfnames[nextfile])
+                        worker.job = (nextfile, time.monotonic())
+                        nextfile += 1
+                busy = [worker for worker in workers if worker.job is not None]
+                timeout = None
+                if self.filetimeout is not None:
+                    timeout = max(0, min(worker.job[1] + self.filetimeout for worker in busy) - time.monotonic())
+                ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy], timeout)
+                for i, worker in enumerate(workers):
+                    if worker.job is None:
+                        continue
+                    index, started = worker.job
+                    failure = None
+                    if worker.conn in ready or worker.process.sentinel in ready:
+                        try:
+                            status, value = worker.conn.recv()
+                        except (EOFError, OSError):
+                            worker.process.join()
+                            failure = Failure("died", worker.function(), worker.process.exitcode)
+                        else:
+                            if status == "ok":
+                                results[index] = (value, None)
+                                worker.job = None
+                                continue
+                            failure = Failure(status, worker.function(), value)
+                    elif self.filetimeout is not None and time.monotonic() - started >= self.filetimeout:
+                        failure = Failure("timeout", worker.function(), self.filetimeout)
+                    else:
+                        continue
+                    results[index] = (None, failure)
+                    if failure.kind == "error":
+                        worker.current.value = b""
+                        worker.job = None
+                    else:
+                        worker.kill()
+                        workers[i] = self.start()
+                while nextresult in results:
+                    result, failure = results.pop(nextresult)
+                    yield edfnames[nextresult], result, failure
+                    nextresult += 1
+        finally:
+            for worker in workers:
+                if worker.job is None:
+                    worker.stop()
+                else:
+                    worker.kill()
+
+
+def describe(failure, fqn, memorylimit=None):
+    """Returns the header of the CRITICAL finding for a Failure."""
+    function = ""
+    if failure.function is not None:
+        function = " in function {0}".format(failure.function)
+    if failure.kind == "timeout":
+        return "Check timed out after {0} s{1}, HotelEDF {2} was not checked".format(failure.detail, function, fqn)
+    if failure.kind == "memory":
+        return "Check exceeded the memory limit of {0} MB{1}, HotelEDF {2} was not checked".format(memorylimit // (1024 * 1024) if memorylimit else "?", function, fqn)
+    if failure.kind == "died":
+        return "Worker process died with exit code {0}{1}, HotelEDF {2} was not checked".format(failure.detail, function, fqn)
+    return "Check failed{0}, HotelEDF {1} was not checked: {2}".format(function, fqn, failure.detail.strip().splitlines()[-1])
@@ -0,0 +1,100 @@
+"""Conversion of EDF attribute values for plugins.
+
+ISO dates are parsed through a bounded memo, a delivery has only a few
+thousand distinct dates. integer() reads an attribute and returns its
+value, or appends the ErrorMsg for a missing, empty or invalid value,
+so a plugin needs one call per attribute.
+
+The current date is taken once per run, so all files of a delivery are
+checked against the same day. Comparisons with today are recorded,
+which tells the result cache (see edfcache) until when the findings of
+a file stay valid."""
+import logging
+import datetime
+import functools
+from edferrors import ErrorMsg
+
+_today = None
+_validuntil = None
+
+
+def today():
+    global _today
+    if _today is None:
+        _today = datetime.date.today()
+    return _today
+
+
+def reset_today(date=None):
+    """Take a new snapshot of the current date on the next call of
+    today(), or check against date from now on."""
+    global _today
+    _today = date
+
+
+def is_past(date):
+    """Returns True if date is before today. A date which is not in the
+    past yet will be in the past the day after it, this is recorded as
+    the end of validity of the current findings."""
+    if date < today():
+        return True
+    changes_on(date + datetime.timedelta(days=1))
+    return False
+
+
+def changes_on(date):
+    """Record that the outcome of a check changes on date."""
+    global _validuntil
+    if _validuntil is None or date < _validuntil:
+        _validuntil = date
+
+
+def start_recording():
+    global _validuntil
+    _validuntil = None
+
+
+def valid_until():
+    """Returns the first date the findings recorded since start_recording()
+    may change or None if they do not depend on the date."""
+    return _validuntil
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_date(value):
+    """Returns value (YYYY-MM-DD) as date or None if it is not a date.
+    Accepts the same values as strptime with "%Y-%m-%d"."""
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return None
+
+
+def integer(node, name, errormsgs, missing="{0} attribute is mandatory", missinglevel=logging.ERROR,
+            empty="{0} attribute cannot be empty", invalid="{0} attribute must contain an integer value",
+            zero=None, errornode=None):
+    """Returns attribute name of node as int. If it is missing, empty or
+    not an integer (or 0 and a zero message is passed) an ErrorMsg is
+    appended to errormsgs and None is returned. Messages are format
+    strings getting the attribute name, pass missing=None if the
+    attribute is optional. errornode is the node in the message, node
+    by default."""
+    value = node.get(name)
+    if errornode is None:
+        errornode = node
+    if value is None:
+        if missing is not None:
+            errormsgs.append(ErrorMsg(missing, node=errornode, level=missinglevel, args=(name,)))
+        return None
+    if len(value) == 0:
+        errormsgs.append(ErrorMsg(empty, node=errornode, level=logging.ERROR, args=(name,)))
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        errormsgs.append(ErrorMsg(invalid, node=errornode, level=logging.ERROR, args=(name,)))
+        return None
+    if value == 0 and zero is not None:
+        errormsgs.append(ErrorMsg(zero, node=errornode, level=logging.ERROR, args=(name,)))
+    return value
+
@@ -0,0 +1,124 @@
+"""Watch mode: checks every delivery zip file dropped into a folder.
+
+The folder is scanned every interval seconds. A zip file is taken as
+complete when its size and modification time did not change for
+settle scans. Each delivery is checked by one process of a pool into
+its own report file, up to queuesize deliveries are waiting or being
+checked at a time. The pool lives as long as the watcher, so the
+plugins are imported and prepared once per process and not for every
+delivery.
+
+A delivery which cannot be checked is reported in its report file, the
+watcher only stops on SIGINT/SIGTERM (after the running checks are
+finished) or if the folder cannot be read anymore."""
+import os
+import time
+import signal
+import logging
+import multiprocessing
+
+
+class Watcher(object):
+    """task(zipfilename, reportfilename) is run in the pool for each
+    delivery and returns True if the delivery could be checked.
+    initializer is run once in every process of the pool."""
+    def __init__(self, directory, task, initializer=None, reportdir=None, jobs=1, interval=5.0, settle=2, queuesize=None):
+        self.directory = directory
+        self.task = task
+        self.initializer = initializer
+        self.reportdir = reportdir if reportdir is not None else directory
+        self.jobs = jobs
+        self.interval = interval
+        self.settle = settle
+        self.queuesize = queuesize if queuesize is not None else 2 * jobs
+        # path -> (size, mtime, number of scans without change)
+        self.candidates = dict()
+        # (path, size, mtime) of the deliveries already checked or queued
+        self.done = set()
+        self.stopped = False
+
+    def reportfile(self, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.reportdir, "{0}_report.txt".format(name))
+
+    def is_reported(self, path, mtime):
+        """A report newer than the zip file is left from a previous run."""
+        try:
+            return os.path.getmtime(self.reportfile(path)) >= mtime
+        except OSError:
+            return False
+
+    def scan(self):
+        """Returns the complete zip files which have not been checked,
+        oldest first. Raises OSError if the folder cannot be read."""
+        complete = list()
+        seen = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(".zip") or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                path = entry.path
+                seen.add(path)
+                key = (path, stat.st_size, stat.st_mtime)
+                if key in self.done:
+                    continue
+                previous = self.candidates.get(path)
+                if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime):
+                    scans = previous[2] + 1
+                else:
+                    scans = 0
+                self.candidates[path] = (stat.st_size, stat.st_mtime, scans)
+                if scans >= self.settle:
+                    if self.is_reported(path, stat.st_mtime):
+                        self.done.add(key)
+                        del self.candidates[path]
+                    else:
+                        complete.append((stat.st_mtime, path, key))
+        for path in list(self.candidates):
+            if path not in seen:
+                del self.candidates[path]
+        complete.sort()
+        return [(path, key) for mtime, path, key in complete]
+
+    def stop(self, signum=None, frame=None):
+        self.stopped = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        logging.info("Watching {0} for deliveries, reports are written to {1}".format(self.directory, self.reportdir))
+        pending = dict()
+        pool = multiprocessing.Pool(self.jobs, initializer=self.initializer)
+        try:
+            while not self.stopped:
+                for path, key in self.scan():
+                    if len(pending) >= self.queuesize:
+                        break
+                    del self.candidates[path]
+                    self.done.add(key)
+                    logging.info("Checking {0}".format(path))
+                    pending[path] = pool.apply_async(self.task, (path, self.reportfile(path)))
+                self.collect(pending)
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            logging.critical("Cannot watch {0}: {1}".format(self.directory, e))
+            raise
+        finally:
+            logging.info("Stopping, waiting for {0} deliveries being checked".format(len(pending)))
+            pool.close()
+            pool.join()
+            self.collect(pending)
+
+    def collect(self, pending):
+        for path, result in list(pending.items()):
+            if result.ready():
+                del pending[path]
+                if result.successful() and result.get() is True:
+                    logging.info("Checked {0}, see {1}".format(path, self.reportfile(path)))
+                else:
+                    logging.error("{0} could not be checked, see {1}".format(path, self.reportfile(path)))
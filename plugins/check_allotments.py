@@ -2,51 +2,122 @@ import logging
 import datetime
 from edferrors import ErrorMsg, AllotmentEdfError 
 from edfns import ns 
+import edfvalues
+import edfpattern
+import edfranges
+from edfregistry import describe
 
 def check_allotments(hotelrootnode, allotmentrootnode):
     if allotmentrootnode is not None:
         allotmentnodes = allotmentrootnode.findall("atmt:SellingData/atmt:Allotments/atmt:Allotment", ns)
         if len(allotmentnodes) == 0:
             raise AllotmentEdfError("The AllotmentEDF does not contain any Allotment elements", level=logging.ERROR)
-        errormsgs = list()
-        for allotmentnode in allotmentnodes:
-            start = allotmentnode.get("Start")
-            end = allotmentnode.get("End")
-            if start is None:
-                errormsgs.append(ErrorMsg("Start attribute is missing in Allotment element", node=allotmentnode, level=logging.ERROR))
-            if end is None:
-                errormsgs.append(ErrorMsg("End attribute is missing in Allotment element", node=allotmentnode, level=logging.ERROR))
-            patternlength = allotmentnode.get("PatternLength")
-            pattern = allotmentnode.get("Pattern")
-            if pattern is None:
-                errormsgs.append(ErrorMsg("Pattern attribute is missing in Allotment element", node=allotmentnode, level=logging.ERROR))
-            if patternlength is None:
-                patternlength = 1
-            else:
-                try:
-                    patternlength = int(patternlength)
-                except (ValueError, TypeError):
-                    errormsgs.append(ErrorMsg("PatternLength must have a numeric value", node=allotmentnode, level=logging.ERROR))
-            try:
-                startdate = datetime.datetime.strptime(start, "%Y-%m-%d").date()
-            except (ValueError, TypeError):
-                errormsgs.append(ErrorMsg("Value for Start must be a date in ISO format", node=allotmentnode, level=logging.ERROR))
-            try:
-                enddate = datetime.datetime.strptime(end, "%Y-%m-%d").date()
-            except (ValueError, TypeError):
-                errormsgs.append(ErrorMsg("Value for End must be a date in ISO format", node=allotmentnode, level=logging.ERROR))
-            try:
-                if enddate < startdate:
-                    errormsgs.append(ErrorMsg("Value for End cannot be smaller than value for Start", node=allotmentnode, level=logging.ERROR))
-                expectedlength = ((enddate - startdate).days + 1) * patternlength
-                if expectedlength != len(pattern):
-                    errormsgs.append(ErrorMsg("The length of the string in pattern is {0}. Expected is {1}".format(len(pattern), expectedlength), node=allotmentnode, level=logging.ERROR))
-                if enddate < datetime.date.today():
-                    errormsgs.append(ErrorMsg("End date is in the past, the EDF is outdated", node=allotmentnode, level=logging.ERROR))
-                if startdate < datetime.date.today():
-                    errormsgs.append(ErrorMsg("Start date is in the past. You should only include data with date >= today", node=allotmentnode, level=logging.ERROR))
-            except NameError:
-                pass
-        if len(errormsgs) > 0:
-            raise AllotmentEdfError("{0} errors in AllotmentEDF".format(len(errormsgs)), messages=errormsgs)
+
+
+@describe(cost=2)
+def allotmentnode_checkattributes(allotmentnode):
+    errormsgs = list()
+    start = allotmentnode.get("Start")
+    end = allotmentnode.get("End")
+    if start is None:
+        errormsgs.append(ErrorMsg("Start attribute is missing in Allotment element", node=allotmentnode, level=logging.ERROR))
+    if end is None:
+        errormsgs.append(ErrorMsg("End attribute is missing in Allotment element", node=allotmentnode, level=logging.ERROR))
+    pattern = allotmentnode.get("Pattern")
+    if pattern is None:
+        errormsgs.append(ErrorMsg("Pattern attribute is missing in Allotment element", node=allotmentnode, level=logging.ERROR))
+    patternlength = edfvalues.integer(allotmentnode, "PatternLength", errormsgs, missing=None,
+                                      empty="PatternLength must have a numeric value", invalid="PatternLength must have a numeric value")
+    if patternlength is None and "PatternLength" not in allotmentnode.attrib:
+        patternlength = 1
+    startdate = edfvalues.parse_date(start)
+    if startdate is None:
+        errormsgs.append(ErrorMsg("Value for Start must be a date in ISO format", node=allotmentnode, level=logging.ERROR))
+    enddate = edfvalues.parse_date(end)
+    if enddate is None:
+        errormsgs.append(ErrorMsg("Value for End must be a date in ISO format", node=allotmentnode, level=logging.ERROR))
+    if startdate is not None and enddate is not None:
+        if enddate < startdate:
+            errormsgs.append(ErrorMsg("Value for End cannot be smaller than value for Start", node=allotmentnode, level=logging.ERROR))
+        if pattern is not None and patternlength is not None:
+            expectedlength = ((enddate - startdate).days + 1) * patternlength
+            if expectedlength != len(pattern):
+                errormsgs.append(ErrorMsg("The length of the string in pattern is {0}. Expected is {1}", node=allotmentnode, level=logging.ERROR, args=(len(pattern), expectedlength)))
+        if edfvalues.is_past(enddate):
+            errormsgs.append(ErrorMsg("End date is in the past, the EDF is outdated", node=allotmentnode, level=logging.ERROR))
+        if edfvalues.is_past(startdate):
+            errormsgs.append(ErrorMsg("Start date is in the past. You should only include data with date >= today", node=allotmentnode, level=logging.ERROR))
+    if len(errormsgs) > 0:
+        raise AllotmentEdfError("{0} errors in Allotment element".format(len(errormsgs)), messages=errormsgs)
     
+
+
+@describe(cost=2)
+def check_allotmentranges(hotelrootnode, allotmentrootnode):
+    """Allotments with the same identifying attributes (all but Start,
+    End, PatternLength and Pattern, usually Room and Board) must not
+    overlap. Gaps in the SeasonDefinitions period are reported as INFO.
+    The ranges of each group are sorted and swept once (see edfranges)."""
+    if allotmentrootnode is None:
+        return
+    ranges = dict()
+    for allotmentnode in allotmentrootnode.iterfind("atmt:SellingData/atmt:Allotments/atmt:Allotment", ns):
+        attrib = allotmentnode.attrib
+        start = edfvalues.parse_date(attrib.get("Start"))
+        end = edfvalues.parse_date(attrib.get("End"))
+        # invalid dates are reported by allotmentnode_checkattributes
+        if start is None or end is None or end < start:
+            continue
+        start = start.toordinal()
+        end = end.toordinal()
+        key = tuple(sorted((name, value) for name, value in attrib.items() if name not in ("Start", "End", "PatternLength", "Pattern")))
+        try:
+            ranges[key].append((start, end))
+        except KeyError:
+            ranges[key] = [(start, end)]
+    seasonstart = seasonend = None
+    if hotelrootnode is not None:
+        seasondefsnode = hotelrootnode.find("edf:SellingData/edf:SeasonDefinitions", ns)
+        if seasondefsnode is not None:
+            seasonstart = edfvalues.parse_date(seasondefsnode.get("Start"))
+            seasonend = edfvalues.parse_date(seasondefsnode.get("End"))
+            if seasonstart is None or seasonend is None:
+                seasonstart = seasonend = None
+            else:
+                seasonstart = seasonstart.toordinal()
+                seasonend = seasonend.toordinal()
+    fromordinal = datetime.date.fromordinal
+    errormsgs = list()
+    for key, group in ranges.items():
+        name = " ".join('{0}="{1}"'.format(n, v) for n, v in key)
+        for kind, start, end, until in edfranges.sweep(group, seasonstart, seasonend):
+            if kind == edfranges.DUPLICATE:
+                errormsgs.append(ErrorMsg("Duplicate Allotments for {0} from {1} to {2}", level=logging.ERROR, args=(name, fromordinal(start), fromordinal(end))))
+            elif kind == edfranges.OVERLAP:
+                errormsgs.append(ErrorMsg("Allotment for {0} from {1} to {2} overlaps another Allotment until {3}", level=logging.ERROR, args=(name, fromordinal(start), fromordinal(end), fromordinal(until))))
+            else:
+                errormsgs.append(ErrorMsg("No Allotment for {0} from {1} to {2} within the season {3} to {4}", level=logging.INFO, args=(name, fromordinal(start), fromordinal(end), fromordinal(seasonstart), fromordinal(seasonend))))
+    if len(errormsgs) > 0:
+        raise AllotmentEdfError("{0} errors in Allotment ranges".format(len(errormsgs)), messages=errormsgs)
+
+
+@describe(cost=2)
+def allotmentnode_checkpattern(allotmentnode):
+    pattern = allotmentnode.get("Pattern")
+    # invalid values are reported by allotmentnode_checkattributes
+    patternlength = edfvalues.integer(allotmentnode, "PatternLength", list(), missing=None)
+    if "PatternLength" not in allotmentnode.attrib:
+        patternlength = 1
+    if pattern is None or patternlength is None or patternlength < 1:
+        return
+    values, invalid = edfpattern.decode(pattern)
+    days = len(values) // patternlength
+    zerodays = edfpattern.zerodays(values, patternlength)
+    edfpattern.record(days, zerodays, invalid >= 0)
+    errormsgs = list()
+    if invalid >= 0:
+        errormsgs.append(ErrorMsg("Pattern contains {0} invalid characters, the first is {1!r} at position {2}. Allowed are 0-9 and A-Z", node=allotmentnode, level=logging.ERROR, args=(values.count(edfpattern.INVALID), pattern[invalid], invalid + 1)))
+    if days > 0 and zerodays == days:
+        errormsgs.append(ErrorMsg("Pattern has no availability on any of its {0} days", node=allotmentnode, level=logging.WARNING, args=(days,)))
+    if len(errormsgs) > 0:
+        raise AllotmentEdfError("{0} errors in Allotment Pattern".format(len(errormsgs)), messages=errormsgs)
@@ -3,18 +3,18 @@
 import logging
 from edferrors import BasicDataError, AllotmentEdfError
 from edfns import ns
-from string import ascii_lowercase, ascii_uppercase
+from edfrules import Rule, Element, check
 
 def check_rootattribs(hotelrootnode, allotmentrootnode):
     if allotmentrootnode is not None:
         basicdatanode = hotelrootnode.find("edf:BasicData", ns)
         allotmentbasicdatanode = allotmentrootnode.find("atmt:BasicData", ns)
         if basicdatanode.get("Code") != allotmentbasicdatanode.get("Code"):
-            raise BasicDataError("BasicData Code attribute in HotelEDF {0} and AllotmentEDF {1} do not match".format(basicdatanode.get("Code"), allotmentbasicdatanode.get("Code")), level=logging.ERROR)
+            raise BasicDataError("BasicData Code attribute in HotelEDF {0} and AllotmentEDF {1} do not match", level=logging.ERROR, args=(basicdatanode.get("Code"), allotmentbasicdatanode.get("Code")))
         if basicdatanode.get("TourOperatorCode") != allotmentbasicdatanode.get("TourOperatorCode"):
-            raise BasicDataError("BasicData TourOperatorCode attribute in HotelEDF {0} and AllotmentEDF {1} do not match".format(basicdatanode.get("TourOperatorCode"), allotmentbasicdatanode.get("TourOperatorCode")), level=logging.ERROR)
+            raise BasicDataError("BasicData TourOperatorCode attribute in HotelEDF {0} and AllotmentEDF {1} do not match", level=logging.ERROR, args=(basicdatanode.get("TourOperatorCode"), allotmentbasicdatanode.get("TourOperatorCode")))
         if basicdatanode.get("Source") != allotmentbasicdatanode.get("Source"):
-            raise BasicDataError("BasicData Source attribute in HotelEDF {0} and AllotmentEDF {1} do not match".format(basicdatanode.get("Source"), allotmentbasicdatanode.get("Source")), level=logging.ERROR)
+            raise BasicDataError("BasicData Source attribute in HotelEDF {0} and AllotmentEDF {1} do not match", level=logging.ERROR, args=(basicdatanode.get("Source"), allotmentbasicdatanode.get("Source")))
 
 def check_name(hotelrootnode, allotmentrootnode):
     namenode = hotelrootnode.find("edf:BasicData/edf:Name", ns)
@@ -55,84 +55,21 @@ def check_hotelkey(hotelrootnode, allotmentrootnode):
             raise BasicDataError("Empty HotelKey node", node=hotelkeynode, level=logging.ERROR)
     
     
-def check_street(hotelrootnode, allotmentrootnode):
-    streetnode = hotelrootnode.find("edf:BasicData/edf:Address/edf:Street", ns)
-    if streetnode is not None:
-        if streetnode.text is None:
-            raise BasicDataError("Empty Street element. Consider removing empty elements", node=streetnode, level=logging.INFO)
-        elif streetnode.text.find("\n") > -1:
-            raise BasicDataError("Street element should not contain any line breaks", node=streetnode, level=logging.WARNING)
-            
-            
-def check_zipcode(hotelrootnode, allotmentrootnode):
-    zipcodenode = hotelrootnode.find("edf:BasicData/edf:Address/edf:ZipCode", ns)
-    if zipcodenode is not None:
-        if zipcodenode.text is None:
-            raise BasicDataError("Empty ZipCode element. Consider removing empty elements", node=zipcodenode, level=logging.INFO)
-        elif zipcodenode.text.find("\n") > -1:
-            raise BasicDataError("ZipCode element should not contain any line breaks", node=zipcodenode, level=logging.WARNING)
-            
-def check_citycode(hotelrootnode, allotmentrootnode):
-    citynode = hotelrootnode.find("edf:BasicData/edf:Address/edf:City", ns)
-    if citynode is not None:
-        if citynode.text is None:
-            raise BasicDataError("Empty City element. Consider removing empty elements", node=citynode, level=logging.INFO)
-        elif citynode.text.find("\n") > -1:
-            raise BasicDataError("City element should not contain any line breaks", node=citynode, level=logging.WARNING)
-            
-            
-def check_country(hotelrootnode, allotmentrootnode):
-    countrynode = hotelrootnode.find("edf:BasicData/edf:Address/edf:Country", ns)
-    if countrynode is not None:
-        if countrynode.text is None:
-            raise BasicDataError("Empty Country element. Consider removing empty elements", node=countrynode, level=logging.INFO)
-        elif len(countrynode.text) != 2:
-            raise BasicDataError("The Country element is expected to contain a 2 letter ISO 3166 country code, not the verbose name of the country", node=countrynode, level=logging.INFO)
+# the elements of Address, each has its own element check (see edfrules)
+ADDRESS = "edf:BasicData/edf:Address/edf:{0}"
+EMPTY = (logging.INFO, "Empty {0} element. Consider removing empty elements")
+NEWLINE = (logging.WARNING, "{0} element should not contain any line breaks")
+NOTEXT = (logging.WARNING, "{0} element should only contain phone numbers but no text.")
+
+check_street = check("check_street", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, newline=NEWLINE)]), first=True, visit=[ADDRESS.format("Street")])
+check_zipcode = check("check_zipcode", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, newline=NEWLINE)]), first=True, visit=[ADDRESS.format("ZipCode")])
+check_citycode = check("check_citycode", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, newline=NEWLINE)]), first=True, visit=[ADDRESS.format("City")])
+check_country = check("check_country", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, length=(2, logging.INFO, "The Country element is expected to contain a 2 letter ISO 3166 country code, not the verbose name of the country"))]), first=True, visit=[ADDRESS.format("Country")])
+check_phone = check("check_phone", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, newline=NEWLINE, letters=NOTEXT)]), first=True, visit=[ADDRESS.format("Phone")])
+check_fax = check("check_fax", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, newline=NEWLINE, letters=NOTEXT)]), first=True, visit=[ADDRESS.format("Fax")])
+check_email = check("check_email", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, newline=NEWLINE)]), first=True, visit=[ADDRESS.format("Email")])
+check_website = check("check_website", BasicDataError, Element(None, rules=[Rule(None, missing=EMPTY, newline=NEWLINE)]), first=True, visit=[ADDRESS.format("Website")])
 
-        
-def check_phone(hotelrootnode, allotmentrootnode):
-    phonenode = hotelrootnode.find("edf:BasicData/edf:Address/edf:Phone", ns)
-    if phonenode is not None:
-        if phonenode.text is None:
-            raise BasicDataError("Empty Phone element. Consider removing empty elements", node=phonenode, level=logging.INFO)
-        elif phonenode.text.find("\n") > -1:
-                raise BasicDataError("Phone element should not contain any line breaks", node=phonenode, level=logging.WARNING)
-        else:
-            for c in phonenode.text:
-                if c in ascii_lowercase or c in ascii_uppercase:
-                    raise BasicDataError("Phone element should only contain phone numbers but no text.", node=phonenode, level=logging.WARNING)
-                    break
-                    
-                    
-def check_fax(hotelrootnode, allotmentrootnode):
-    faxnode = hotelrootnode.find("edf:BasicData/edf:Address/edf:Fax", ns)
-    if faxnode is not None:
-        if faxnode.text is None:
-            raise BasicDataError("Empty Fax element. Consider removing empty elements", node=faxnode, level=logging.INFO)
-        elif faxnode.text.find("\n") > -1:
-                raise BasicDataError("Fax element should not contain any line breaks", node=faxnode, level=logging.WARNING)
-        else:
-            for c in faxnode.text:
-                if c in ascii_lowercase or c in ascii_uppercase:
-                    raise BasicDataError("Fax element should only contain phone numbers but no text.", node=faxnode, level=logging.WARNING)
-                    break
-                    
-                    
-def check_email(hotelrootnode, allotmentrootnode):
-    emailnode = hotelrootnode.find("edf:BasicData/edf:Address/edf:Email", ns)
-    if emailnode is not None:
-        if emailnode.text is None:
-            raise BasicDataError("Empty Email element. Consider removing empty elements", node=emailnode, level=logging.INFO)
-        elif emailnode.text.find("\n") > -1:
-            raise BasicDataError("Email element should not contain any line breaks", node=emailnode, level=logging.WARNING)
-            
-def check_website(hotelrootnode, allotmentrootnode):
-    wwwnode = hotelrootnode.find("edf:BasicData/edf:Address/edf:Website", ns)
-    if wwwnode is not None:
-        if wwwnode.text is None:
-            raise BasicDataError("Empty Website element. Consider removing empty elements", node=wwwnode, level=logging.INFO)
-        elif wwwnode.text.find("\n") > -1:
-            raise BasicDataError("Website element should not contain any line breaks", node=wwwnode, level=logging.WARNING)
 
 def check_geocodes(hotelrootnode, allotmentrootnode):
     geoinfosnode = hotelrootnode.find("edf:BasicData/edf:GeoInfos", ns)
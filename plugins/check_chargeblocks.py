@@ -0,0 +1,74 @@
+"""This module checks the date ranges of the ChargeBlocks of each Room.
+
+ChargeBlocks with the same attributes apart from Start and End (e.g.
+the same Board) must not overlap, and gaps in the season of
+SeasonDefinitions are reported as WARNING, the room has no price on
+these days. The ranges of a Room are sorted and swept once (see
+edfranges).
+
+Room checks only get their Room, so check_chargeblocks also visits
+SeasonDefinitions, which comes before the Rooms, and keeps the season
+in the state of the document (see edfregistry.visit) until the Rooms
+are visited."""
+import logging
+import datetime
+from edferrors import ErrorMsg, ChargeBlockError
+from edfns import ns
+import edfvalues
+import edfranges
+from edfregistry import describe, visit
+
+SEASONTAG = "{{{0}}}SeasonDefinitions".format(ns["edf"])
+
+
+@describe(cost=2)
+@visit("edf:HotelEDF/edf:SellingData/edf:SeasonDefinitions", "edf:Rooms/edf:Room", state=True)
+def check_chargeblocks(node, state):
+    if node.tag == SEASONTAG:
+        start = edfvalues.parse_date(node.get("Start"))
+        end = edfvalues.parse_date(node.get("End"))
+        if start is not None and end is not None and start <= end:
+            # first and last day (ordinals) of the season
+            state["season"] = (start.toordinal(), end.toordinal())
+        return
+    errormsgs = list()
+    ranges = dict()
+    for chargeblocknode in node.iterfind("edf:ChargeBlocks/edf:ChargeBlock", ns):
+        attrib = chargeblocknode.attrib
+        dates = list()
+        for name in ("Start", "End"):
+            value = attrib.get(name)
+            if value is None:
+                errormsgs.append(ErrorMsg("{0} attribute is missing in ChargeBlock element", node=chargeblocknode, level=logging.ERROR, args=(name,)))
+                continue
+            date = edfvalues.parse_date(value)
+            if date is None:
+                errormsgs.append(ErrorMsg("Value for {0} must be a date in ISO format", node=chargeblocknode, level=logging.ERROR, args=(name,)))
+                continue
+            dates.append(date.toordinal())
+        if len(dates) < 2:
+            continue
+        start, end = dates
+        if end < start:
+            errormsgs.append(ErrorMsg("Value for End cannot be smaller than value for Start", node=chargeblocknode, level=logging.ERROR))
+            continue
+        key = tuple(sorted((name, value) for name, value in attrib.items() if name not in ("Start", "End")))
+        try:
+            ranges[key].append((start, end))
+        except KeyError:
+            ranges[key] = [(start, end)]
+    seasonstart, seasonend = state.get("season", (None, None))
+    fromordinal = datetime.date.fromordinal
+    for key, group in ranges.items():
+        name = ""
+        if key:
+            name = " for " + " ".join('{0}="{1}"'.format(n, v) for n, v in key)
+        for kind, start, end, until in edfranges.sweep(group, seasonstart, seasonend):
+            if kind == edfranges.DUPLICATE:
+                errormsgs.append(ErrorMsg("Duplicate ChargeBlocks{0} from {1} to {2}", level=logging.ERROR, args=(name, fromordinal(start), fromordinal(end))))
+            elif kind == edfranges.OVERLAP:
+                errormsgs.append(ErrorMsg("ChargeBlock{0} from {1} to {2} overlaps another ChargeBlock until {3}", level=logging.ERROR, args=(name, fromordinal(start), fromordinal(end), fromordinal(until))))
+            else:
+                errormsgs.append(ErrorMsg("No ChargeBlock{0} from {1} to {2} within the season {3} to {4}", level=logging.WARNING, args=(name, fromordinal(start), fromordinal(end), fromordinal(seasonstart), fromordinal(seasonend))))
+    if len(errormsgs) > 0:
+        raise ChargeBlockError("{0} errors in ChargeBlocks".format(len(errormsgs)), messages=errormsgs)
@@ -2,6 +2,7 @@ import datetime
 import logging
 from edferrors import ErrorMsg, RoomError
 from edfns import ns 
+from edfrules import Rule, Element, check
 
 
 def room_checkroomcode(roomnode):
@@ -19,7 +20,7 @@ def room_checkdescriptions(roomnode):
     for descriptionnode in descriptionnodes:
         lang = descriptionnode.get("Language")
         if lang is None:
-            errormsgs.append(ErrorMsg("Language attribute should be set", level=Logging.WARNING, node=descriptionnode))
+            errormsgs.append(ErrorMsg("Language attribute should be set", level=logging.WARNING, node=descriptionnode))
         elif not (len(lang) == 2 or len(lang) == 5):
             errormsgs.append(ErrorMsg("Language attribute must be an uppercase 2-letter language code (eg. FR or DE) or a 5 letter languag_region code (eg. pt_BR or en_GB)", level=logging.ERROR, node=descriptionnode))
         elif lang == "**":
@@ -29,29 +30,18 @@ def room_checkdescriptions(roomnode):
     if len(errormsgs) > 0:
         raise RoomError("{0} errors in Descriptions".format(len(errormsgs)), messages=errormsgs)
         
-def room_checkboard(roomnode):
-    errormsgs = list()
-    boardnodes = roomnode.findall("edf:Boards/edf:Board", ns)
-    if len(boardnodes) == 0:
-        raise RoomError("You must define at least one Boards/Board element", level=logging.ERROR)
-    for boardnode in boardnodes:
-        if boardnode.get("Code") is None:
-            errormsgs.append("No Code attribute in Board node", node=boardnode, level=logging.INFO)
-        if boardnode.get("GlobalType") is None:
-            errormsgs.append("GlobalType attribute in Board node is mandatory", node=boardnode, level=logging.ERROR)
-        elif boardnode.get("GlobalType") not in ['AO', 'BB', 'HB', 'HB+', 'FB', 'FB+', 'SC', 'AI', 'AI+', 'XX']:
-            errormsgs.append(ErrorMsg("GlobalType attribute value must be one of 'AO', 'BB', 'HB', 'HB+', 'FB', 'FB+', 'SC', 'AI', 'AI+', 'XX'", node=boardnode, level=logging.ERROR))
-        if len(errormsgs) > 0:
-            raise RoomError("{0} errors in Boards node".format(len(errormsgs)), messages=errormsgs)
-        
-def room_checkglobaltypes(roomnode):
-    errormsgs = list()
-    gtnodes = roomnode.findall("edf:GlobalTypes/edf:GlobalType", ns)
-    if len(gtnodes) == 0:
-        raise RoomError("GlobalTypes element should contain at least one GlobalType element", level=logging.WARNING)
-    for gtnode in gtnodes:
-        code = gtnode.get("Code")
-        if code is None:
-            errormsgs.append("Empty Code attribute in GlobalType element", node=gtnode, level=logging.ERROR)
-        elif code not in ['AP', 'BU', 'CA', 'CH', 'CT', 'DP', 'DR', 'DL', 'ER', 'FC', 'FR', 'HA', 'HB', 'JS', 'MA', 'MB', 'MH', 'PH', 'SP', 'SR', 'ST', 'SU', 'TR', 'VF', 'VH', 'VI', 'WB', 'XX']:
-            errormsgs.append(ErrorMsg("Code attribute value in GlobalType element must be one of 'AP', 'BU', 'CA', 'CH', 'CT', 'DP', 'DR', 'DL', 'ER', 'FC', 'FR', 'HA', 'HB', 'JS', 'MA', 'MB', 'MH', 'PH', 'SP', 'SR', 'ST', 'SU', 'TR', 'VF', 'VH', 'VI', 'WB', 'XX'", node=gtnode, level=logging.ERROR))
+BOARDTYPES = ('AO', 'BB', 'HB', 'HB+', 'FB', 'FB+', 'SC', 'AI', 'AI+', 'XX')
+ROOMTYPES = ('AP', 'BU', 'CA', 'CH', 'CT', 'DP', 'DR', 'DL', 'ER', 'FC', 'FR', 'HA', 'HB', 'JS', 'MA', 'MB', 'MH', 'PH', 'SP', 'SR', 'ST', 'SU', 'TR', 'VF', 'VH', 'VI', 'WB', 'XX')
+
+room_checkboard = check("room_checkboard", RoomError, Element(
+    "edf:Boards/edf:Board",
+    missing=(logging.ERROR, "You must define at least one Boards/Board element"),
+    rules=[Rule("Code", missing=(logging.INFO, "No Code attribute in Board node")),
+           Rule("GlobalType", missing=(logging.ERROR, "GlobalType attribute in Board node is mandatory"),
+                enum=(BOARDTYPES, logging.ERROR, "GlobalType attribute value must be one of {1}"))]))
+
+room_checkglobaltypes = check("room_checkglobaltypes", RoomError, Element(
+    "edf:GlobalTypes/edf:GlobalType",
+    missing=(logging.WARNING, "GlobalTypes element should contain at least one GlobalType element"),
+    rules=[Rule("Code", missing=(logging.ERROR, "Empty Code attribute in GlobalType element"),
+                enum=(ROOMTYPES, logging.ERROR, "Code attribute value in GlobalType element must be one of {1}"))]))
@@ -6,7 +6,8 @@ import logging #needed for loglevel constants used to passed to exceptions
 from edferrors import SellingDataError #only SellingDataError will be raised in this module
 from edfns import ns #namespaces used in node.find() and node.findall(). edf for HotelEDF and atmt for AllotmentEDF
 from string import ascii_uppercase
-import datetime
+from edfrules import Rule, Element, check
+import edfvalues
 
 
 def check_currency(hotelrootnode, allotmentrootnode):
@@ -24,21 +25,15 @@ def check_currency(hotelrootnode, allotmentrootnode):
             raise SellingDataError("Currency must be a valid 3 letter ISO 4217 currency code", level=logging.ERROR)
 
 
-def check_rounding(hotelrootnode, allotmentrootnode):
-    roundingnode = hotelrootnode.find("edf:SellingData/edf:Rounding", ns)
-    if roundingnode is None:
-        raise SellingDataError("Missing Rounding element. You may want to include Rounding if the used currency has decimal places (e.g. USD, EUR, GBP)", level=logging.WARNING) #This is not strictly an error but including Rounding is highly recommended, mainly for setting DecimalPlace. Therefore level is set to WARNING
-    mode = roundingnode.get("Mode")
-    if mode is not None:
-        if mode not in ['Up', 'Down', 'Commercial', 'No']:
-            raise SellingDataError("Rounding Mode must be one of the following: Up, Down, Commercial, No", node=roundingnode, level=logging.ERROR)
-    scope = roundingnode.get("Scope")
-    if scope is not None:
-        if scope not in ['Person', 'Room', 'Day']:
-            raise SellingDataError("Rounding Scope must be one of the following: Person, Room, Day", node=roundingnode, level=logging.ERROR)
-    if roundingnode.get("DecimalPlace") is None:
-        raise SellingDataError("if your currency has decimal places (e.g. USD, EUR, GBP), you should set this to avoid rounding errors", node=roundingnode, level=logging.WARNING)
-    
+# This is not strictly an error but including Rounding is highly recommended, mainly for setting DecimalPlace. Therefore level is set to WARNING
+check_rounding = check("check_rounding", SellingDataError, Element(
+    "edf:SellingData/edf:Rounding",
+    missing=(logging.WARNING, "Missing Rounding element. You may want to include Rounding if the used currency has decimal places (e.g. USD, EUR, GBP)"),
+    rules=[Rule("Mode", enum=(('Up', 'Down', 'Commercial', 'No'), logging.ERROR, "Rounding Mode must be one of the following: Up, Down, Commercial, No")),
+           Rule("Scope", enum=(('Person', 'Room', 'Day'), logging.ERROR, "Rounding Scope must be one of the following: Person, Room, Day")),
+           Rule("DecimalPlace", missing=(logging.WARNING, "if your currency has decimal places (e.g. USD, EUR, GBP), you should set this to avoid rounding errors"))]),
+    first=True)
+
 
 def check_seasondefinition(hotelrootnode, allotmentrootnode):
     seasondefsnode = hotelrootnode.find("edf:SellingData/edf:SeasonDefinitions", ns)
@@ -48,17 +43,15 @@ def check_seasondefinition(hotelrootnode, allotmentrootnode):
     end = seasondefsnode.get("End")
     if start is None or end is None:
         raise SellingDataError("Both Start and End attributes are mandatory in SeasonDefinitions element", node=seasondefsnode, level=logging.ERROR)
-    try:
-        enddate = datetime.datetime.strptime(end, "%Y-%m-%d").date()
-    except (ValueError, TypeError):
-        raise SellingDataError("Value for Start must be a date in ISO format", node=allotmentnode, level=logging.ERROR)
-    if enddate < datetime.date.today():
+    enddate = edfvalues.parse_date(end)
+    if enddate is None:
+        raise SellingDataError("Value for End must be a date in ISO format", node=seasondefsnode, level=logging.ERROR)
+    if edfvalues.is_past(enddate):
         raise SellingDataError("End date is in the past, the EDF is outdated", node=seasondefsnode, level=logging.ERROR)
-    try:
-        startdate = datetime.datetime.strptime(start, "%Y-%m-%d").date()
-    except (ValueError, TypeError):
-        raise SellingDataError("Value for End must be a date in ISO format", node=allotmentnode, level=logging.ERROR)
-    if startdate < datetime.date.today():
+    startdate = edfvalues.parse_date(start)
+    if startdate is None:
+        raise SellingDataError("Value for Start must be a date in ISO format", node=seasondefsnode, level=logging.ERROR)
+    if edfvalues.is_past(startdate):
         raise SellingDataError("Start date is in the past. You should only include data with date >= today", node=seasondefsnode, level=logging.WARNING)
 
 def check_rooms(hotelrootnode, allotmentrootnode):
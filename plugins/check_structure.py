@@ -0,0 +1,88 @@
+"""This module checks the structure of HotelEDF and AllotmentEDF files:
+unknown, repeated, misordered and missing elements and missing
+attributes (see edfschema).
+
+The models follow the EDF XSD as far as edbug knows the format, the
+lines of an Address may come in any order. The roots and their
+BasicData and SellingData are taken from the XSD (xsd=True), a repeated
+or misordered child of these is an ERROR. The models below them are
+not, so repeated and misordered elements are only warnings there (see
+edfschema), mark a model with xsd=True once it is checked against the
+XSD. Elements which are not listed are reported as unknown with level
+WARNING, extend the models when the XSD has more. Elements and attributes which are
+required but reported by another check (e.g. the Name of a hotel or the
+Code of a Room) are optional here, so they are not reported twice.
+Allotment has no model: with -S its children are gone before the
+Allotments around it are validated.
+"""
+import logging
+from edferrors import HotelEdfError, AllotmentEdfError, BasicDataError, SellingDataError, RoomError, OccupancyError, ChargeBlockError
+from edfns import ns
+from edfregistry import describe, visit
+from edfschema import Model, Schema
+
+HOTELEDF = [
+    Model("edf:HotelEDF", ["edf:BasicData", "edf:SellingData?"], error=HotelEdfError, xsd=True),
+    Model("edf:HotelEDF/edf:BasicData", ["edf:Name?", "edf:Address?", "edf:References?", "edf:GeoInfos?", "edf:Attributes?", "edf:ArrivalAirports?"],
+          required=("Code", "TourOperatorCode", "Source"), error=BasicDataError, xsd=True),
+    Model("edf:BasicData/edf:Name", [], error=BasicDataError),
+    Model("edf:BasicData/edf:Address", ["(edf:Street|edf:ZipCode|edf:City|edf:Country|edf:Phone|edf:Fax|edf:Email|edf:Website)*"], error=BasicDataError),
+    Model("edf:Address/edf:Street", [], error=BasicDataError),
+    Model("edf:Address/edf:ZipCode", [], error=BasicDataError),
+    Model("edf:Address/edf:City", [], error=BasicDataError),
+    Model("edf:Address/edf:Country", [], error=BasicDataError),
+    Model("edf:Address/edf:Phone", [], error=BasicDataError),
+    Model("edf:Address/edf:Fax", [], error=BasicDataError),
+    Model("edf:Address/edf:Email", [], error=BasicDataError),
+    Model("edf:Address/edf:Website", [], error=BasicDataError),
+    Model("edf:BasicData/edf:References", ["edf:GiataCode?", "edf:HotelKey?"], error=BasicDataError),
+    Model("edf:References/edf:GiataCode", [], error=BasicDataError),
+    Model("edf:References/edf:HotelKey", [], error=BasicDataError),
+    Model("edf:BasicData/edf:GeoInfos", ["edf:Geocode?"], error=BasicDataError),
+    Model("edf:GeoInfos/edf:Geocode", [], error=BasicDataError),
+    Model("edf:BasicData/edf:Attributes", ["edf:Attribute*"], error=BasicDataError),
+    Model("edf:Attributes/edf:Attribute", [], required=("Name",), error=BasicDataError),
+    Model("edf:BasicData/edf:ArrivalAirports", ["edf:Airport*"], error=BasicDataError),
+    Model("edf:ArrivalAirports/edf:Airport", [], error=BasicDataError),
+    Model("edf:HotelEDF/edf:SellingData", ["edf:Rounding?", "edf:SeasonDefinitions?", "edf:Rooms?"], error=SellingDataError, xsd=True),
+    Model("edf:SellingData/edf:Rounding", [], error=SellingDataError),
+    Model("edf:SellingData/edf:SeasonDefinitions", [], error=SellingDataError),
+    Model("edf:SellingData/edf:Rooms", ["edf:Room*"], error=RoomError),
+    Model("edf:Rooms/edf:Room", ["edf:Descriptions?", "edf:Boards?", "edf:GlobalTypes?", "edf:Occupancies?", "edf:ChargeBlocks?"], error=RoomError),
+    Model("edf:Room/edf:Descriptions", ["edf:Description*"], error=RoomError),
+    Model("edf:Descriptions/edf:Description", [], error=RoomError),
+    Model("edf:Room/edf:Boards", ["edf:Board*"], error=RoomError),
+    Model("edf:Boards/edf:Board", [], error=RoomError),
+    Model("edf:Room/edf:GlobalTypes", ["edf:GlobalType*"], error=RoomError),
+    Model("edf:GlobalTypes/edf:GlobalType", [], error=RoomError),
+    Model("edf:Room/edf:Occupancies", ["edf:Occupancy*"], error=OccupancyError),
+    Model("edf:Occupancies/edf:Occupancy", ["edf:Children?", "edf:Infants?"], error=OccupancyError),
+    Model("edf:Occupancy/edf:Children", [], error=OccupancyError),
+    Model("edf:Occupancy/edf:Infants", [], error=OccupancyError),
+    Model("edf:Room/edf:ChargeBlocks", ["edf:ChargeBlock*"], error=ChargeBlockError),
+]
+
+ALLOTMENTEDF = [
+    Model("atmt:AllotmentEDF", ["atmt:BasicData", "atmt:SellingData?"], error=AllotmentEdfError, xsd=True),
+    Model("atmt:AllotmentEDF/atmt:BasicData", None, required=("Code", "TourOperatorCode", "Source"), error=AllotmentEdfError, xsd=True),
+    Model("atmt:AllotmentEDF/atmt:SellingData", ["atmt:Allotments?"], error=AllotmentEdfError, xsd=True),
+    Model("atmt:SellingData/atmt:Allotments", ["atmt:Allotment*"], error=AllotmentEdfError),
+]
+
+SCHEMA = Schema(HOTELEDF + ALLOTMENTEDF)
+
+HOTELROOT = "{{{0}}}HotelEDF".format(ns["edf"])
+ALLOTMENTROOT = "{{{0}}}AllotmentEDF".format(ns["atmt"])
+
+
+@describe(maxlevel=logging.ERROR, cost=2)
+@visit(*SCHEMA.paths)
+def check_structure(node):
+    SCHEMA.validate(node)
+
+
+def check_roots(hotelrootnode, allotmentrootnode):
+    if hotelrootnode.getroot().tag != HOTELROOT:
+        raise HotelEdfError("The root element must be HotelEDF in namespace {0}, not {1}", level=logging.ERROR, args=(ns["edf"], hotelrootnode.getroot().tag))
+    if allotmentrootnode is not None and allotmentrootnode.getroot().tag != ALLOTMENTROOT:
+        raise AllotmentEdfError("The root element must be AllotmentEDF in namespace {0}, not {1}", level=logging.ERROR, args=(ns["atmt"], allotmentrootnode.getroot().tag))
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+import edbug
+import edfgen
+from edfcache import ResultCache
+
+
+def check(source, jobs=1, **options):
+    return list(edbug.checkfiles(source, source.hotelnames(), jobs, options))
+
+
+class CheckFilesTest(unittest.TestCase):
+    """The ways of checking a delivery give the same findings as a
+    serial run of the same checks."""
+    @classmethod
+    def setUpClass(cls):
+        edbug.register_namespaces()
+        cls.workdir = tempfile.mkdtemp()
+        edfgen.generate(cls.workdir, hotels=20, errorrate=0.2, seed=3)
+        cls.source = edbug.get_source(cls.workdir)
+        cls.serial = check(cls.source)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.workdir)
+
+    def test_sample_has_findings(self):
+        self.assertGreater(sum(len(records) for filename, records, counters, codes in self.serial), 20)
+
+    def test_jobs(self):
+        self.assertEqual(check(self.source, jobs=3), self.serial)
+
+    def test_stream(self):
+        self.assertEqual(check(self.source, stream=True), self.serial)
+
+    def test_cache(self):
+        cache = ResultCache(os.path.join(self.workdir, "cache.db"))
+        try:
+            self.assertEqual(check(self.source, cache=cache), self.serial)
+            self.assertEqual(check(self.source, cache=cache), self.serial)
+            self.assertEqual((cache.misses, cache.hits), (20, 20))
+        finally:
+            cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import logging
+import unittest
+from edferrors import Finding, Message
+from edfdelta import diff
+
+PATHS = ("new/EDF----TO-H1.xml", "new/EDF----TO-H1_allotment.xml")
+OLDPATHS = ("old/EDF----TO-H1.xml", "old/EDF----TO-H1_allotment.xml")
+
+
+def finding(path, *messages):
+    return Finding(logging.ERROR, "in HotelEDF {0}, Room R1:".format(path), "RoomError", "room_checkboard", "R1",
+                   [Message(logging.ERROR, message, snippet) for message, snippet in messages])
+
+
+class DiffTest(unittest.TestCase):
+    def test_edited_element_is_unchanged(self):
+        new, unchanged, fixed = diff([finding(PATHS[0], ("Board code missing", '<Board  GlobalType="BB" />'))],
+                                     [finding(OLDPATHS[0], ("Board code missing", '<Board GlobalType="BB"/>'))], PATHS, OLDPATHS)
+        self.assertEqual((len(new), len(unchanged), len(fixed)), (0, 1, 0))
+        self.assertEqual(unchanged[0].header, "[unchanged] in HotelEDF new/EDF----TO-H1.xml, Room R1:")
+
+    def test_new_and_fixed_messages(self):
+        new, unchanged, fixed = diff([finding(PATHS[0], ("Board code missing", None), ("GlobalType is empty", None))],
+                                     [finding(OLDPATHS[0], ("Board code missing", None), ("Rounding is invalid", None))], PATHS, OLDPATHS)
+        self.assertEqual([m.message for f in new for m in f.messages], ["GlobalType is empty"])
+        self.assertEqual([m.message for f in unchanged for m in f.messages], ["Board code missing"])
+        self.assertEqual([(m.level, m.message) for f in fixed for m in f.messages], [(logging.INFO, "Rounding is invalid")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import edfpattern
+
+
+class DecodeTest(unittest.TestCase):
+    def test_values(self):
+        values, invalid = edfpattern.decode("09AZ")
+        self.assertEqual(list(values), [0, 9, 10, 35])
+        self.assertEqual(invalid, -1)
+
+    def test_first_invalid_character(self):
+        values, invalid = edfpattern.decode("1a2-")
+        self.assertEqual(invalid, 1)
+        self.assertEqual(values.count(edfpattern.INVALID), 2)
+
+    def test_characters_outside_latin1_are_invalid(self):
+        values, invalid = edfpattern.decode("12€")
+        self.assertEqual(invalid, 2)
+
+
+class DaysTest(unittest.TestCase):
+    def days(self, pattern, patternlength):
+        values, invalid = edfpattern.decode(pattern)
+        return list(edfpattern.availabledays(values, patternlength)), edfpattern.zerodays(values, patternlength)
+
+    def test_one_slot_per_day(self):
+        self.assertEqual(self.days("1003", 1), ([1, 0, 0, 1], 2))
+
+    def test_a_day_is_available_if_any_of_its_slots_is(self):
+        # days 00, 01, 20, 00
+        self.assertEqual(self.days("00012000", 2), ([0, 1, 1, 0], 2))
+
+    def test_slots_do_not_spill_across_the_day_boundary(self):
+        # the available slot is the last of the second day
+        self.assertEqual(self.days("000500", 3), ([0, 1], 1))
+        # and the first of the second day
+        self.assertEqual(self.days("000500", 2), ([0, 1, 0], 2))
+
+    def test_trailing_slots_of_an_incomplete_day_are_ignored(self):
+        self.assertEqual(self.days("00009", 2), ([0, 0], 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
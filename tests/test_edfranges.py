@@ -0,0 +1,41 @@
+import unittest
+import edfranges
+from edfranges import DUPLICATE, OVERLAP, GAP
+
+
+def sweep(ranges, first=None, last=None):
+    return list(edfranges.sweep(list(ranges), first, last))
+
+
+class SweepTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(sweep([], 1, 10), [])
+
+    def test_adjacent_ranges_neither_overlap_nor_leave_a_gap(self):
+        self.assertEqual(sweep([(11, 20), (1, 10)], 1, 20), [])
+
+    def test_overlap_by_one_day(self):
+        self.assertEqual(sweep([(1, 10), (10, 20)]), [(OVERLAP, 10, 20, 10)])
+
+    def test_overlap_ends_at_the_furthest_end_seen(self):
+        # (5, 8) lies within (1, 20), (15, 30) overlaps it until 20
+        self.assertEqual(sweep([(1, 20), (5, 8), (15, 30)]), [(OVERLAP, 5, 8, 8), (OVERLAP, 15, 30, 20)])
+
+    def test_duplicate(self):
+        self.assertEqual(sweep([(1, 10), (1, 10)]), [(DUPLICATE, 1, 10, None)])
+
+    def test_gaps_within_first_and_last(self):
+        self.assertEqual(sweep([(5, 10), (13, 15)], 1, 20), [(GAP, 1, 4, None), (GAP, 11, 12, None), (GAP, 16, 20, None)])
+
+    def test_gaps_are_cut_at_first_and_last(self):
+        self.assertEqual(sweep([(1, 3), (10, 30)], 5, 20), [(GAP, 5, 9, None)])
+
+    def test_no_gaps_without_first_and_last(self):
+        self.assertEqual(sweep([(1, 3), (10, 30)]), [])
+
+    def test_ranges_outside_first_and_last(self):
+        self.assertEqual(sweep([(30, 40)], 1, 10), [(GAP, 1, 10, None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
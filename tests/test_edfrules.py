@@ -0,0 +1,77 @@
+import logging
+import unittest
+import xml.etree.ElementTree as ET
+from edferrors import RoomError
+from edfns import ns
+from edfrules import Rule, Element, check
+
+ROOM = ('<Room xmlns="{0}" Code="R1"><Boards>'
+        '<Board Code="B1" GlobalType=""/><Board Code="B2" GlobalType="XX"/><Board GlobalType="BB"/>'
+        '</Boards></Room>').format(ns["edf"])
+
+BOARDS = Element(
+    "edf:Boards/edf:Board",
+    missing=(logging.ERROR, "You must define at least one {0} element"),
+    rules=[Rule("Code", missing=(logging.ERROR, "{0} attribute is mandatory")),
+           Rule("GlobalType", empty=(logging.WARNING, "{0} is empty"),
+                enum=(("BB", "HB"), logging.ERROR, "{0} must be one of {1}"))])
+
+
+def messages(function, node):
+    try:
+        function(node)
+    except RoomError as e:
+        return [(m.level, m.message) for m in e.messages]
+    return []
+
+
+class RulesTest(unittest.TestCase):
+    def setUp(self):
+        self.room = ET.fromstring(ROOM)
+
+    def test_all_messages_of_all_elements(self):
+        room_checkboards = check("room_checkboards", RoomError, BOARDS)
+        self.assertEqual(messages(room_checkboards, self.room), [
+            (logging.WARNING, "GlobalType is empty"),
+            (logging.ERROR, "GlobalType must be one of 'BB', 'HB'"),
+            (logging.ERROR, "Code attribute is mandatory")])
+
+    def test_only_the_first_failing_test_of_a_rule(self):
+        # the empty GlobalType is not in the enum either, only empty is reported
+        room_checkboards = check("room_checkboards", RoomError, BOARDS)
+        room = ET.fromstring('<Room xmlns="{0}"><Boards><Board Code="B1" GlobalType=""/></Boards></Room>'.format(ns["edf"]))
+        self.assertEqual(messages(room_checkboards, room), [(logging.WARNING, "GlobalType is empty")])
+
+    def test_first_stops_at_the_first_message(self):
+        room_checkboards = check("room_checkboards", RoomError, BOARDS, first=True)
+        self.assertEqual(messages(room_checkboards, self.room), [(logging.WARNING, "GlobalType is empty")])
+
+    def test_missing_elements_of_the_check_are_raised_alone(self):
+        room_checkboards = check("room_checkboards", RoomError, BOARDS)
+        empty = ET.fromstring('<Room xmlns="{0}" Code="R1"/>'.format(ns["edf"]))
+        self.assertEqual(messages(room_checkboards, empty), [(logging.ERROR, "You must define at least one Board element")])
+
+    def test_maximum_and_missing_children(self):
+        room_checkboards = check("room_checkboards", RoomError, Element(
+            "edf:Boards", children=[
+                Element("edf:Board", maximum=(2, logging.ERROR, "At most {1} {0} elements")),
+                Element("edf:Meal", missing=(logging.INFO, "No {0} element"))]))
+        try:
+            room_checkboards(self.room)
+        except RoomError as e:
+            self.assertEqual([m.message for m in e.messages], ["At most 2 Board elements", "No Meal element"])
+            # the maximum is shown with the parent, a missing element has no node
+            self.assertEqual(e.messages[0].node.tag, "{{{0}}}Boards".format(ns["edf"]))
+            self.assertIsNone(e.messages[1].node)
+        else:
+            self.fail("RoomError not raised")
+
+    def test_name_module_and_maxlevel(self):
+        room_checkboards = check("room_checkboards", RoomError, BOARDS)
+        self.assertEqual(room_checkboards.__name__, "room_checkboards")
+        self.assertEqual(room_checkboards.__module__, __name__)
+        self.assertEqual(room_checkboards.edbug_meta["maxlevel"], logging.ERROR)
+
+
+if __name__ == "__main__":
+    unittest.main()
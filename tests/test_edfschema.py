@@ -0,0 +1,44 @@
+import logging
+import unittest
+import xml.etree.ElementTree as ET
+from edferrors import HotelEdfError, RoomError
+from edfns import ns
+from plugins.check_structure import SCHEMA
+
+
+def messages(xml):
+    node = ET.fromstring(xml.format(ns["edf"]))
+    try:
+        SCHEMA.validate(node)
+    except (HotelEdfError, RoomError) as e:
+        return [(m.level, m.message) for m in e.messages]
+    return []
+
+
+BASICDATA = '<BasicData Code="H1" TourOperatorCode="TO" Source="S"/>'
+
+
+class StructureTest(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(messages('<HotelEDF xmlns="{0}">' + BASICDATA + '<SellingData/></HotelEDF>'), [])
+
+    def test_duplicate_basicdata_is_an_error(self):
+        self.assertEqual(messages('<HotelEDF xmlns="{0}">' + BASICDATA + BASICDATA + '</HotelEDF>'),
+                         [(logging.ERROR, "Element BasicData may appear only once in HotelEDF")])
+
+    def test_misordered_child_of_the_root_is_an_error(self):
+        self.assertEqual(messages('<HotelEDF xmlns="{0}"><SellingData/>' + BASICDATA + '</HotelEDF>'),
+                         [(logging.ERROR, "Missing element BasicData in HotelEDF"),
+                          (logging.ERROR, "Element BasicData is out of order in HotelEDF, it must come before SellingData")])
+
+    def test_models_not_from_the_xsd_warn(self):
+        self.assertEqual(messages('<Room xmlns="{0}"><Boards/><Descriptions/></Room>'),
+                         [(logging.WARNING, "Element Descriptions is out of order in Room, it must come before Boards")])
+
+    def test_missing_element(self):
+        self.assertEqual(messages('<HotelEDF xmlns="{0}"><SellingData/></HotelEDF>'),
+                         [(logging.ERROR, "Missing element BasicData in HotelEDF")])
+
+
+if __name__ == "__main__":
+    unittest.main()
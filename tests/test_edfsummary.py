@@ -0,0 +1,39 @@
+import unittest
+from edfsummary import Distinct
+
+
+def distinct(n, size):
+    sketch = Distinct(size)
+    for i in range(n):
+        sketch.add("hotel{0}".format(i))
+    return sketch
+
+
+class DistinctTest(unittest.TestCase):
+    def test_exact_below_size(self):
+        sketch = distinct(99, 100)
+        self.assertTrue(sketch.exact)
+        self.assertEqual(sketch.count(), 99)
+
+    def test_estimate_from_size(self):
+        # with size values the k-th smallest hash decides, the count is an estimate
+        for n in (100, 101, 10000):
+            sketch = distinct(n, 100)
+            self.assertFalse(sketch.exact)
+            # the relative error is about 1 / sqrt(size - 2)
+            self.assertAlmostEqual(sketch.count() / n, 1, delta=0.35)
+
+    def test_duplicates_are_ignored(self):
+        sketch = distinct(50, 100)
+        for i in range(50):
+            sketch.add("hotel{0}".format(i))
+        self.assertEqual(sketch.count(), 50)
+        sketch = distinct(10000, 100)
+        count = sketch.count()
+        for i in range(10000):
+            sketch.add("hotel{0}".format(i))
+        self.assertEqual(sketch.count(), count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import time
+import unittest
+import xml.etree.ElementTree as ET
+import edfsupervise
+
+
+def slow(node):
+    time.sleep(1)
+
+
+class GuardTest(unittest.TestCase):
+    @unittest.skipUnless(edfsupervise.can_interrupt(), "needs SIGALRM in the main thread")
+    def test_timed_out_check_and_element_are_named(self):
+        timedout = list()
+        guarded = edfsupervise.guard(slow, "room_checkslow", 0.05, timedout)
+        self.assertIsNone(guarded(ET.fromstring('<Room xmlns="http://example.com/edf" Code="DZ1"/>')))
+        self.assertEqual(timedout, [("room_checkslow", 'Room element with Code "DZ1"')])
+
+    def test_where(self):
+        self.assertEqual(edfsupervise.where(ET.fromstring("<Boards/>")), "Boards element")
+        self.assertEqual(edfsupervise.where(None), "the file")
+
+
+if __name__ == "__main__":
+    unittest.main()